@@ -28,6 +28,7 @@ def build():
         '--onefile',                  # Gera um único arquivo
         '--add-data=eproc;eproc',    # Inclui o módulo eproc
         '--add-data=projudi_tjpr;projudi_tjpr',  # Inclui o módulo projudi
+        '--add-data=comum;comum',    # Inclui os utilitários compartilhados
         '--hidden-import=PIL._tkinter_finder',  # Import necessário para o Pillow
         '--hidden-import=tkinter',    # Import necessário para o tkinter
     ])
@@ -0,0 +1,108 @@
+import json
+import sqlite3
+import threading
+import time
+from .lote_movimentacoes import LoteMovimentacoes
+
+ARQUIVO_CACHE = "resultados_cache.sqlite3"
+TTL_HORAS = 24
+MAX_PROCESSOS = 5000
+
+class CacheResultados:
+    """Movimentações já extraídas de cada processo, reaproveitadas entre execuções próximas.
+
+    A chave é (tribunal, número normalizado do processo). Uma entrada só é servida enquanto
+    for mais nova que `idade_maxima` segundos; acima de `max_processos` entradas, as usadas
+    há mais tempo são descartadas (LRU). Resultados extraídos com outra configuração (`variante`,
+    ex.: o filtro de movimentações) ficam em entradas separadas.
+    """
+
+    def __init__(
+        self,
+        caminho: str = ARQUIVO_CACHE,
+        idade_maxima: float = TTL_HORAS * 3600,
+        max_processos: int = MAX_PROCESSOS,
+        variante: str = "",
+    ) -> None:
+        self.caminho = caminho
+        self.variante = variante
+        self.idade_maxima = idade_maxima
+        self.max_processos = max(1, max_processos)
+        # consultado pelas threads das filas no modo --concorrente
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(caminho, check_same_thread=False)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS resultados (
+                tribunal TEXT NOT NULL,
+                processo TEXT NOT NULL,
+                movimentacoes TEXT NOT NULL,
+                obtido_em REAL NOT NULL,
+                acessado_em REAL NOT NULL,
+                PRIMARY KEY (tribunal, processo)
+            )
+            """
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS resultados_acessado_em ON resultados (acessado_em)")
+        self.conn.commit()
+        self._stats = {"acertos": 0, "faltas": 0, "expirados": 0, "gravados": 0, "descartados": 0}
+
+    def _tribunal(self, tribunal: str) -> str:
+        return f"{tribunal}|{self.variante}" if self.variante else tribunal
+
+    def consulta(self, tribunal: str, processo: str):
+        """lote de movimentações guardado do processo, ou None se não há entrada recente o bastante"""
+        tribunal = self._tribunal(tribunal)
+        agora = time.time()
+        with self._lock:
+            linha = self.conn.execute(
+                "SELECT movimentacoes, obtido_em FROM resultados WHERE tribunal = ? AND processo = ?",
+                (tribunal, processo),
+            ).fetchone()
+            if linha is None:
+                self._stats["faltas"] += 1
+                return None
+            if agora - linha[1] > self.idade_maxima:
+                self._stats["faltas"] += 1
+                self._stats["expirados"] += 1
+                return None
+            self.conn.execute(
+                "UPDATE resultados SET acessado_em = ? WHERE tribunal = ? AND processo = ?",
+                (agora, tribunal, processo),
+            )
+            self.conn.commit()
+            self._stats["acertos"] += 1
+        movimentacoes = json.loads(linha[0])
+        if isinstance(movimentacoes, list):
+            # entrada gravada por versões anteriores, uma lista de dicts
+            return LoteMovimentacoes.de_linhas(movimentacoes)
+        return LoteMovimentacoes.de_serializado(movimentacoes)
+
+    def armazena(self, tribunal: str, processo: str, lote: LoteMovimentacoes) -> None:
+        tribunal = self._tribunal(tribunal)
+        agora = time.time()
+        conteudo = json.dumps(lote.serializa(), ensure_ascii=False, default=str)
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO resultados (tribunal, processo, movimentacoes, obtido_em, acessado_em) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (tribunal, processo, conteudo, agora, agora),
+            )
+            descartados = self.conn.execute(
+                "DELETE FROM resultados WHERE rowid IN ("
+                "SELECT rowid FROM resultados ORDER BY acessado_em DESC LIMIT -1 OFFSET ?)",
+                (self.max_processos,),
+            ).rowcount
+            self.conn.commit()
+            self._stats["gravados"] += 1
+            self._stats["descartados"] += descartados
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        consultas = stats["acertos"] + stats["faltas"]
+        stats["taxa_acerto"] = round(stats["acertos"] / consultas, 3) if consultas else 0.0
+        return stats
+
+    def fecha(self) -> None:
+        self.conn.close()
@@ -0,0 +1,121 @@
+import json
+import logging
+import os
+
+logger = logging.getLogger()
+
+ARQUIVO_MANIFESTO = "execucao_em_andamento.json"
+# linha que confirma as marcações anteriores e registra o tamanho dos journals naquele momento
+PREFIXO_CONFIRMACAO = "@"
+# separa a chave de uma marcação do resultado do processo guardado com ela
+SEPARADOR_RESULTADO = "\t"
+
+class Checkpoint:
+    """Registro durável das linhas da planilha já concluídas (com sucesso ou com erro classificado).
+
+    As marcações ficam pendentes em memória até `grava`, que deve ser chamado logo depois que
+    os resultados correspondentes foram acrescentados aos journals. Cada gravação termina com
+    uma linha de confirmação com o tamanho dos journals: no --resume, marcações sem confirmação
+    são ignoradas e os journals são cortados nesse tamanho (`tamanhos`), descartando as linhas de
+    processos que ainda não estavam marcados e que serão consultados de novo.
+
+    A marcação da primeira linha de um processo consultado guarda também o seu resultado (o
+    intervalo das suas linhas no journal de movimentações e o erro), em `resultados`: no --resume,
+    as linhas repetidas desse processo são atendidas com ele, sem uma nova consulta.
+    """
+
+    def __init__(self, caminho: str) -> None:
+        self.caminho = caminho
+        self.concluidos = set()
+        self._pendentes = []
+        # resultado confirmado de cada processo consultado: número -> (inicio, fim, erro)
+        self.resultados = {}
+        # tamanho confirmado de cada journal; None para checkpoints de versões sem confirmação
+        self.tamanhos = {}
+
+    @staticmethod
+    def _chave(idx: int, num_processo: str) -> str:
+        return f"{idx}:{num_processo}"
+
+    def _confirma(self, linhas) -> None:
+        for linha in linhas:
+            chave, _, resultado = linha.partition(SEPARADOR_RESULTADO)
+            self.concluidos.add(chave)
+            if resultado:
+                inicio, fim, erro = json.loads(resultado)
+                self.resultados[chave.split(":", 1)[1]] = (inicio, fim, erro)
+
+    def carrega(self) -> int:
+        if not os.path.exists(self.caminho):
+            return 0
+        nao_confirmados = []
+        confirmado = False
+        with open(self.caminho, encoding="utf-8") as arq:
+            for linha in arq:
+                linha = linha.strip()
+                if not linha:
+                    continue
+                if not linha.startswith(PREFIXO_CONFIRMACAO):
+                    nao_confirmados.append(linha)
+                    continue
+                try:
+                    self.tamanhos = json.loads(linha[len(PREFIXO_CONFIRMACAO):])
+                except json.JSONDecodeError:
+                    # confirmação truncada por uma queda durante a gravação
+                    continue
+                confirmado = True
+                self._confirma(nao_confirmados)
+                nao_confirmados.clear()
+        if not confirmado:
+            # checkpoint gravado por uma versão anterior, sem linhas de confirmação
+            self._confirma(nao_confirmados)
+            self.tamanhos = None
+        elif nao_confirmados:
+            logger.warning(f"{len(nao_confirmados)} marcação(ões) sem confirmação ignoradas em {self.caminho}")
+        return len(self.concluidos)
+
+    def concluido(self, idx: int, num_processo: str) -> bool:
+        return self._chave(idx, num_processo) in self.concluidos
+
+    def marca(self, idx: int, num_processo: str, resultado: tuple = None) -> None:
+        """marca a linha como concluída; `resultado` é o (inicio, fim, erro) do processo consultado nela"""
+        chave = self._chave(idx, num_processo)
+        if resultado is not None:
+            chave += SEPARADOR_RESULTADO + json.dumps(list(resultado), ensure_ascii=False)
+        self._pendentes.append(chave)
+
+    def grava(self, tamanhos: dict) -> None:
+        """grava as marcações pendentes, confirmadas junto com o tamanho atual de cada journal"""
+        if not self._pendentes and tamanhos == self.tamanhos:
+            return
+        confirmacao = PREFIXO_CONFIRMACAO + json.dumps(tamanhos, sort_keys=True)
+        with open(self.caminho, "a", encoding="utf-8") as arq:
+            arq.write("\n" + "".join(f"{chave}\n" for chave in self._pendentes) + confirmacao + "\n")
+            arq.flush()
+            os.fsync(arq.fileno())
+        self._confirma(self._pendentes)
+        self._pendentes.clear()
+        self.tamanhos = dict(tamanhos)
+
+    def remove(self) -> None:
+        if os.path.exists(self.caminho):
+            os.remove(self.caminho)
+
+def salva_manifesto(dados: dict) -> None:
+    """grava os dados da execução atual (planilha e arquivos parciais) para permitir o --resume"""
+    temporario = f"{ARQUIVO_MANIFESTO}.tmp"
+    with open(temporario, "w", encoding="utf-8") as arq:
+        json.dump(dados, arq, ensure_ascii=False, indent=2)
+        arq.flush()
+        os.fsync(arq.fileno())
+    os.replace(temporario, ARQUIVO_MANIFESTO)
+
+def carrega_manifesto():
+    if not os.path.exists(ARQUIVO_MANIFESTO):
+        return None
+    with open(ARQUIVO_MANIFESTO, encoding="utf-8") as arq:
+        return json.load(arq)
+
+def remove_manifesto() -> None:
+    if os.path.exists(ARQUIVO_MANIFESTO):
+        os.remove(ARQUIVO_MANIFESTO)
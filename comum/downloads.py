@@ -0,0 +1,122 @@
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import os
+import queue
+import threading
+import time
+import requests
+from .limitador import requisicao_limitada
+
+logger = logging.getLogger()
+
+TAMANHO_BLOCO = 64 * 1024
+DOWNLOADS_SIMULTANEOS = 4
+SUFIXO_PARCIAL = ".part"
+
+def baixa_arquivo(session: requests.Session, url: str, destino: str, confere=None) -> int:
+    """Grava o corpo da resposta em `destino` em blocos, sem carregá-lo inteiro na memória.
+
+    O conteúdo vai primeiro para `destino.part` e só é renomeado ao terminar; um `.part` deixado
+    por um download interrompido é retomado com Range. `confere(resposta)`, se informado, é chamado
+    antes de gravar qualquer byte e levanta uma exceção para recusar a resposta (uma página de
+    login no lugar do arquivo, por exemplo). Devolve o tamanho final do arquivo.
+    """
+    if os.path.exists(destino):
+        return os.path.getsize(destino)
+    parcial = destino + SUFIXO_PARCIAL
+    ja_baixado = os.path.getsize(parcial) if os.path.exists(parcial) else 0
+    # sem compressão, para que o Range conte os mesmos bytes gravados no disco
+    headers = {"Accept-Encoding": "identity"}
+    if ja_baixado:
+        headers["Range"] = f"bytes={ja_baixado}-"
+
+    with requisicao_limitada(session, "GET", url, headers=headers, stream=True) as r:
+        if ja_baixado and r.status_code == 416:
+            # o .part já continha o arquivo inteiro
+            os.replace(parcial, destino)
+            return ja_baixado
+        r.raise_for_status()
+        if confere is not None:
+            confere(r)
+        modo = "ab" if ja_baixado and r.status_code == 206 else "wb"
+        with open(parcial, modo) as arq:
+            for bloco in r.iter_content(TAMANHO_BLOCO):
+                arq.write(bloco)
+            arq.flush()
+            os.fsync(arq.fileno())
+    os.replace(parcial, destino)
+    return os.path.getsize(destino)
+
+
+class FilaDownloads:
+    """Executa downloads em um pool limitado sem bloquear quem os agenda.
+
+    Cada chamada a `agenda` recebe um lote (qualquer objeto) e as tarefas dele; quando todas
+    terminam, `(lote, resultados)` fica disponível em `concluidos`, com o retorno de cada tarefa
+    ou a exceção que ela levantou, na ordem em que foram agendadas.
+    """
+
+    def __init__(self, simultaneos: int = DOWNLOADS_SIMULTANEOS) -> None:
+        self._executor = ThreadPoolExecutor(max_workers=max(1, simultaneos), thread_name_prefix="download")
+        self._concluidos = queue.Queue()
+        self._lock = threading.Lock()
+        self._pendentes = 0
+        self._stats = {"arquivos": 0, "falhas": 0, "segundos": 0.0}
+
+    def agenda(self, lote, tarefas) -> None:
+        tarefas = list(tarefas)
+        resultados = [None] * len(tarefas)
+        restantes = [len(tarefas)]
+        with self._lock:
+            self._pendentes += 1
+
+        def conclui(posicao, futuro):
+            resultados[posicao] = futuro.exception() or futuro.result()
+            with self._lock:
+                restantes[0] -= 1
+                terminou = restantes[0] == 0
+            if terminou:
+                self._concluidos.put((lote, resultados))
+
+        if not tarefas:
+            self._concluidos.put((lote, resultados))
+        for posicao, tarefa in enumerate(tarefas):
+            futuro = self._executor.submit(self._executa, tarefa)
+            futuro.add_done_callback(lambda futuro, posicao=posicao: conclui(posicao, futuro))
+
+    def _executa(self, tarefa):
+        inicio = time.time()
+        try:
+            resultado = tarefa()
+        except Exception as e:
+            logger.error(f"Erro ao baixar arquivo: {str(e)}")
+            with self._lock:
+                self._stats["falhas"] += 1
+            raise
+        with self._lock:
+            self._stats["arquivos"] += 1
+            self._stats["segundos"] += time.time() - inicio
+        return resultado
+
+    def concluidos(self, espera: bool = False):
+        """gera os lotes já concluídos; com `espera`, aguarda até que todos os agendados terminem"""
+        while True:
+            with self._lock:
+                if self._pendentes == 0:
+                    return
+            try:
+                lote, resultados = self._concluidos.get(block=espera)
+            except queue.Empty:
+                return
+            with self._lock:
+                self._pendentes -= 1
+            yield lote, resultados
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["lotes_pendentes"] = self._pendentes
+        return stats
+
+    def fechar(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
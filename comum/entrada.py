@@ -0,0 +1,116 @@
+import csv
+import os
+import pandas as pd
+
+COLUNA_PROCESSO = "PROCESSO"
+COLUNA_BRADESCO = "BRADESCO"
+TAMANHO_LOTE_PARQUET = 1024
+AMOSTRA_CSV = 64 * 1024  # bytes usados para descobrir o separador do CSV
+
+class EntradaException(Exception):
+    pass
+
+class PlanilhaProcessos:
+    """Linhas (PROCESSO, BRADESCO) da planilha de entrada, lidas uma a uma sem carregar o arquivo.
+
+    Aceita .xlsx/.xlsm (openpyxl em modo read-only), .csv e .parquet (requer o pacote pyarrow);
+    outros formatos são lidos inteiros pelo pandas, como antes. `total` é o número de linhas
+    informado pelo próprio arquivo, quando ele o informa, e fica disponível ao iniciar a leitura.
+    """
+
+    def __init__(self, caminho: str) -> None:
+        self.caminho = caminho
+        self.total = None
+
+    def __iter__(self):
+        extensao = os.path.splitext(self.caminho)[1].lower()
+        if extensao in (".xlsx", ".xlsm"):
+            linhas = self._le_xlsx()
+        elif extensao == ".csv":
+            linhas = self._le_csv()
+        elif extensao == ".parquet":
+            linhas = self._le_parquet()
+        else:
+            linhas = self._le_pandas()
+        for processo, bradesco in linhas:
+            processo = _valor(processo)
+            if processo is None or str(processo).strip() == "":
+                continue
+            yield processo, _valor(bradesco)
+
+    def _le_xlsx(self):
+        import openpyxl
+
+        workbook = openpyxl.load_workbook(self.caminho, read_only=True, data_only=True)
+        try:
+            planilha = workbook.active
+            linhas = planilha.iter_rows(values_only=True)
+            cabecalho = next(linhas, None)
+            if cabecalho is None:
+                return
+            posicao_processo, posicao_bradesco = _posicoes(cabecalho)
+            # dimensão gravada no arquivo; pode faltar em planilhas geradas por outros programas
+            if planilha.max_row:
+                self.total = planilha.max_row - 1
+            for linha in linhas:
+                yield _coluna(linha, posicao_processo), _coluna(linha, posicao_bradesco)
+        finally:
+            workbook.close()
+
+    def _le_csv(self):
+        with open(self.caminho, newline="", encoding="utf-8-sig") as arq:
+            amostra = arq.read(AMOSTRA_CSV)
+            arq.seek(0)
+            try:
+                dialeto = csv.Sniffer().sniff(amostra, delimiters=";,\t")
+            except csv.Error:
+                dialeto = csv.excel
+            linhas = csv.reader(arq, dialeto)
+            cabecalho = next(linhas, None)
+            if cabecalho is None:
+                return
+            posicao_processo, posicao_bradesco = _posicoes(cabecalho)
+            for linha in linhas:
+                yield _coluna(linha, posicao_processo), _coluna(linha, posicao_bradesco)
+
+    def _le_parquet(self):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise EntradaException("A leitura de planilhas .parquet requer o pacote pyarrow")
+
+        arquivo = pq.ParquetFile(self.caminho)
+        nomes = arquivo.schema_arrow.names
+        posicao_processo, posicao_bradesco = _posicoes(nomes)
+        self.total = arquivo.metadata.num_rows
+        colunas = [nomes[posicao_processo], nomes[posicao_bradesco]]
+        for lote in arquivo.iter_batches(batch_size=TAMANHO_LOTE_PARQUET, columns=colunas):
+            yield from zip(*(lote.column(nome).to_pylist() for nome in colunas))
+
+    def _le_pandas(self):
+        df = pd.read_excel(self.caminho)
+        posicao_processo, posicao_bradesco = _posicoes(df.columns)
+        self.total = len(df)
+        yield from df.iloc[:, [posicao_processo, posicao_bradesco]].itertuples(index=False, name=None)
+
+def _posicoes(cabecalho) -> tuple:
+    """posições das colunas PROCESSO e BRADESCO, sem diferenciar maiúsculas e espaços"""
+    nomes = [str(nome).strip().upper() if nome is not None else "" for nome in cabecalho]
+    posicoes = []
+    for coluna in (COLUNA_PROCESSO, COLUNA_BRADESCO):
+        if coluna not in nomes:
+            raise EntradaException(f"Coluna {coluna} não encontrada na planilha de entrada")
+        posicoes.append(nomes.index(coluna))
+    return tuple(posicoes)
+
+def _coluna(linha, posicao):
+    return linha[posicao] if posicao < len(linha) else None
+
+def _valor(valor):
+    # números inteiros gravados pelo Excel como float (ex.: 123.0)
+    if isinstance(valor, float):
+        if valor != valor:
+            return None
+        if valor.is_integer():
+            return int(valor)
+    return valor
@@ -0,0 +1,66 @@
+import datetime
+import sqlite3
+from .lote_movimentacoes import LoteMovimentacoes, formata_data
+
+ARQUIVO_EVENTOS = "eventos_conhecidos.sqlite3"
+
+class EventosStore:
+    """Base local dos eventos já vistos de cada processo, usada pelo modo --delta.
+
+    Um evento é identificado por (processo, evento, data), como produzidos por
+    `HTMLParser.lote_movimentacoes` e `ProjudiData.extract_tabela_movimentacoes`. A data é
+    guardada como 'dd-mm-aaaa', o formato das bases gravadas por versões anteriores.
+    """
+
+    def __init__(self, caminho: str = ARQUIVO_EVENTOS) -> None:
+        self.caminho = caminho
+        self.conn = sqlite3.connect(caminho)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS eventos (
+                processo TEXT NOT NULL,
+                evento TEXT NOT NULL,
+                data TEXT NOT NULL,
+                descricao TEXT,
+                visto_em TEXT NOT NULL,
+                PRIMARY KEY (processo, evento, data)
+            )
+            """
+        )
+        self.conn.commit()
+
+    def novas(self, lote: LoteMovimentacoes) -> LoteMovimentacoes:
+        """devolve um lote só com as movimentações que ainda não estão na base.
+
+        Os eventos conhecidos de cada processo são consultados uma única vez. Linhas de aviso
+        ("Nenhuma movimentação correspondeu...") não têm evento e nunca são novas.
+        """
+        conhecidos_por_processo = {}
+        posicoes = []
+        for posicao, (processo, evento, data) in enumerate(lote.valores(("processo", "evento", "data"))):
+            if not evento:
+                continue
+            conhecidos = conhecidos_por_processo.get(processo)
+            if conhecidos is None:
+                conhecidos = conhecidos_por_processo[processo] = set(
+                    self.conn.execute("SELECT evento, data FROM eventos WHERE processo = ?", (processo,))
+                )
+            if (evento, formata_data(data)) not in conhecidos:
+                posicoes.append(posicao)
+        return lote.seleciona(posicoes)
+
+    def registra(self, lotes) -> None:
+        visto_em = datetime.datetime.now().isoformat(timespec="seconds")
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO eventos (processo, evento, data, descricao, visto_em) VALUES (?, ?, ?, ?, ?)",
+            (
+                (processo, evento, formata_data(data), descricao, visto_em)
+                for lote in lotes
+                for processo, evento, data, descricao in lote.valores(("processo", "evento", "data", "descricao"))
+                if evento
+            ),
+        )
+        self.conn.commit()
+
+    def fecha(self) -> None:
+        self.conn.close()
@@ -0,0 +1,78 @@
+import re
+import threading
+import unicodedata
+
+# Palavras usadas com --filtrar quando o config.ini não define `palavras_chave`
+PALAVRAS_CHAVE = ("TRANSITADO EM JULGADO", "TRANSITO", "BAIXA", "DEFINITIVAMENTE", "SENTENÇA", "JULGAD", "DESISTÊNCIA", "HOMOL")
+
+MANTER = "manter"
+DESCARTAR = "descartar"
+PARAR = "parar"
+
+def normaliza_texto(texto: str) -> str:
+    """maiúsculas sem acentos, para comparar 'Sentença' com 'SENTENCA'"""
+    decomposto = unicodedata.normalize("NFKD", texto)
+    return "".join(c for c in decomposto if not unicodedata.combining(c)).upper()
+
+class FiltroEventos:
+    """Seleciona as movimentações por palavras-chave da descrição e por período.
+
+    As palavras viram uma única expressão regular, compilada uma vez e comparada com a descrição
+    normalizada (sem acentos, maiúsculas). O mesmo filtro é compartilhado pelos extratores de
+    todos os tribunais, inclusive entre threads.
+    """
+
+    def __init__(self, palavras_chave=(), data_inicial=None, data_final=None) -> None:
+        palavras = sorted({normaliza_texto(p.strip()) for p in palavras_chave if p.strip()}, key=len, reverse=True)
+        self.palavras_chave = palavras
+        self._regex = re.compile("|".join(re.escape(p) for p in palavras)) if palavras else None
+        self.data_inicial = data_inicial
+        self.data_final = data_final
+        self._lock = threading.Lock()
+        self._stats = {"mantidos": 0, "sem_palavra_chave": 0, "fora_do_periodo": 0, "tabelas_interrompidas": 0}
+
+    def assinatura(self) -> str:
+        """identifica a configuração do filtro (ex.: para separar resultados filtrados no cache)"""
+        return f"{'|'.join(self.palavras_chave)}@{self.data_inicial or ''}..{self.data_final or ''}"
+
+    def avaliador(self):
+        """função (data, descricao) -> MANTER, DESCARTAR ou PARAR para as linhas de uma tabela, na ordem.
+
+        PARAR só é devolvido quando a tabela está em ordem decrescente de data (a mais recente
+        primeiro, como no EPROC e no Projudi) e a linha já é anterior à data inicial: as linhas
+        seguintes também estariam fora do período.
+        """
+        anterior = None
+        decrescente = True
+
+        def avalia(data, descricao):
+            nonlocal anterior, decrescente
+            if anterior is not None and data > anterior:
+                decrescente = False
+            recua = anterior is not None and data < anterior
+            anterior = data
+
+            if self.data_inicial is not None and data < self.data_inicial:
+                if decrescente and recua:
+                    self._conta("tabelas_interrompidas")
+                    return PARAR
+                self._conta("fora_do_periodo")
+                return DESCARTAR
+            if self.data_final is not None and data > self.data_final:
+                self._conta("fora_do_periodo")
+                return DESCARTAR
+            if self._regex is not None and not self._regex.search(normaliza_texto(descricao)):
+                self._conta("sem_palavra_chave")
+                return DESCARTAR
+            self._conta("mantidos")
+            return MANTER
+
+        return avalia
+
+    def _conta(self, chave: str) -> None:
+        with self._lock:
+            self._stats[chave] += 1
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
@@ -0,0 +1,277 @@
+from openpyxl import Workbook
+from bisect import bisect_right
+import json
+import logging
+import math
+import os
+from .lote_movimentacoes import LoteMovimentacoes, formata_data
+
+logger = logging.getLogger()
+
+TAMANHO_LOTE = 1000
+# chave das linhas do arquivo que trazem um lote colunar (as demais são linhas avulsas, formato antigo)
+CHAVE_LOTE = "lote"
+
+class JournalParcial:
+    """Arquivo JSONL onde os resultados parciais são apenas acrescentados.
+
+    Cada salvamento grava somente as linhas novas, então o custo não cresce com o tamanho
+    da execução. As linhas são agrupadas em lotes colunares (`LoteMovimentacoes`) de até
+    TAMANHO_LOTE linhas, um por linha do arquivo, sem repetir os nomes das colunas e os valores
+    repetidos. A planilha é montada uma única vez no final por `exporta_xlsx`, que é onde as
+    datas recebem o formato 'dd-mm-aaaa'.
+
+    Cada linha de movimentação tem uma posição no journal (a contagem das linhas gravadas antes
+    dela), e `lote(inicio, fim)` lê de volta um intervalo delas sem percorrer o arquivo inteiro.
+    """
+
+    def __init__(self, caminho: str) -> None:
+        self.caminho = caminho
+        self._final_verificado = False
+        self._arquivo = None
+        self._lote = LoteMovimentacoes()
+        # início em bytes e posição da primeira linha de movimentação de cada linha do arquivo;
+        # montado na primeira gravação ou leitura, depois de um eventual `trunca`
+        self._offsets = None
+        self._primeiras = None
+        self._linhas_arquivo = 0
+        self._bytes_arquivo = 0
+
+    def _indexa(self) -> None:
+        """percorre uma única vez o que já está no arquivo (ex.: num --resume) para montar o índice"""
+        if self._offsets is not None:
+            return
+        if not self._final_verificado:
+            self._termina_linha_truncada()
+        self._offsets = []
+        self._primeiras = []
+        self._linhas_arquivo = 0
+        self._bytes_arquivo = 0
+        if not os.path.exists(self.caminho):
+            return
+        with open(self.caminho, "rb") as arq:
+            for texto in arq:
+                offset = self._bytes_arquivo
+                self._bytes_arquivo += len(texto)
+                lote = self._decodifica(texto)
+                if lote is None:
+                    continue
+                self._offsets.append(offset)
+                self._primeiras.append(self._linhas_arquivo)
+                self._linhas_arquivo += len(lote)
+
+    @staticmethod
+    def _decodifica(texto):
+        """lote de uma linha do arquivo (uma linha avulsa vira um lote de uma linha); None se inválida"""
+        if not texto.strip():
+            return None
+        try:
+            registro = json.loads(texto)
+        except json.JSONDecodeError:
+            return None
+        if CHAVE_LOTE not in registro:
+            return LoteMovimentacoes.de_linhas([registro])
+        return LoteMovimentacoes.de_serializado(registro[CHAVE_LOTE])
+
+    @property
+    def total_linhas(self) -> int:
+        """linhas já acrescentadas ao journal, gravadas ou ainda no lote em andamento"""
+        self._indexa()
+        return self._linhas_arquivo + len(self._lote)
+
+    def _termina_linha_truncada(self) -> None:
+        """garante que uma linha incompleta deixada por uma queda não seja emendada na próxima"""
+        self._final_verificado = True
+        if not os.path.exists(self.caminho) or os.path.getsize(self.caminho) == 0:
+            return
+        with open(self.caminho, "rb+") as arq:
+            arq.seek(-1, os.SEEK_END)
+            if arq.read(1) != b"\n":
+                arq.write(b"\n")
+
+    def escreve(self, linha: dict) -> None:
+        """acrescenta uma linha ao lote em andamento; só é garantida em disco após `sincroniza`"""
+        self._lote.acrescenta(linha)
+        if len(self._lote) >= TAMANHO_LOTE:
+            self._grava_lote()
+
+    def escreve_lote(self, lote: LoteMovimentacoes) -> tuple:
+        """acrescenta as linhas de um lote ao lote em andamento; só são garantidas em disco após `sincroniza`.
+
+        Devolve o intervalo (inicio, fim) das posições das linhas no journal.
+        """
+        primeira = self.total_linhas
+        inicio = 0
+        while inicio < len(lote):
+            fim = min(len(lote), inicio + TAMANHO_LOTE - len(self._lote))
+            self._lote.estende(lote, inicio, fim)
+            inicio = fim
+            if len(self._lote) >= TAMANHO_LOTE:
+                self._grava_lote()
+        return primeira, primeira + len(lote)
+
+    def descarta(self, posicao: int) -> None:
+        """desfaz as linhas acrescentadas a partir de `posicao`, ainda não confirmadas pelo checkpoint
+        (ex.: as de um processo cuja tabela falhou no meio da leitura)"""
+        self._indexa()
+        if posicao >= self._linhas_arquivo:
+            self._lote = self._lote.recorte(0, posicao - self._linhas_arquivo)
+            return
+        # a linha do arquivo onde `posicao` cai volta para o lote em andamento, só com as linhas anteriores
+        indice = bisect_right(self._primeiras, posicao) - 1
+        primeira = self._primeiras[indice]
+        anteriores = self.lote(primeira, posicao)
+        if self._arquivo is not None:
+            self._arquivo.flush()
+        with open(self.caminho, "rb+") as arq:
+            arq.truncate(self._offsets[indice])
+        self._bytes_arquivo = self._offsets[indice]
+        self._linhas_arquivo = primeira
+        del self._offsets[indice:]
+        del self._primeiras[indice:]
+        self._lote = anteriores
+
+    def _grava_lote(self) -> None:
+        if not len(self._lote):
+            return
+        self._indexa()
+        if self._arquivo is None:
+            self._arquivo = open(self.caminho, "ab")
+        texto = json.dumps({CHAVE_LOTE: self._lote.serializa()}, ensure_ascii=False, default=str) + "\n"
+        dados = texto.encode("utf-8")
+        self._arquivo.write(dados)
+        self._offsets.append(self._bytes_arquivo)
+        self._primeiras.append(self._linhas_arquivo)
+        self._bytes_arquivo += len(dados)
+        self._linhas_arquivo += len(self._lote)
+        self._lote = LoteMovimentacoes()
+
+    def lote(self, inicio: int, fim: int) -> LoteMovimentacoes:
+        """as linhas das posições `inicio` a `fim` do journal, lidas do arquivo ou do lote em andamento"""
+        self._indexa()
+        resultado = LoteMovimentacoes()
+        if inicio < min(fim, self._linhas_arquivo):
+            if self._arquivo is not None:
+                self._arquivo.flush()
+            posicao = bisect_right(self._primeiras, inicio) - 1
+            with open(self.caminho, "rb") as arq:
+                while posicao < len(self._primeiras) and self._primeiras[posicao] < fim:
+                    primeira = self._primeiras[posicao]
+                    arq.seek(self._offsets[posicao])
+                    lote = self._decodifica(arq.readline())
+                    resultado.estende(lote, max(inicio - primeira, 0), min(fim - primeira, len(lote)))
+                    posicao += 1
+        if fim > self._linhas_arquivo:
+            resultado.estende(self._lote, max(inicio - self._linhas_arquivo, 0), fim - self._linhas_arquivo)
+        return resultado
+
+    def sincroniza(self) -> None:
+        """força a escrita em disco das linhas já acrescentadas"""
+        self._grava_lote()
+        if self._arquivo is not None:
+            self._arquivo.flush()
+            os.fsync(self._arquivo.fileno())
+
+    def fecha(self) -> None:
+        self._grava_lote()
+        if self._arquivo is not None:
+            self.sincroniza()
+            self._arquivo.close()
+            self._arquivo = None
+
+    def acrescenta(self, linhas) -> int:
+        """grava as linhas no final do arquivo e força a escrita em disco; devolve quantas foram gravadas"""
+        total = 0
+        for linha in linhas:
+            self.escreve(linha)
+            total += 1
+        self.sincroniza()
+        return total
+
+    def existe(self) -> bool:
+        return len(self._lote) > 0 or os.path.exists(self.caminho)
+
+    def tamanho(self) -> int:
+        """bytes já garantidos em disco, registrados pelo checkpoint a cada salvamento"""
+        self.sincroniza()
+        return os.path.getsize(self.caminho) if os.path.exists(self.caminho) else 0
+
+    def trunca(self, tamanho: int) -> None:
+        """descarta o que foi gravado depois de `tamanho` bytes (linhas ainda não confirmadas pelo checkpoint)"""
+        self.fecha()
+        self._offsets = None
+        if not os.path.exists(self.caminho) or os.path.getsize(self.caminho) <= tamanho:
+            return
+        logger.warning(
+            f"{os.path.getsize(self.caminho) - tamanho} bytes não confirmados descartados de {self.caminho}"
+        )
+        with open(self.caminho, "rb+") as arq:
+            arq.truncate(tamanho)
+
+    def _lotes(self):
+        """percorre os lotes gravados, ignorando uma eventual linha truncada por queda do processo.
+
+        Linhas avulsas, gravadas por versões anteriores antes de um --resume, são reunidas em lotes.
+        """
+        self.fecha()
+        if not self.existe():
+            return
+        avulsas = LoteMovimentacoes()
+        with open(self.caminho, encoding="utf-8") as arq:
+            for num_linha, texto in enumerate(arq, 1):
+                if not texto.strip():
+                    continue
+                try:
+                    registro = json.loads(texto)
+                except json.JSONDecodeError:
+                    logger.warning(f"Linha {num_linha} inválida ignorada em {self.caminho}")
+                    continue
+                if CHAVE_LOTE not in registro:
+                    avulsas.acrescenta(registro)
+                    continue
+                if len(avulsas):
+                    yield avulsas
+                    avulsas = LoteMovimentacoes()
+                yield LoteMovimentacoes.de_serializado(registro[CHAVE_LOTE])
+        if len(avulsas):
+            yield avulsas
+
+    def linhas(self):
+        """percorre as linhas gravadas como dicts"""
+        for lote in self._lotes():
+            yield from lote.linhas()
+
+    def colunas(self, colunas_iniciais=()) -> list:
+        """colunas na ordem em que aparecem no journal, com `colunas_iniciais` na frente"""
+        vistas = dict.fromkeys(colunas_iniciais)
+        for lote in self._lotes():
+            for coluna in lote.colunas:
+                if coluna not in vistas:
+                    vistas[coluna] = None
+        return list(vistas)
+
+    def exporta_xlsx(self, destino: str, colunas_iniciais=()) -> int:
+        """monta a planilha em uma passada de streaming sobre o journal; devolve o número de linhas escritas"""
+        colunas = self.colunas(colunas_iniciais)
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet()
+        ws.append(colunas)
+        total = 0
+        for lote in self._lotes():
+            for valores in lote.valores(colunas):
+                ws.append([self.__valor_celula(valor) for valor in valores])
+            total += len(lote)
+        wb.save(destino)
+        return total
+
+    def remove(self) -> None:
+        self.fecha()
+        if self.existe():
+            os.remove(self.caminho)
+        self._offsets = None
+
+    @staticmethod
+    def __valor_celula(valor):
+        if isinstance(valor, float) and math.isnan(valor):
+            return None
+        return formata_data(valor)
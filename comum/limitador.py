@@ -0,0 +1,198 @@
+from collections import deque
+from urllib.parse import urlsplit
+import asyncio
+import logging
+import threading
+import time
+import requests
+from .prazo import PrazoEsgotadoException, restante, timeout_requisicao, verifica_prazo
+
+logger = logging.getLogger()
+
+TAXA_INICIAL = 2.0  # requisições por segundo por host
+TAXA_MINIMA = 0.2
+TAXA_MAXIMA = 20.0
+AUMENTO_POR_SUCESSO = 0.05  # aumento aditivo a cada resposta saudável
+FATOR_ERRO = 0.5  # redução multiplicativa após erro ou sobrecarga do servidor
+FATOR_CAPTCHA = 0.7  # redução multiplicativa após uma página de captcha
+FATOR_LENTIDAO = 0.85  # redução multiplicativa quando a latência sobe
+LATENCIA_LENTA = 2.0  # latência média acima deste múltiplo da referência conta como lentidão
+INTERVALO_REDUCAO = 10  # segundos mínimos entre duas reduções
+JANELA = 100  # respostas consideradas na proporção de captchas e erros
+SUAVIZACAO_LATENCIA = 0.2
+DERIVA_REFERENCIA = 0.01  # quanto a latência de referência acompanha uma média mais alta
+STATUS_SOBRECARGA = (429, 500, 502, 503, 504)
+
+class LimitadorAdaptativo:
+    """Token bucket de um host com taxa ajustada por AIMD.
+
+    Cada resposta saudável aumenta a taxa um pouco; erros, páginas de captcha e latência
+    acima da referência reduzem a taxa multiplicativamente (no máximo uma vez a cada
+    `INTERVALO_REDUCAO` segundos), de modo que a taxa oscila logo abaixo do ponto em que o
+    servidor começa a reagir.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        taxa_inicial: float = TAXA_INICIAL,
+        taxa_minima: float = TAXA_MINIMA,
+        taxa_maxima: float = TAXA_MAXIMA,
+    ) -> None:
+        self.host = host
+        self.taxa_minima = taxa_minima
+        self.taxa_maxima = taxa_maxima
+        self.taxa = min(max(taxa_inicial, taxa_minima), taxa_maxima)
+
+        self._lock = threading.Lock()
+        self._tokens = 1.0
+        self._reposto_em = time.monotonic()
+        self._proxima_reducao = 0.0
+        self._latencia_media = None
+        self._latencia_referencia = None
+        self._janela = deque(maxlen=JANELA)
+        self._stats = {"requisicoes": 0, "erros": 0, "captchas": 0, "reducoes": 0, "segundos_espera": 0.0}
+
+    def aguarda(self) -> float:
+        """bloqueia até haver um token disponível e devolve quanto tempo esperou.
+
+        Se a espera passar do que resta do prazo da consulta atual, levanta PrazoEsgotadoException
+        sem dormir até lá.
+        """
+        esperado = 0.0
+        while True:
+            espera = self._retira_token(esperado)
+            if espera is None:
+                return esperado
+            time.sleep(espera)
+            esperado += espera
+
+    async def aguarda_async(self) -> float:
+        """como o aguarda, mas liberando o event loop durante a espera"""
+        esperado = 0.0
+        while True:
+            espera = self._retira_token(esperado)
+            if espera is None:
+                return esperado
+            await asyncio.sleep(espera)
+            esperado += espera
+
+    def _retira_token(self, esperado: float):
+        """retira um token e devolve None, ou devolve quanto falta para o próximo token"""
+        with self._lock:
+            agora = time.monotonic()
+            # rajada de no máximo um segundo de taxa acumulada
+            capacidade = max(1.0, self.taxa)
+            self._tokens = min(capacidade, self._tokens + (agora - self._reposto_em) * self.taxa)
+            self._reposto_em = agora
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                self._stats["segundos_espera"] += esperado
+                return None
+            espera = (1.0 - self._tokens) / self.taxa
+        segundos = restante()
+        if segundos is not None and espera > segundos:
+            raise PrazoEsgotadoException(f"Prazo esgotado aguardando a vez na fila de {self.host}")
+        return espera
+
+    def registra(self, latencia: float, erro: bool = False, captcha: bool = False) -> None:
+        """ajusta a taxa a partir do resultado de uma requisição"""
+        with self._lock:
+            self._stats["requisicoes"] += 1
+            self._stats["erros"] += erro
+            self._stats["captchas"] += captcha
+            self._janela.append((erro, captcha))
+
+            if not erro:
+                if self._latencia_media is None:
+                    self._latencia_media = latencia
+                else:
+                    self._latencia_media += SUAVIZACAO_LATENCIA * (latencia - self._latencia_media)
+                if self._latencia_referencia is None or self._latencia_media < self._latencia_referencia:
+                    self._latencia_referencia = self._latencia_media
+                else:
+                    self._latencia_referencia += DERIVA_REFERENCIA * (self._latencia_media - self._latencia_referencia)
+
+            if erro:
+                self._reduz(FATOR_ERRO, "erro")
+            elif captcha:
+                self._reduz(FATOR_CAPTCHA, "captcha")
+            elif self._latencia_media is not None and self._latencia_media > LATENCIA_LENTA * self._latencia_referencia:
+                self._reduz(FATOR_LENTIDAO, f"latência média {self._latencia_media:.2f}s")
+            else:
+                self.taxa = min(self.taxa_maxima, self.taxa + AUMENTO_POR_SUCESSO)
+
+    def _reduz(self, fator: float, motivo: str) -> None:
+        agora = time.monotonic()
+        if agora < self._proxima_reducao:
+            return
+        self._proxima_reducao = agora + INTERVALO_REDUCAO
+        anterior = self.taxa
+        self.taxa = max(self.taxa_minima, self.taxa * fator)
+        self._stats["reducoes"] += 1
+        logger.info(f"[{self.host}] Taxa reduzida de {anterior:.2f} para {self.taxa:.2f} req/s ({motivo})")
+
+    @property
+    def proporcao_captcha(self) -> float:
+        with self._lock:
+            if not self._janela:
+                return 0.0
+            return sum(captcha for _, captcha in self._janela) / len(self._janela)
+
+    def estatisticas(self) -> dict:
+        proporcao_captcha = self.proporcao_captcha
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update(
+                taxa=round(self.taxa, 2),
+                proporcao_captcha=round(proporcao_captcha, 3),
+                latencia_media=round(self._latencia_media, 3) if self._latencia_media is not None else None,
+            )
+        return stats
+
+
+_limitadores = {}
+_lock_limitadores = threading.Lock()
+_configuracao = {}
+
+def configura_limitadores(**parametros) -> None:
+    """define os parâmetros (taxa_inicial, taxa_minima, taxa_maxima) dos limitadores criados daqui em diante"""
+    with _lock_limitadores:
+        _configuracao.update({chave: valor for chave, valor in parametros.items() if valor})
+
+def limitador_compartilhado(url: str) -> LimitadorAdaptativo:
+    """devolve o limitador do host da URL, compartilhado por todas as sessões que falam com ele"""
+    host = urlsplit(url).netloc
+    with _lock_limitadores:
+        if host not in _limitadores:
+            _limitadores[host] = LimitadorAdaptativo(host, **_configuracao)
+        return _limitadores[host]
+
+def estatisticas_limitadores() -> dict:
+    with _lock_limitadores:
+        limitadores = dict(_limitadores)
+    return {host: limitador.estatisticas() for host, limitador in limitadores.items()}
+
+def requisicao_limitada(session: requests.Session, metodo: str, url: str, marcadores_captcha=(), **kwargs) -> requests.Response:
+    """faz a requisição respeitando o limitador do host e o prazo da consulta atual e informa ao limitador o resultado"""
+    limitador = limitador_compartilhado(url)
+    verifica_prazo(f"{metodo} {url}")
+    limitador.aguarda()
+    kwargs.setdefault("timeout", timeout_requisicao())
+    inicio = time.monotonic()
+    try:
+        r = session.request(metodo, url, **kwargs)
+    except requests.RequestException as e:
+        limitador.registra(time.monotonic() - inicio, erro=True)
+        # timeout, ou a última tentativa (comum.transporte) falhou já sem tempo para outra
+        segundos = restante()
+        if segundos is not None and segundos <= 0:
+            raise PrazoEsgotadoException(f"Prazo esgotado aguardando {metodo} {url}") from e
+        raise
+    limitador.registra(
+        time.monotonic() - inicio,
+        erro=r.status_code in STATUS_SOBRECARGA,
+        # em downloads (stream=True) o corpo não é lido aqui
+        captcha=not kwargs.get("stream") and any(marcador in r.content for marcador in marcadores_captcha),
+    )
+    return r
@@ -0,0 +1,228 @@
+from array import array
+from datetime import date, datetime
+from itertools import repeat
+
+# Colunas com poucos valores distintos, guardados uma única vez por lote
+COLUNAS_CATEGORICAS = frozenset({"processo", "usuario", "tipo", "BRADESCO", "ARQUIVOS", "tipo_arquivo", "Erro"})
+# Colunas de datas (`date`), guardadas como ordinais e formatadas apenas na exportação
+COLUNAS_DATA = frozenset({"data"})
+FORMATO_DATA = "%d-%m-%Y"
+
+def formata_data(valor):
+    """'dd-mm-aaaa' de um `date`; outros valores (None, textos de versões anteriores) ficam como estão"""
+    if isinstance(valor, date):
+        return valor.strftime(FORMATO_DATA)
+    return valor
+
+class _ColunaSimples:
+    """um valor por linha, numa lista"""
+
+    def __init__(self, tamanho: int = 0, valores=None) -> None:
+        self.valores = valores if valores is not None else [None] * tamanho
+
+    def acrescenta(self, valor) -> None:
+        self.valores.append(valor)
+
+    def atribui(self, posicao: int, valor) -> None:
+        self.valores[posicao] = valor
+
+    def fatia(self, inicio: int, fim: int) -> list:
+        return self.valores[inicio:fim]
+
+    def serializa(self) -> dict:
+        return {"valores": self.valores}
+
+class _ColunaCategorica:
+    """valores distintos numa lista e, por linha, só a posição do valor (array de inteiros sem sinal)"""
+
+    def __init__(self, tamanho: int = 0, distintos=None, indices=None) -> None:
+        # a posição 0 é sempre None: coluna ausente na linha
+        self.distintos = distintos if distintos is not None else [None]
+        # a chave inclui o tipo para que 1, 1.0 e True não se confundam
+        self._posicoes = {(valor.__class__, valor): posicao for posicao, valor in enumerate(self.distintos)}
+        self.indices = array("I", indices if indices is not None else [0] * tamanho)
+
+    def _posicao(self, valor) -> int:
+        chave = (valor.__class__, valor)
+        posicao = self._posicoes.get(chave)
+        if posicao is None:
+            posicao = self._posicoes[chave] = len(self.distintos)
+            self.distintos.append(valor)
+        return posicao
+
+    def acrescenta(self, valor) -> None:
+        self.indices.append(self._posicao(valor))
+
+    def atribui(self, posicao: int, valor) -> None:
+        self.indices[posicao] = self._posicao(valor)
+
+    def fatia(self, inicio: int, fim: int) -> list:
+        distintos = self.distintos
+        return [distintos[posicao] for posicao in self.indices[inicio:fim]]
+
+    def serializa(self) -> dict:
+        return {"distintos": self.distintos, "indices": self.indices.tolist()}
+
+class _ColunaData:
+    """uma data por linha, como o ordinal do `date` num array de inteiros sem sinal (0: sem data)"""
+
+    def __init__(self, tamanho: int = 0, ordinais=None) -> None:
+        self.ordinais = array("I", ordinais if ordinais is not None else [0] * tamanho)
+
+    @staticmethod
+    def _ordinal(valor) -> int:
+        if not valor:
+            return 0
+        if isinstance(valor, str):
+            # linhas avulsas de versões anteriores, com a data já formatada
+            valor = datetime.strptime(valor, FORMATO_DATA).date()
+        return valor.toordinal()
+
+    def acrescenta(self, valor) -> None:
+        self.ordinais.append(self._ordinal(valor))
+
+    def atribui(self, posicao: int, valor) -> None:
+        self.ordinais[posicao] = self._ordinal(valor)
+
+    def fatia(self, inicio: int, fim: int) -> list:
+        return [date.fromordinal(ordinal) if ordinal else None for ordinal in self.ordinais[inicio:fim]]
+
+    def serializa(self) -> dict:
+        return {"ordinais": self.ordinais.tolist()}
+
+def _nova_coluna(nome: str, tamanho: int):
+    if nome in COLUNAS_DATA:
+        return _ColunaData(tamanho)
+    if nome in COLUNAS_CATEGORICAS:
+        return _ColunaCategorica(tamanho)
+    return _ColunaSimples(tamanho)
+
+class LoteMovimentacoes:
+    """Linhas de movimentações (ou de erros) guardadas coluna a coluna, em vez de um dict por linha.
+
+    As colunas de COLUNAS_CATEGORICAS guardam cada valor distinto uma única vez e, por linha,
+    apenas a sua posição; as de COLUNAS_DATA guardam o ordinal de cada `date`; as demais guardam
+    uma lista de valores. As colunas ficam na ordem em que aparecem nas linhas, e uma coluna
+    ausente numa linha vale None nela.
+
+    Os extratores acrescentam os valores de cada linha direto nas colunas (`acrescenta_valores`);
+    o formato de exibição das datas só é aplicado na exportação (`formata_data`).
+    """
+
+    def __init__(self, colunas=()) -> None:
+        self.colunas = {}
+        self.tamanho = 0
+        for nome in colunas:
+            self.colunas[nome] = _nova_coluna(nome, 0)
+
+    def __len__(self) -> int:
+        return self.tamanho
+
+    def acrescenta(self, linha: dict) -> int:
+        """guarda a linha e devolve a sua posição no lote"""
+        for nome in linha:
+            if nome not in self.colunas:
+                self.colunas[nome] = _nova_coluna(nome, self.tamanho)
+        for nome, coluna in self.colunas.items():
+            coluna.acrescenta(linha.get(nome))
+        self.tamanho += 1
+        return self.tamanho - 1
+
+    def acrescenta_valores(self, valores) -> int:
+        """guarda uma linha com um valor para cada coluna, na ordem das colunas; devolve a sua posição"""
+        if len(valores) != len(self.colunas):
+            raise ValueError(f"{len(valores)} valores para {len(self.colunas)} colunas")
+        for coluna, valor in zip(self.colunas.values(), valores):
+            coluna.acrescenta(valor)
+        self.tamanho += 1
+        return self.tamanho - 1
+
+    def atribui(self, nome: str, posicao: int, valor) -> None:
+        """troca o valor de `nome` numa linha já guardada, criando a coluna se preciso"""
+        if nome not in self.colunas:
+            self.colunas[nome] = _nova_coluna(nome, self.tamanho)
+        self.colunas[nome].atribui(posicao, valor)
+
+    def define(self, nome: str, valor) -> None:
+        """dá o mesmo valor de `nome` a todas as linhas, mantendo a coluna na sua posição"""
+        coluna = _nova_coluna(nome, 0)
+        for _ in range(self.tamanho):
+            coluna.acrescenta(valor)
+        self.colunas[nome] = coluna
+
+    def remove(self, nome: str) -> list:
+        """retira a coluna e devolve os seus valores (None em todas as linhas se ela não existe)"""
+        coluna = self.colunas.pop(nome, None)
+        return coluna.fatia(0, self.tamanho) if coluna is not None else [None] * self.tamanho
+
+    def estende(self, outro: "LoteMovimentacoes", inicio: int = 0, fim: int = None) -> None:
+        """acrescenta as linhas de `inicio` a `fim` de outro lote"""
+        fim = outro.tamanho if fim is None else fim
+        for nome in outro.colunas:
+            if nome not in self.colunas:
+                self.colunas[nome] = _nova_coluna(nome, self.tamanho)
+        for nome, coluna in self.colunas.items():
+            if nome in outro.colunas:
+                valores = outro.colunas[nome].fatia(inicio, fim)
+            else:
+                valores = repeat(None, fim - inicio)
+            for valor in valores:
+                coluna.acrescenta(valor)
+        self.tamanho += fim - inicio
+
+    def recorte(self, inicio: int, fim: int) -> "LoteMovimentacoes":
+        """novo lote com as linhas de `inicio` a `fim`"""
+        lote = LoteMovimentacoes()
+        lote.estende(self, inicio, fim)
+        return lote
+
+    def seleciona(self, posicoes) -> "LoteMovimentacoes":
+        """novo lote só com as linhas das `posicoes`, na ordem dada"""
+        lote = LoteMovimentacoes(self.colunas)
+        nomes = list(self.colunas)
+        valores = list(self.valores(nomes))
+        for posicao in posicoes:
+            lote.acrescenta_valores(valores[posicao])
+        return lote
+
+    def valores(self, colunas, inicio: int = 0, fim: int = None):
+        """gera uma tupla por linha com os valores de `colunas`, nessa ordem"""
+        fim = self.tamanho if fim is None else fim
+        fatias = [
+            self.colunas[nome].fatia(inicio, fim) if nome in self.colunas else repeat(None, fim - inicio)
+            for nome in colunas
+        ]
+        return zip(*fatias)
+
+    def linhas(self, inicio: int = 0, fim: int = None):
+        """gera as linhas como dicts, para quem precisa de uma linha isolada"""
+        nomes = list(self.colunas)
+        for valores in self.valores(nomes, inicio, fim):
+            yield dict(zip(nomes, valores))
+
+    def serializa(self) -> dict:
+        return {
+            "tamanho": self.tamanho,
+            "colunas": {nome: coluna.serializa() for nome, coluna in self.colunas.items()},
+        }
+
+    @classmethod
+    def de_serializado(cls, dados: dict) -> "LoteMovimentacoes":
+        lote = cls()
+        lote.tamanho = dados["tamanho"]
+        for nome, coluna in dados["colunas"].items():
+            if "ordinais" in coluna:
+                lote.colunas[nome] = _ColunaData(ordinais=coluna["ordinais"])
+            elif "indices" in coluna:
+                # inclui a coluna "data" de lotes gravados antes, com as datas já formatadas
+                lote.colunas[nome] = _ColunaCategorica(distintos=coluna["distintos"], indices=coluna["indices"])
+            else:
+                lote.colunas[nome] = _ColunaSimples(valores=coluna["valores"])
+        return lote
+
+    @classmethod
+    def de_linhas(cls, linhas) -> "LoteMovimentacoes":
+        lote = cls()
+        for linha in linhas:
+            lote.acrescenta(linha)
+        return lote
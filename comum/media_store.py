@@ -0,0 +1,145 @@
+import datetime
+import hashlib
+import os
+import sqlite3
+import threading
+
+ARQUIVO_INDICE = "indice.sqlite3"
+DIRETORIO_TEMPORARIO = "tmp"
+TAMANHO_BLOCO_HASH = 1024 * 1024
+# início de uma página HTML: no lugar de um PDF ou imagem, é a tela de login ou uma página de erro
+MARCADORES_HTML = (b"<!doctype html", b"<html", b"<head", b"<body")
+EXTENSOES_HTML = ("html", "htm")
+BYTES_INSPECIONADOS = 1024
+
+class DocumentoInvalidoException(Exception):
+    pass
+
+class MediaStore:
+    """Documentos baixados, guardados uma única vez pelo conteúdo.
+
+    Cada arquivo fica em `<diretorio>/<sha256[:2]>/<sha256>.<extensao>`; o índice SQLite liga
+    (processo, evento, documento) ao arquivo, de modo que um documento já indexado não é
+    baixado de novo e documentos com o mesmo conteúdo ocupam um único arquivo. Um download
+    vazio ou que trouxe uma página HTML no lugar do documento é descartado sem ir para o índice,
+    e entradas assim deixadas por versões anteriores são baixadas de novo.
+    """
+
+    def __init__(self, diretorio: str) -> None:
+        self.diretorio = diretorio
+        os.makedirs(os.path.join(diretorio, DIRETORIO_TEMPORARIO), exist_ok=True)
+        # os downloads gravam no índice a partir das threads do pool
+        self._lock = threading.Lock()
+        # um lock por documento, para que o mesmo documento pedido duas vezes seja baixado uma só
+        self._locks_documentos = {}
+        self.conn = sqlite3.connect(os.path.join(diretorio, ARQUIVO_INDICE), check_same_thread=False)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS documentos (
+                processo TEXT NOT NULL,
+                evento TEXT NOT NULL,
+                documento TEXT NOT NULL,
+                sha256 TEXT NOT NULL,
+                caminho TEXT NOT NULL,
+                tamanho INTEGER NOT NULL,
+                obtido_em TEXT NOT NULL,
+                PRIMARY KEY (processo, evento, documento)
+            )
+            """
+        )
+        self.conn.commit()
+        self._stats = {"reaproveitados": 0, "baixados": 0, "duplicados": 0, "rejeitados": 0, "bytes": 0}
+
+    def consulta(self, processo: str, evento: str, documento: str):
+        """caminho do documento já armazenado, ou None se ele ainda precisa ser baixado"""
+        caminho = self._caminho_indexado(processo, evento, documento)
+        if caminho is not None:
+            with self._lock:
+                self._stats["reaproveitados"] += 1
+        return caminho
+
+    def _caminho_indexado(self, processo, evento, documento):
+        with self._lock:
+            linha = self.conn.execute(
+                "SELECT caminho FROM documentos WHERE processo = ? AND evento = ? AND documento = ?",
+                (str(processo), str(evento), documento),
+            ).fetchone()
+        if linha is None or not os.path.exists(linha[0]):
+            return None
+        try:
+            _confere_conteudo(linha[0], os.path.splitext(linha[0])[1][1:])
+        except DocumentoInvalidoException:
+            return None
+        return linha[0]
+
+    def armazena(self, processo: str, evento: str, documento: str, extensao: str, baixa) -> str:
+        """baixa o documento com `baixa(destino)`, guarda-o pelo hash e o registra no índice"""
+        with self._lock:
+            lock = self._locks_documentos.setdefault((str(processo), str(evento), documento), threading.Lock())
+        with lock:
+            # outro download do mesmo documento pode ter terminado enquanto este esperava
+            caminho = self.consulta(processo, evento, documento)
+            if caminho is None:
+                caminho = self._baixa_e_indexa(processo, evento, documento, extensao, baixa)
+        return caminho
+
+    def _baixa_e_indexa(self, processo, evento, documento, extensao, baixa):
+        # nome temporário estável por documento, para que um download interrompido seja retomado
+        chave = hashlib.sha1(f"{processo}|{evento}|{documento}".encode("utf-8")).hexdigest()
+        temporario = os.path.join(self.diretorio, DIRETORIO_TEMPORARIO, f"{chave}.{extensao}")
+        baixa(temporario)
+        try:
+            _confere_conteudo(temporario, extensao)
+        except DocumentoInvalidoException:
+            # o temporário seria retomado como se fosse o documento no próximo download
+            os.remove(temporario)
+            with self._lock:
+                self._stats["rejeitados"] += 1
+            raise
+
+        sha256 = _sha256_arquivo(temporario)
+        caminho = os.path.join(self.diretorio, sha256[:2], f"{sha256}.{extensao}")
+        tamanho = os.path.getsize(temporario)
+        if os.path.exists(caminho):
+            os.remove(temporario)
+            duplicado = True
+        else:
+            os.makedirs(os.path.dirname(caminho), exist_ok=True)
+            os.replace(temporario, caminho)
+            duplicado = False
+
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO documentos (processo, evento, documento, sha256, caminho, tamanho, obtido_em) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (str(processo), str(evento), documento, sha256, caminho, tamanho,
+                 datetime.datetime.now().isoformat(timespec="seconds")),
+            )
+            self.conn.commit()
+            self._stats["baixados"] += 1
+            self._stats["duplicados"] += duplicado
+            self._stats["bytes"] += tamanho
+        return caminho
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
+
+    def fecha(self) -> None:
+        self.conn.close()
+
+def _confere_conteudo(caminho: str, extensao: str) -> None:
+    """levanta DocumentoInvalidoException se o arquivo está vazio ou é uma página HTML"""
+    with open(caminho, "rb") as arq:
+        inicio = arq.read(BYTES_INSPECIONADOS)
+    if not inicio:
+        raise DocumentoInvalidoException("Documento vazio")
+    if extensao.lower() not in EXTENSOES_HTML and inicio.lstrip().lower().startswith(MARCADORES_HTML):
+        raise DocumentoInvalidoException("Página HTML recebida no lugar do documento (sessão expirada ou erro do servidor)")
+
+def _sha256_arquivo(caminho: str) -> str:
+    sha256 = hashlib.sha256()
+    with open(caminho, "rb") as arq:
+        for bloco in iter(lambda: arq.read(TAMANHO_BLOCO_HASH), b""):
+            sha256.update(bloco)
+    return sha256.hexdigest()
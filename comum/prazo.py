@@ -0,0 +1,93 @@
+from collections import deque
+from contextlib import contextmanager
+import contextvars
+import threading
+import time
+
+TIMEOUT_CONEXAO = 10  # segundos para abrir a conexão
+TIMEOUT_LEITURA = 60  # segundos sem receber bytes do servidor
+TIMEOUT_PROCESSO = 300  # prazo por processo enquanto não há durações suficientes para estimá-lo
+TIMEOUT_PROCESSO_MINIMO = 30
+PERCENTIL = 0.95
+FATOR_PERCENTIL = 3  # prazo = FATOR_PERCENTIL x percentil das durações observadas
+AMOSTRAS_MINIMAS = 20
+JANELA_DURACOES = 200
+
+# instante (time.monotonic) até o qual a consulta atual pode rodar; None = sem prazo
+_limite = contextvars.ContextVar("limite_prazo", default=None)
+
+class PrazoEsgotadoException(Exception):
+    pass
+
+@contextmanager
+def prazo(segundos: float):
+    """define o prazo das requisições feitas pela thread atual dentro do bloco `with`"""
+    token = _limite.set(time.monotonic() + segundos)
+    try:
+        yield
+    finally:
+        _limite.reset(token)
+
+@contextmanager
+def sem_prazo():
+    """executa o bloco sem prazo (ex.: login); o tempo gasto nele não conta para o prazo de quem chamou"""
+    limite = _limite.get()
+    inicio = time.monotonic()
+    token = _limite.set(None)
+    try:
+        yield
+    finally:
+        _limite.reset(token)
+        if limite is not None:
+            _limite.set(limite + time.monotonic() - inicio)
+
+def restante():
+    """segundos que ainda restam do prazo atual, ou None se não há prazo"""
+    limite = _limite.get()
+    if limite is None:
+        return None
+    return limite - time.monotonic()
+
+def verifica_prazo(etapa: str = "") -> None:
+    segundos = restante()
+    if segundos is not None and segundos <= 0:
+        raise PrazoEsgotadoException(f"Prazo esgotado{f' antes de {etapa}' if etapa else ''}")
+
+def timeout_requisicao(leitura: float = TIMEOUT_LEITURA) -> tuple:
+    """(conexão, leitura) para o requests, limitados ao que resta do prazo"""
+    verifica_prazo()
+    segundos = restante()
+    if segundos is None:
+        return TIMEOUT_CONEXAO, leitura
+    return min(TIMEOUT_CONEXAO, segundos), min(leitura, segundos)
+
+class TimeoutAdaptativo:
+    """Prazo por processo de um tribunal, derivado do percentil das durações já observadas.
+
+    Até haver `AMOSTRAS_MINIMAS` consultas vale o `maximo`; depois o prazo passa a
+    `FATOR_PERCENTIL` vezes o percentil, limitado entre `minimo` e `maximo`. Consultas
+    interrompidas pelo prazo também contam, com a duração igual ao prazo que tinham.
+    """
+
+    def __init__(self, maximo: float = TIMEOUT_PROCESSO, minimo: float = TIMEOUT_PROCESSO_MINIMO) -> None:
+        self.maximo = maximo
+        self.minimo = min(minimo, maximo)
+        self._duracoes = deque(maxlen=JANELA_DURACOES)
+        self._lock = threading.Lock()
+
+    def registra(self, duracao: float) -> None:
+        with self._lock:
+            self._duracoes.append(duracao)
+
+    def registra_esgotado(self, prazo: float) -> None:
+        """conta uma consulta interrompida pelo prazo; sem ela o percentil só veria as consultas
+        que terminaram a tempo, e o prazo encolheria até cortar sempre os processos mais lentos"""
+        self.registra(prazo)
+
+    def segundos(self) -> float:
+        with self._lock:
+            if len(self._duracoes) < AMOSTRAS_MINIMAS:
+                return self.maximo
+            ordenadas = sorted(self._duracoes)
+        percentil = ordenadas[min(len(ordenadas) - 1, int(PERCENTIL * len(ordenadas)))]
+        return min(self.maximo, max(self.minimo, FATOR_PERCENTIL * percentil))
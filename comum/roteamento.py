@@ -0,0 +1,66 @@
+import re
+
+TAMANHO_CNJ = 20
+# NNNNNNN DD AAAA J TR OOOO: o segmento J.TR (justiça e tribunal) ocupa as posições 14 a 16
+INICIO_SEGMENTO = 13
+FIM_SEGMENTO = 16
+RE_NAO_DIGITOS = re.compile(r"[^0-9]")
+
+ERRO_NUMERO_INVALIDO = "Número de processo inválido"
+ERRO_DIGITO_VERIFICADOR = "Dígito verificador inválido"
+ERRO_TRIBUNAL_NAO_SUPORTADO = "Tribunal não suportado"
+
+def normaliza_numero(valor) -> str:
+    """número com 20 dígitos, completado com zeros à esquerda, ou None se não couber no padrão CNJ"""
+    digitos = RE_NAO_DIGITOS.sub("", str(valor))
+    if not digitos or len(digitos) > TAMANHO_CNJ:
+        return None
+    return digitos.rjust(TAMANHO_CNJ, "0")
+
+def digito_verificador_valido(numero: str) -> bool:
+    """confere os dígitos verificadores (módulo 97, Resolução CNJ 65/2008) de um número normalizado"""
+    sequencial, digito, restante = numero[:7], numero[7:9], numero[9:]
+    return int(f"{sequencial}{restante}{digito}") % 97 == 1
+
+class Roteador:
+    """Normaliza, valida e encaminha números CNJ ao tribunal registrado para o segmento J.TR.
+
+    Números mal formados ou com dígito verificador errado são rejeitados aqui, antes de qualquer
+    acesso à rede. Cada valor distinto da planilha é analisado uma única vez.
+    """
+
+    def __init__(self, segmentos: dict) -> None:
+        # segmento J.TR ("816", "824", ...) -> chave do tribunal
+        self.segmentos = dict(segmentos)
+        self._rotas = {}
+        self._stats = {"validos": 0, "invalidos": 0, "digito_invalido": 0, "nao_suportados": 0}
+
+    def roteia(self, valor) -> tuple:
+        """(numero, tribunal, erro) de um valor da coluna PROCESSO; tribunal é None quando há erro"""
+        rota = self._rotas.get(valor)
+        if rota is None:
+            rota = self._rotas[valor] = self._analisa(valor)
+        numero, tribunal, erro = rota
+        if erro == ERRO_NUMERO_INVALIDO:
+            self._stats["invalidos"] += 1
+        elif erro == ERRO_DIGITO_VERIFICADOR:
+            self._stats["digito_invalido"] += 1
+        elif erro == ERRO_TRIBUNAL_NAO_SUPORTADO:
+            self._stats["nao_suportados"] += 1
+        else:
+            self._stats["validos"] += 1
+        return rota
+
+    def _analisa(self, valor) -> tuple:
+        numero = normaliza_numero(valor)
+        if numero is None:
+            return str(valor).strip(), None, ERRO_NUMERO_INVALIDO
+        if not digito_verificador_valido(numero):
+            return numero, None, ERRO_DIGITO_VERIFICADOR
+        tribunal = self.segmentos.get(numero[INICIO_SEGMENTO:FIM_SEGMENTO])
+        if tribunal is None:
+            return numero, None, ERRO_TRIBUNAL_NAO_SUPORTADO
+        return numero, tribunal, None
+
+    def estatisticas(self) -> dict:
+        return dict(self._stats)
@@ -0,0 +1,132 @@
+from collections import defaultdict
+from urllib.parse import parse_qs, urlsplit
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
+from urllib3.exceptions import MaxRetryError, ResponseError
+from urllib3.util.retry import Retry
+import random
+import threading
+import requests
+from .prazo import restante
+
+TENTATIVAS = 3
+FATOR_BACKOFF = 0.5  # segundos; dobra a cada nova tentativa
+BACKOFF_MAXIMO = 10
+STATUS_REPETIVEIS = (500, 502, 503, 504)
+TAMANHO_POOL = 10  # conexões mantidas por host em cada sessão
+
+class RetryComJitter(Retry):
+    """Retry do urllib3 com jitter no backoff, para que sessões paralelas não repitam juntas.
+
+    Erros de conexão são repetidos em qualquer método (a requisição não chegou ao servidor);
+    erros de leitura e status 5xx só nos métodos idempotentes (`allowed_methods` padrão).
+    Dentro do prazo de uma consulta (comum.prazo), uma nova tentativa só é feita se a espera
+    antes dela (backoff ou Retry-After) ainda couber no que resta do prazo.
+    """
+
+    def get_backoff_time(self) -> float:
+        backoff = super().get_backoff_time()
+        return backoff / 2 + random.uniform(0, backoff / 2)
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None) -> Retry:
+        nova = super().increment(method, url, response, error, _pool, _stacktrace)
+        segundos = restante()
+        if segundos is None:
+            return nova
+        espera = Retry.get_backoff_time(nova)
+        if response is not None and self.respect_retry_after_header:
+            espera = max(espera, nova.get_retry_after(response) or 0)
+        if espera >= segundos:
+            # como ao esgotar as tentativas: o chamador recebe o último erro (ou a última resposta)
+            if error is None:
+                error = ResponseError(
+                    ResponseError.SPECIFIC_ERROR.format(status_code=response.status)
+                    if response is not None and response.status
+                    else ResponseError.GENERIC_ERROR
+                )
+            raise MaxRetryError(_pool, url, error) from error
+        return nova
+
+def retry_padrao() -> Retry:
+    return RetryComJitter(
+        total=TENTATIVAS,
+        connect=TENTATIVAS,
+        read=TENTATIVAS,
+        status=TENTATIVAS,
+        status_forcelist=STATUS_REPETIVEIS,
+        backoff_factor=FATOR_BACKOFF,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+
+_configuracao = {"tamanho_pool": TAMANHO_POOL}
+
+def configura_transporte(tamanho_pool: int) -> None:
+    """define o tamanho do pool de conexões das sessões montadas daqui em diante"""
+    _configuracao["tamanho_pool"] = max(1, tamanho_pool)
+
+def monta_sessao(session: requests.Session = None) -> requests.Session:
+    """monta na sessão (nova ou já autenticada) o adapter com pool, retries, compressão e métricas"""
+    session = session or requests.Session()
+    tamanho_pool = _configuracao["tamanho_pool"]
+    adapter = HTTPAdapter(pool_connections=tamanho_pool, pool_maxsize=tamanho_pool, max_retries=retry_padrao())
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    # gzip/deflate e, com o pacote brotli instalado, br; conexões mantidas vivas entre as requisições
+    session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+    session.headers["Connection"] = "keep-alive"
+    session.hooks["response"].append(_registra_resposta)
+    return session
+
+def copia_sessao(session: requests.Session) -> requests.Session:
+    """sessão nova, montada como as demais, com os headers, cookies e auth da sessão informada
+
+    Para uso em outra thread: a cópia não muda quando a original é usada, renovada ou descartada.
+    """
+    copia = requests.Session()
+    copia.headers.clear()
+    copia.headers.update(session.headers)
+    copia.cookies.update(session.cookies)
+    copia.auth = session.auth
+    copia.proxies.update(session.proxies)
+    copia.verify = session.verify
+    return monta_sessao(copia)
+
+
+class MetricasTransporte:
+    """Latência e bytes por endpoint, somados entre todas as sessões"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._endpoints = defaultdict(lambda: {"requisicoes": 0, "segundos": 0.0, "bytes": 0, "maximo_segundos": 0.0})
+
+    def registra(self, endpoint: str, segundos: float, tamanho: int) -> None:
+        with self._lock:
+            metricas = self._endpoints[endpoint]
+            metricas["requisicoes"] += 1
+            metricas["segundos"] += segundos
+            metricas["bytes"] += tamanho
+            metricas["maximo_segundos"] = max(metricas["maximo_segundos"], segundos)
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            return {endpoint: dict(metricas) for endpoint, metricas in self._endpoints.items()}
+
+metricas = MetricasTransporte()
+
+def endpoint_da_url(url: str) -> str:
+    """host e caminho da URL; no EPROC, onde tudo passa pelo controlador.php, inclui a ação"""
+    partes = urlsplit(url)
+    endpoint = f"{partes.netloc}{partes.path}"
+    acao = parse_qs(partes.query).get("acao")
+    if acao:
+        endpoint = f"{endpoint}?acao={acao[0]}"
+    return endpoint
+
+def _registra_resposta(r: requests.Response, *args, **kwargs) -> None:
+    if kwargs.get("stream"):
+        # download em stream: o corpo ainda não foi lido
+        tamanho = int(r.headers.get("Content-Length") or 0)
+    else:
+        tamanho = len(r.content)
+    metricas.registra(endpoint_da_url(r.url), r.elapsed.total_seconds(), tamanho)
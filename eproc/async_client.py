@@ -0,0 +1,139 @@
+from .client import HEADERS_FORM, MARCADORES_CAPTCHA, dados_login, dados_consulta_processo
+from comum.limitador import STATUS_SOBRECARGA, limitador_compartilhado
+from comum.prazo import PrazoEsgotadoException, restante, verifica_prazo
+import aiohttp
+import asyncio
+import time
+
+LIMITE_CONEXOES = 100  # conexões simultâneas mantidas abertas por AsyncHTTPClient
+TIMEOUT_REQUISICAO = 60  # segundos por requisição
+
+class AsyncResponse:
+    """resposta já lida por completo, com a mesma interface usada pelo HTMLParser (text/content/status_code/url)"""
+
+    def __init__(self, status_code: int, url: str, content: bytes, encoding: str) -> None:
+        self.status_code = status_code
+        self.url = url
+        self.content = content
+        self.encoding = encoding
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding, errors="replace")
+
+class AsyncHTTPClient:
+    """Requisições da sessão aiohttp pelo mesmo caminho das síncronas (comum.limitador.requisicao_limitada):
+    a vez no limitador do host, o prazo da consulta atual e o resultado informado ao limitador."""
+
+    def __init__(self, session: aiohttp.ClientSession) -> None:
+        self.session = session
+
+    async def _request(self, method: str, url: str, **kwargs) -> AsyncResponse:
+        limitador = limitador_compartilhado(url)
+        verifica_prazo(f"{method} {url}")
+        await limitador.aguarda_async()
+        segundos = restante()
+        if segundos is not None:
+            verifica_prazo(f"{method} {url}")
+            total = self.session.timeout.total
+            kwargs.setdefault("timeout", aiohttp.ClientTimeout(total=min(total, segundos) if total else segundos))
+        inicio = time.monotonic()
+        try:
+            async with self.session.request(method, url, **kwargs) as resp:
+                content = await resp.read()
+                r = AsyncResponse(resp.status, str(resp.url), content, resp.get_encoding())
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            limitador.registra(time.monotonic() - inicio, erro=True)
+            segundos = restante()
+            if segundos is not None and segundos <= 0:
+                raise PrazoEsgotadoException(f"Prazo esgotado aguardando {method} {url}") from e
+            raise
+        limitador.registra(
+            time.monotonic() - inicio,
+            erro=r.status_code in STATUS_SOBRECARGA,
+            captcha=any(marcador in r.content for marcador in MARCADORES_CAPTCHA),
+        )
+        return r
+
+    async def get(self, url: str, **kwargs) -> AsyncResponse:
+        return await self._request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> AsyncResponse:
+        return await self._request("POST", url, **kwargs)
+
+class AsyncClient:
+    """Contraparte assíncrona de `Client`: mesmos endpoints e payloads sobre uma aiohttp.ClientSession.
+
+    A sessão mantém os cookies do login e reaproveita as conexões (keep-alive) entre as
+    requisições; `limite_conexoes` limita as conexões abertas e `timeout` vale por requisição.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        limite_conexoes: int = LIMITE_CONEXOES,
+        timeout: float = TIMEOUT_REQUISICAO,
+        session: aiohttp.ClientSession = None,
+    ) -> None:
+        self.base_url = base_url
+        self._limite_conexoes = limite_conexoes
+        self._timeout = timeout
+        self._session = session
+        self.http_client = AsyncHTTPClient(session) if session is not None else None
+
+    async def abre(self) -> None:
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self._limite_conexoes),
+                timeout=aiohttp.ClientTimeout(total=self._timeout),
+            )
+            self.http_client = AsyncHTTPClient(self._session)
+
+    async def fecha(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+            self.http_client = None
+
+    def limpa_cookies(self) -> None:
+        """descarta os cookies da sessão (ex.: para refazer o login) sem fechar a sessão nem as conexões"""
+        if self._session is not None:
+            self._session.cookie_jar.clear()
+
+    async def __aenter__(self):
+        await self.abre()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.fecha()
+
+    async def login(self, username: str, password: str) -> AsyncResponse:
+        """faz a request de login"""
+        url = f"{self.base_url}/index.php"
+        return await self.http_client.post(url, data=dados_login(username, password), headers=HEADERS_FORM)
+
+    async def acessa_perfil(self, id_usuario: str) -> AsyncResponse:
+        """Faz a request de selecao do perfil do usuario"""
+        url = f"{self.base_url}/controlador.php?acao=pessoa_usuario_logar&acao_origem=entrar&id_usuario={id_usuario}"
+        return await self.http_client.post(url, data="lista_processos=", headers=HEADERS_FORM)
+
+    async def resolve_catpcha(self, data: dict, endpoint) -> AsyncResponse:
+        """faz a request para submeter o captcha"""
+        return await self.http_client.post(f"{self.base_url}/{endpoint}", data=data, headers=HEADERS_FORM)
+
+    async def resolve_2fa(self, data: dict) -> AsyncResponse:
+        """faz a request para resolver o 2fa"""
+        return await self.http_client.post(f"{self.base_url}/index.php", data=data, headers=HEADERS_FORM)
+
+    async def acessa_link(self, link) -> AsyncResponse:
+        """acessa um dado link. util para acessar algum link do menu"""
+        return await self.http_client.get(link)
+
+    async def consulta_processo(self, endpoint, num_processo) -> AsyncResponse:
+        """faz a request de consultar o processo (endpoint com a hash obtida apos o login)"""
+        url = f"{self.base_url}/{endpoint}"
+        return await self.http_client.post(url, data=dados_consulta_processo(num_processo), headers=HEADERS_FORM)
+
+    async def acessa_endpoint(self, endpoint) -> AsyncResponse:
+        """faz um get para acessar um endpoint"""
+        return await self.http_client.get(f"{self.base_url}/{endpoint}")
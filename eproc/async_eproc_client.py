@@ -0,0 +1,241 @@
+from .html_parser import HTMLParser, PaginaEproc, BACKEND_HTML_PARSER
+from .async_client import AsyncClient, AsyncResponse, LIMITE_CONEXOES, TIMEOUT_REQUISICAO
+from .eproc_client import (
+    TENTATIVAS_RESOLUCAO_CAPTCHA,
+    ResolucaoCaptchaException,
+    ProcessoNaoEncontradoException,
+    SessaoExpiradaException,
+)
+from .captcha_solver import solucionador_compartilhado
+from comum.prazo import PrazoEsgotadoException, TimeoutAdaptativo, prazo, restante, sem_prazo
+from comum.lote_movimentacoes import LoteMovimentacoes
+import asyncio
+import logging
+import time
+import onetimepass as otp
+
+logger = logging.getLogger()
+
+CONCORRENCIA_PADRAO = 50  # consultas simultâneas em execute_varios
+
+class AsyncEprocClient:
+    """Fluxo do `EprocClient` sobre o `AsyncClient`.
+
+    Uma única sessão logada atende todas as consultas do event loop; `execute_varios`
+    mantém até `concorrencia` consultas em andamento ao mesmo tempo. Os captchas são
+    aguardados como futures do solucionador compartilhado, sem ocupar threads do executor.
+    Como no fluxo síncrono, cada consulta tem o prazo dado por `timeout_processo`, as
+    requisições passam pelo limitador do host e o login não consome o prazo.
+    """
+
+    def __init__(
+        self,
+        username: str,
+        password: str,
+        base_url: str,
+        api_key: str,
+        token: str,
+        limite_conexoes: int = LIMITE_CONEXOES,
+        timeout: float = TIMEOUT_REQUISICAO,
+        parser_backend: str = BACKEND_HTML_PARSER,
+        timeout_processo: TimeoutAdaptativo = None,
+    ) -> None:
+        self.username = username
+        self.password = password
+        self.base_url = base_url
+        self.token = token
+        self.html_parser = HTMLParser(backend=parser_backend)
+        self.captcha = solucionador_compartilhado(api_key)
+        self.client = AsyncClient(base_url, limite_conexoes=limite_conexoes, timeout=timeout)
+        self.links = None
+        self.logado = False
+        self.total_logins = 0
+        self.sessoes_expiradas = 0
+        self._login_lock = asyncio.Lock()
+        self.timeout_processo = timeout_processo or TimeoutAdaptativo()
+
+    async def __aenter__(self):
+        await self.client.abre()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.client.fecha()
+
+    async def _aguarda_captcha(self, futuro):
+        """aguarda a solução do captcha sem passar do prazo da consulta atual"""
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(futuro), restante())
+        except asyncio.TimeoutError:
+            futuro.cancel()
+            raise PrazoEsgotadoException("Prazo esgotado aguardando a solução do captcha")
+
+    async def _resolve_captcha_cloudflare(self, pagina: PaginaEproc) -> AsyncResponse:
+        logger.info("Detectado captcha da Cloudflare (Standalone). Iniciando resolução...")
+        sitekey = self.html_parser.get_cloudflare_captcha_data(pagina)
+        for attempt in range(1, TENTATIVAS_RESOLUCAO_CAPTCHA + 1):
+            try:
+                codigo = await self._aguarda_captcha(self.captcha.envia_turnstile(sitekey, self.base_url))
+            except PrazoEsgotadoException:
+                raise
+            except Exception as e:
+                logger.warning(f"Tentativa {attempt} falhou: {str(e)}")
+                continue
+            data = self.html_parser.get_captcha_form(pagina)
+            data["cf-turnstile-response"] = codigo
+            endpoint = self.html_parser.get_endpoint_form_catpcha(pagina)
+            r = await self.client.resolve_catpcha(data, endpoint)
+            aceito = self.html_parser.validate_captcha_response(r.text)
+            self.captcha.registra_validacao(aceito)
+            if aceito:
+                logger.info("Captcha resolvido com sucesso.")
+                return r
+            logger.warning(f"Falha na validação do captcha (tentativa {attempt}/{TENTATIVAS_RESOLUCAO_CAPTCHA}).")
+        raise ResolucaoCaptchaException("Todas as tentativas para resolver o captcha falharam.")
+
+    async def _resolve_captcha_infra(self, pagina: PaginaEproc) -> AsyncResponse:
+        tentativas = 1
+        r = None
+        while pagina.requires_captcha and tentativas < TENTATIVAS_RESOLUCAO_CAPTCHA:
+            data = self.html_parser.get_captcha_form(pagina)
+            imagem = self.html_parser.imagem_captcha_base64(pagina)
+            try:
+                codigo = await self._aguarda_captcha(self.captcha.envia_imagem(imagem))
+            except PrazoEsgotadoException:
+                raise
+            except Exception as e:
+                logger.error("Erro ao resolver captcha: %s", e)
+                raise ResolucaoCaptchaException(f"{e}")
+            data["txtInfraCaptcha"] = codigo
+            endpoint = self.html_parser.get_endpoint_form_catpcha(pagina)
+            r = await self.client.resolve_catpcha(data, endpoint)
+            tentativas += 1
+            pagina = self.html_parser.pagina(r.text)
+            self.captcha.registra_validacao(not pagina.requires_captcha)
+        if tentativas == TENTATIVAS_RESOLUCAO_CAPTCHA:
+            raise ResolucaoCaptchaException("Erro ao resolver o captcha. Excedido o num max de tentativas")
+        return r
+
+    async def _resolve_captcha(self, pagina: PaginaEproc) -> AsyncResponse:
+        if pagina.is_cloudflare_captcha:
+            return await self._resolve_captcha_cloudflare(pagina)
+        return await self._resolve_captcha_infra(pagina)
+
+    async def _resolve_2fa(self, pagina: PaginaEproc) -> AsyncResponse:
+        data = self.html_parser.get_2fa_form(pagina)
+        data["txtAcessoCodigo"] = otp.get_totp(self.token)
+        return await self.client.resolve_2fa(data)
+
+    async def login(self) -> AsyncResponse:
+        self.total_logins += 1
+        logger.info("Iniciando login assíncrono (%d) para o usuário: %s", self.total_logins, self.username)
+        r = await self.client.login(self.username, self.password)
+        pagina = self.html_parser.pagina(r.text)
+        while pagina.requires_captcha or pagina.requires_2fa:
+            if pagina.requires_captcha:
+                logger.info("Captcha detectado. Iniciando tentativa de resolução.")
+                r = await self._resolve_captcha(pagina)
+                pagina = self.html_parser.pagina(r.text)
+            if pagina.requires_2fa:
+                logger.info("2FA requerido. Iniciando validação.")
+                r = await self._resolve_2fa(pagina)
+                pagina = self.html_parser.pagina(r.text)
+        id_usuario = self.html_parser.get_id_usuario(pagina, self.username)
+        if id_usuario:
+            r = await self.client.acessa_perfil(id_usuario)
+            pagina = self.html_parser.pagina(r.text)
+        self.links = self.html_parser.get_menu_links(pagina)
+        self.logado = True
+        logger.info("Login concluído com sucesso para o usuário: %s", self.username)
+        return r
+
+    async def _garante_login(self, sessao_expirada: bool = False) -> None:
+        """faz login uma única vez mesmo com várias consultas aguardando a sessão"""
+        total_antes = self.total_logins
+        # a espera pelo login (desta ou de outra consulta) não conta para o prazo da consulta
+        with sem_prazo():
+            async with self._login_lock:
+                if sessao_expirada and self.total_logins == total_antes:
+                    # nenhuma outra consulta refez o login enquanto esta aguardava; a sessão aiohttp é
+                    # compartilhada pelas consultas em andamento, então só os cookies são descartados
+                    self.logado = False
+                    self.client.limpa_cookies()
+                if not self.logado:
+                    await self.login()
+
+    def _verifica_sessao(self, html: str) -> None:
+        if self.html_parser.sessao_expirada(html):
+            self.sessoes_expiradas += 1
+            raise SessaoExpiradaException("Sessão expirada ou invalidada pelo servidor")
+
+    async def consulta_processo(self, nprocesso: str) -> PaginaEproc:
+        """abre o processo (e a íntegra, se exigida) e devolve a página dele, analisada uma única vez"""
+        logger.info(f"[EPROC] Consultando processo {nprocesso}...")
+        url_consulta_processual = f"{self.base_url}/{self.links['Consultar Processos']}"
+        r = await self.client.acessa_link(url_consulta_processual)
+        self._verifica_sessao(r.text)
+        r = await self.client.consulta_processo(self.html_parser.get_endpoint_consulta_processo(r.text), nprocesso)
+        self._verifica_sessao(r.text)
+        if self.html_parser.processo_nao_encontrado(r.text):
+            raise ProcessoNaoEncontradoException(f"Processo {nprocesso} não encontrado")
+        endpoint = self.html_parser.get_endpoint_processo_consultado(r.text)
+        r = await self.client.acessa_endpoint(endpoint)
+        self._verifica_sessao(r.text)
+        pagina = self.html_parser.pagina(r.text)
+        if self.html_parser.precisa_acessar_integra_do_processo(pagina.html):
+            endpoint = self.html_parser.get_endpoint_integra_processo(pagina.html)
+            r = await self.client.acessa_endpoint(endpoint)
+            pagina = self.html_parser.pagina(r.text)
+            if pagina.requires_2fa:
+                r = await self._resolve_2fa(pagina)
+                pagina = self.html_parser.pagina(r.text)
+            if pagina.requires_captcha:
+                r = await self._resolve_captcha(pagina)
+                pagina = self.html_parser.pagina(r.text)
+        return pagina
+
+    async def execute(self, nprocesso: str) -> LoteMovimentacoes:
+        """consulta o processo e devolve as suas movimentações num lote (vazio se não encontrado ou em erro).
+
+        Como no `EprocClient.execute`, o prazo esgotado e a sessão expirada de novo depois do relogin
+        são propagados, para que não se confundam com um processo sem movimentações.
+        """
+        segundos = self.timeout_processo.segundos()
+        inicio = time.monotonic()
+        try:
+            with prazo(segundos):
+                await self._garante_login()
+                try:
+                    pagina = await self.consulta_processo(nprocesso)
+                except SessaoExpiradaException as e:
+                    logger.warning(f"[EPROC] {str(e)}. Refazendo login...")
+                    await self._garante_login(sessao_expirada=True)
+                    pagina = await self.consulta_processo(nprocesso)
+            self.timeout_processo.registra(time.monotonic() - inicio)
+            return self.html_parser.lote_movimentacoes(pagina) or LoteMovimentacoes()
+        except PrazoEsgotadoException as e:
+            self.timeout_processo.registra_esgotado(segundos)
+            logger.error(f"[EPROC] Timeout ao consultar processo {nprocesso} (prazo de {segundos:.0f} segundos): {str(e)}")
+            raise
+        except SessaoExpiradaException:
+            raise
+        except ProcessoNaoEncontradoException as e:
+            logger.info(f"[EPROC] {str(e)}")
+            return LoteMovimentacoes()
+        except Exception as e:
+            logger.error(f"[EPROC] Erro ao consultar processo {nprocesso}")
+            logger.exception(e)
+            return LoteMovimentacoes()
+
+    async def execute_varios(self, nprocessos, concorrencia: int = CONCORRENCIA_PADRAO) -> list:
+        """consulta vários processos com no máximo `concorrencia` em andamento; devolve os resultados na mesma ordem.
+
+        A consulta que termina com uma exceção (prazo esgotado, sessão expirada) tem a exceção no
+        lugar do lote, sem interromper as demais.
+        """
+        semaforo = asyncio.Semaphore(concorrencia)
+
+        async def consulta(nprocesso):
+            async with semaforo:
+                return await self.execute(nprocesso)
+
+        return await asyncio.gather(*(consulta(n) for n in nprocessos), return_exceptions=True)
@@ -0,0 +1,173 @@
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FuturoTimeoutError
+from comum.prazo import PrazoEsgotadoException, restante
+from twocaptcha import TwoCaptcha, NetworkException
+import logging
+import threading
+import time
+
+logger = logging.getLogger()
+
+INTERVALO_POLLING = 5  # segundos entre consultas ao resultado de um mesmo captcha
+ESPERA_PRIMEIRA_CONSULTA = 5  # o 2captcha raramente resolve antes disso
+TIMEOUT_RESOLUCAO = 180  # segundos até desistir de um captcha pendente
+ENVIOS_SIMULTANEOS = 4  # uploads de captchas ao 2captcha em andamento ao mesmo tempo
+
+class CaptchaNaoResolvidoException(Exception):
+    pass
+
+class SolucionadorCaptcha:
+    """Envia captchas ao 2captcha sem bloquear quem pediu.
+
+    `envia_imagem` e `envia_turnstile` devolvem um Future na hora. O upload roda num pool
+    próprio (`envios_simultaneos` threads) e a consulta dos resultados numa única thread de
+    fundo, que atende todos os captchas já enviados; um upload lento não atrasa o polling dos
+    demais. Assim uma thread (ou um event loop) pode ter vários captchas em andamento enquanto
+    as demais consultas continuam.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        intervalo_polling: float = INTERVALO_POLLING,
+        timeout: float = TIMEOUT_RESOLUCAO,
+        envios_simultaneos: int = ENVIOS_SIMULTANEOS,
+    ) -> None:
+        self.twocaptcha = TwoCaptcha(api_key)
+        self.intervalo_polling = intervalo_polling
+        self.timeout = timeout
+
+        self._lock = threading.Lock()
+        self._acorda = threading.Event()
+        self._thread = None
+        self._executor_envios = ThreadPoolExecutor(max_workers=max(1, envios_simultaneos), thread_name_prefix="captcha-envio")
+        # (id do captcha, future, enviado em) já aceitos pelo 2captcha, à espera da thread de polling
+        self._enviados = []
+        # id do captcha no 2captcha -> (future, enviado em, próxima consulta); só a thread de polling mexe
+        self._pendentes = {}
+        self._stats = {
+            "enviados": 0,
+            "resolvidos": 0,
+            "falhas": 0,
+            "aceitos": 0,
+            "rejeitados": 0,
+            "segundos": 0.0,
+        }
+
+    def envia_imagem(self, imagem_base64: str) -> Future:
+        return self._envia(method="base64", body=imagem_base64)
+
+    def envia_turnstile(self, sitekey: str, url: str) -> Future:
+        return self._envia(method="turnstile", sitekey=sitekey, url=url)
+
+    def resolve_imagem(self, imagem_base64: str) -> str:
+        return self._aguarda(self.envia_imagem(imagem_base64))
+
+    def resolve_turnstile(self, sitekey: str, url: str) -> str:
+        return self._aguarda(self.envia_turnstile(sitekey, url))
+
+    def _aguarda(self, futuro: Future) -> str:
+        """espera a solução dentro do prazo da consulta atual (se houver)"""
+        try:
+            return futuro.result(timeout=restante())
+        except FuturoTimeoutError:
+            futuro.cancel()
+            raise PrazoEsgotadoException("Prazo esgotado aguardando a solução do captcha")
+
+    def registra_validacao(self, aceito: bool) -> None:
+        """contabiliza se o tribunal aceitou a resposta devolvida pelo 2captcha"""
+        with self._lock:
+            self._stats["aceitos" if aceito else "rejeitados"] += 1
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["pendentes"] = len(self._pendentes)
+        validados = stats["aceitos"] + stats["rejeitados"]
+        stats["taxa_acerto"] = stats["aceitos"] / validados if validados else None
+        stats["media_segundos"] = stats["segundos"] / stats["resolvidos"] if stats["resolvidos"] else None
+        return stats
+
+    def _envia(self, **parametros) -> Future:
+        futuro = Future()
+        with self._lock:
+            self._stats["enviados"] += 1
+        self._executor_envios.submit(self._submete, futuro, parametros)
+        return futuro
+
+    def _submete(self, futuro: Future, parametros: dict) -> None:
+        """faz o upload (numa thread do pool de envios) e passa o captcha para a thread de polling"""
+        if futuro.cancelled():
+            return
+        enviado_em = time.monotonic()
+        try:
+            id_captcha = self.twocaptcha.send(**parametros)
+        except Exception as e:
+            self._falha(futuro, f"Erro ao enviar captcha: {e}")
+            return
+        with self._lock:
+            self._enviados.append((id_captcha, futuro, enviado_em))
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name="captcha-polling", daemon=True)
+                self._thread.start()
+        self._acorda.set()
+
+    def _loop(self) -> None:
+        while True:
+            self._acorda.clear()
+            with self._lock:
+                enviados, self._enviados = self._enviados, []
+            for id_captcha, futuro, enviado_em in enviados:
+                self._pendentes[id_captcha] = (futuro, enviado_em, enviado_em + ESPERA_PRIMEIRA_CONSULTA)
+            self._acorda.wait(self._consulta_pendentes())
+
+    def _consulta_pendentes(self):
+        """consulta os captchas cuja vez chegou e devolve quantos segundos esperar até a próxima"""
+        agora = time.monotonic()
+        for id_captcha, (futuro, enviado_em, proxima) in list(self._pendentes.items()):
+            if futuro.cancelled():
+                del self._pendentes[id_captcha]
+                continue
+            if proxima > agora:
+                continue
+            try:
+                codigo = self.twocaptcha.get_result(id_captcha)
+            except NetworkException:
+                # CAPCHA_NOT_READY (ou falha de rede momentânea): tenta de novo mais tarde
+                if agora - enviado_em > self.timeout:
+                    del self._pendentes[id_captcha]
+                    self._falha(futuro, f"Captcha {id_captcha} não resolvido em {self.timeout} segundos")
+                else:
+                    self._pendentes[id_captcha] = (futuro, enviado_em, agora + self.intervalo_polling)
+                continue
+            except Exception as e:
+                del self._pendentes[id_captcha]
+                self._falha(futuro, f"Erro ao resolver captcha {id_captcha}: {e}")
+                continue
+            del self._pendentes[id_captcha]
+            with self._lock:
+                self._stats["resolvidos"] += 1
+                self._stats["segundos"] += time.monotonic() - enviado_em
+            if not futuro.cancelled():
+                futuro.set_result(codigo)
+
+        if not self._pendentes:
+            return None
+        return max(0, min(proxima for _, _, proxima in self._pendentes.values()) - time.monotonic())
+
+    def _falha(self, futuro: Future, mensagem: str) -> None:
+        logger.error(mensagem)
+        with self._lock:
+            self._stats["falhas"] += 1
+        if not futuro.cancelled():
+            futuro.set_exception(CaptchaNaoResolvidoException(mensagem))
+
+
+_solucionadores = {}
+_lock_solucionadores = threading.Lock()
+
+def solucionador_compartilhado(api_key: str) -> SolucionadorCaptcha:
+    """devolve o solucionador (e a thread de polling) compartilhado por todos os clientes da mesma api_key"""
+    with _lock_solucionadores:
+        if api_key not in _solucionadores:
+            _solucionadores[api_key] = SolucionadorCaptcha(api_key)
+        return _solucionadores[api_key]
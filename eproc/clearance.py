@@ -0,0 +1,86 @@
+import copy
+import logging
+import threading
+import time
+
+logger = logging.getLogger()
+
+# Cookies emitidos pela Cloudflare ao liberar o acesso; valem para o cliente, não para a sessão do EPROC
+PREFIXOS_COOKIES_CLEARANCE = ("cf_clearance", "__cf_bm", "cf_chl")
+
+def eh_cookie_clearance(nome: str) -> bool:
+    return nome.startswith(PREFIXOS_COOKIES_CLEARANCE)
+
+class ClearanceCache:
+    """Cookies de clearance da Cloudflare obtidos no EPROC, reaproveitados enquanto o servidor os aceitar.
+
+    Os cookies são copiados para toda sessão nova do mesmo base_url (inclusive as recriadas após
+    um relogin), evitando resolver o Turnstile de novo, e expiram assim que o servidor volta a
+    pedir o desafio para quem os apresentou.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        # nome do cookie -> (cookie, obtido em)
+        self._cookies = {}
+        self._stats = {
+            "cookies_obtidos": 0,
+            "cookies_reaproveitados": 0,
+            "cookies_rejeitados": 0,
+        }
+
+    def semeia(self, session) -> None:
+        """copia para a sessão os cookies de clearance ainda válidos"""
+        with self._lock:
+            validos = []
+            for nome, (cookie, _) in list(self._cookies.items()):
+                if cookie.is_expired():
+                    del self._cookies[nome]
+                else:
+                    validos.append(cookie)
+            if validos:
+                self._stats["cookies_reaproveitados"] += 1
+        for cookie in validos:
+            session.cookies.set_cookie(copy.copy(cookie))
+
+    def captura_cookies(self, session) -> None:
+        """guarda os cookies de clearance que a sessão acabou de receber"""
+        agora = time.time()
+        with self._lock:
+            for cookie in session.cookies:
+                if not eh_cookie_clearance(cookie.name):
+                    continue
+                atual = self._cookies.get(cookie.name)
+                if atual is None or atual[0].value != cookie.value:
+                    self._cookies[cookie.name] = (copy.copy(cookie), agora)
+                    self._stats["cookies_obtidos"] += 1
+
+    def rejeita_cookies(self, session) -> None:
+        """descarta os cookies em cache que a sessão apresentou e mesmo assim recebeu o desafio"""
+        apresentados = [cookie for cookie in session.cookies if eh_cookie_clearance(cookie.name)]
+        enviados = {cookie.name: cookie.value for cookie in apresentados}
+        with self._lock:
+            for nome, (cookie, obtido_em) in list(self._cookies.items()):
+                if enviados.get(nome) == cookie.value:
+                    del self._cookies[nome]
+                    self._stats["cookies_rejeitados"] += 1
+                    logger.info(f"Clearance {nome} rejeitado após {time.time() - obtido_em:.0f} segundos")
+        for cookie in apresentados:
+            session.cookies.clear(cookie.domain, cookie.path, cookie.name)
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["cookies_em_cache"] = len(self._cookies)
+        return stats
+
+
+_caches = {}
+_lock_caches = threading.Lock()
+
+def cache_compartilhado(base_url: str) -> ClearanceCache:
+    """devolve o cache de clearance compartilhado por todos os clientes do mesmo base_url"""
+    with _lock_caches:
+        if base_url not in _caches:
+            _caches[base_url] = ClearanceCache()
+        return _caches[base_url]
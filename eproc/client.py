@@ -1,66 +1,86 @@
+from comum.limitador import requisicao_limitada
+from comum.transporte import monta_sessao
 import requests
 
+HEADERS_FORM = {
+    "Content-Type": "application/x-www-form-urlencoded",
+}
+
+# Trechos das páginas de captcha (infra e Turnstile), usados pelo limitador de taxa
+MARCADORES_CAPTCHA = (b"divInfraCaptcha", b"cf-turnstile")
+
+def dados_login(username: str, password: str) -> dict:
+    return {
+        "txtUsuario": username,
+        "pwdSenha": password,
+        "hdnAcao": "login",
+        "hdnDebug": "",
+    }
+
+def dados_consulta_processo(num_processo: str) -> dict:
+    return {
+        "hdnInfraTipoPagina": "1",
+        "acao_origem": "consultar",
+        "acao_retorno": "",
+        "acao": "processo_consultar",
+        "hdnNumPaginaAtual": "1",
+        "hdnNumSentidoNavegacao": "1",
+        "hdnNumIdProcessoCursorInicio": "",
+        "hdnNumIdProcessoCursorFim": "",
+        "hdnNumIdProcessoCursorIniciosAnteriores": "",
+        "tipoPesquisa": "NU",
+        "numNrProcesso": num_processo,
+        "selIdClasseSelecionados": "",
+        "strChave": "",
+    }
+
 
 class HTTPClient:
     def __init__(self, session: requests.Session) -> None:
         self.session = session
 
+    def _request(self, method: str, url: str, **kwargs) -> requests.Response:
+        return requisicao_limitada(self.session, method, url, MARCADORES_CAPTCHA, **kwargs)
+
     def get(self, **kwargs) -> requests.Response:
-        r = self.session.get(**kwargs)
+        r = self._request("GET", **kwargs)
         return r
 
     def post(self, **kwargs) -> requests.Response:
-        r = self.session.post(**kwargs)
+        r = self._request("POST", **kwargs)
         return r
 
 class Client:
-    def __init__(self, base_url):
+    def __init__(self, base_url, session: requests.Session = None):
         self.base_url = base_url
-        self.http_client = HTTPClient(requests.Session())
+        self.http_client = HTTPClient(session or monta_sessao())
 
     def login(self, username: str, password: str) -> requests.Response:
         """faz a request de login"""
         url = f"{self.base_url}/index.php"
-        data = {
-            "txtUsuario": username,
-            "pwdSenha": password,
-            "hdnAcao": "login",
-            "hdnDebug": "",
-        }
-        headers = {
-            "Content-Type": "application/x-www-form-urlencoded",
-        }
-        r = self.http_client.post(url=url, data=data, headers=headers)
+        data = dados_login(username, password)
+        r = self.http_client.post(url=url, data=data, headers=HEADERS_FORM)
         return r
 
     def acessa_perfil(self, id_usuario: str) -> requests.Response:
         """Faz a request de selecao do perfil do usuario"""
-        headers = {
-            "Content-Type": "application/x-www-form-urlencoded",
-        }
         url = f"{self.base_url}/controlador.php?acao=pessoa_usuario_logar&acao_origem=entrar&id_usuario={id_usuario}"
         data = "lista_processos="
-        r = self.http_client.post(url=url, data=data, headers=headers)
+        r = self.http_client.post(url=url, data=data, headers=HEADERS_FORM)
         return r
 
     def resolve_catpcha(self, data: dict, endpoint) -> requests.Response:
         """faz a request para submeter o captcha. Recebe como parametro o payload que será enviado na request e o endpoint"""
-        headers = {
-            "Content-Type": "application/x-www-form-urlencoded",
-        }
         r = self.http_client.post(
-            url=f"{self.base_url}/{endpoint}", data=data, headers=headers
+            url=f"{self.base_url}/{endpoint}", data=data, headers=HEADERS_FORM
         )
         return r
 
     def resolve_2fa(self, data: dict) -> requests.Response:
         """faz a request para resolver o 2fa. Recebe como parametro o payload que será enviado na request"""
         endpoint = "/index.php"
-        headers = {
-            "Content-Type": "application/x-www-form-urlencoded",
-        }
         r = self.http_client.post(
-            url=f"{self.base_url}{endpoint}", data=data, headers=headers
+            url=f"{self.base_url}{endpoint}", data=data, headers=HEADERS_FORM
         )
         return r
     
@@ -71,23 +91,8 @@ class Client:
     def consulta_processo(self, endpoint, num_processo) -> requests.Response:
         """faz a request de consultar o processo. como o endpoint possui uma hash que muda conforme o login é necessario passa-lo como parametro"""
         url = f"{self.base_url}/{endpoint}"
-        headers = {"Content-Type": "application/x-www-form-urlencoded"}
-        data = {
-            "hdnInfraTipoPagina": "1",
-            "acao_origem": "consultar",
-            "acao_retorno": "",
-            "acao": "processo_consultar",
-            "hdnNumPaginaAtual": "1",
-            "hdnNumSentidoNavegacao": "1",
-            "hdnNumIdProcessoCursorInicio": "",
-            "hdnNumIdProcessoCursorFim": "",
-            "hdnNumIdProcessoCursorIniciosAnteriores": "",
-            "tipoPesquisa": "NU",
-            "numNrProcesso": num_processo,
-            "selIdClasseSelecionados": "",
-            "strChave": "",
-        }
-        r = self.http_client.post(url=url, headers=headers, data=data)
+        data = dados_consulta_processo(num_processo)
+        r = self.http_client.post(url=url, headers=HEADERS_FORM, data=data)
         return r
 
     def acessa_endpoint(self, endpoint) -> requests.Response:
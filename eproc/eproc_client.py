@@ -1,7 +1,14 @@
-from .html_parser import HTMLParser, SalvarImagemCaptchaException
+from .html_parser import HTMLParser, PaginaEproc, SalvarImagemCaptchaException, BACKEND_HTML_PARSER
 from .client import Client
-from twocaptcha import TwoCaptcha
+from .captcha_solver import solucionador_compartilhado
+from .clearance import cache_compartilhado
+from comum.prazo import PrazoEsgotadoException, sem_prazo, verifica_prazo
+from comum.downloads import baixa_arquivo
+from comum.transporte import copia_sessao
+from comum.lote_movimentacoes import LoteMovimentacoes
+import functools
 import logging
+import queue
 import requests
 import onetimepass as otp
 import os
@@ -20,29 +27,50 @@ class ResolucaoCaptchaException(Exception):
 class ProcessoNaoEncontradoException(Exception):
     pass
 
+class SessaoExpiradaException(Exception):
+    pass
+
 class EprocClient:
-    def __init__(self, username: str, password: str, base_url: str, api_key: str, token: str) -> None:
+    def __init__(self, username: str, password: str, base_url: str, api_key: str, token: str, relogin_automatico: bool = True, parser_backend: str = BACKEND_HTML_PARSER, baixar_documentos: bool = False, filtro=None) -> None:
         self.username = username
         self.password = password
         self.base_url = base_url
         self.api_key = api_key
         self.token = token
-        self.html_parser = HTMLParser()
-        self.captcha = TwoCaptcha(api_key)
-        self.client = Client(base_url)
+        self.html_parser = HTMLParser(backend=parser_backend, documentos=baixar_documentos, filtro=filtro)
+        self.captcha = solucionador_compartilhado(api_key)
+        self.clearance = cache_compartilhado(base_url)
+        self.client = self.__novo_client()
+        self.links = None
+        self.logado = False
+        self.relogin_automatico = relogin_automatico
+        self.total_logins = 0
+        self.sessoes_expiradas = 0
+        self.consultas_na_sessao = 0
 
-    def __get_text_from_catpcha_image(self, image_filename: str) -> str:
+    def __get_text_from_catpcha_image(self, imagem_base64: str) -> str:
         try:
-            result = self.captcha.normal(image_filename)
-            return result["code"]
+            return self.captcha.resolve_imagem(imagem_base64)
+        except PrazoEsgotadoException:
+            raise
         except Exception as e:
             logger.error("Erro ao resolver captcha: %s", e)
             raise ResolucaoCaptchaException(f"{e}")
 
-    def __resolve_captcha_cloudflare(self, html: str) -> requests.Response:
+    def __novo_client(self) -> Client:
+        client = Client(self.base_url)
+        self.clearance.semeia(client.http_client.session)
+        return client
+
+    @property
+    def __session(self) -> requests.Session:
+        return self.client.http_client.session
+
+    def __resolve_captcha_cloudflare(self, pagina: PaginaEproc) -> requests.Response:
         logger.info("Detectado captcha da Cloudflare (Standalone). Iniciando resolução...")    
+        self.clearance.rejeita_cookies(self.__session)
 
-        sitekey = self.html_parser.get_cloudflare_captcha_data(html)
+        sitekey = self.html_parser.get_cloudflare_captcha_data(pagina)
         if not sitekey:
             raise ResolucaoCaptchaException("Não foi possível encontrar o sitekey do Turnstile")
 
@@ -50,19 +78,24 @@ class EprocClient:
             try:
                 logger.info(f"Tentativa {attempt} de {TENTATIVAS_RESOLUCAO_CAPTCHA} para resolver o captcha.")
 
-                result = self.captcha.turnstile(
-                    sitekey=sitekey,
-                    url=self.base_url
-                )
+                try:
+                    codigo = self.captcha.resolve_turnstile(sitekey, self.base_url)
+                except PrazoEsgotadoException:
+                    raise
+                except Exception as e:
+                    raise ResolucaoCaptchaException(f"{e}")
 
-                data = self.html_parser.get_captcha_form(html)
-                data["cf-turnstile-response"] = result['code']
+                data = self.html_parser.get_captcha_form(pagina)
+                data["cf-turnstile-response"] = codigo
 
-                endpoint = self.html_parser.get_endpoint_form_catpcha(html)
+                endpoint = self.html_parser.get_endpoint_form_catpcha(pagina)
                 r = self.client.resolve_catpcha(data, endpoint)
 
-                if self.html_parser.validate_captcha_response(r.text):
+                aceito = self.html_parser.validate_captcha_response(r.text)
+                self.captcha.registra_validacao(aceito)
+                if aceito:
                     logger.info("Captcha resolvido com sucesso.")
+                    self.clearance.captura_cookies(self.__session)
                     return r 
 
                 logger.warning(f"Falha na validação do captcha (tentativa {attempt}/{TENTATIVAS_RESOLUCAO_CAPTCHA}).")
@@ -72,117 +105,193 @@ class EprocClient:
 
         raise ResolucaoCaptchaException("Todas as tentativas para resolver o captcha falharam.")
 
-    def __resolve_captcha_infra(self, html: str) -> requests.Response:
+    def __resolve_captcha_infra(self, pagina: PaginaEproc) -> requests.Response:
         tentativas = 1
-        while self.html_parser.requires_captcha(html) and tentativas < TENTATIVAS_RESOLUCAO_CAPTCHA:
-            data = self.html_parser.get_captcha_form(html)
-            filename = self.html_parser.salva_imagem_captcha(html)
-            result = self.__get_text_from_catpcha_image(filename)
+        while pagina.requires_captcha and tentativas < TENTATIVAS_RESOLUCAO_CAPTCHA:
+            data = self.html_parser.get_captcha_form(pagina)
+            imagem = self.html_parser.imagem_captcha_base64(pagina)
+            result = self.__get_text_from_catpcha_image(imagem)
             data["txtInfraCaptcha"] = result
-            endpoint = self.html_parser.get_endpoint_form_catpcha(html)
+            endpoint = self.html_parser.get_endpoint_form_catpcha(pagina)
             r = self.client.resolve_catpcha(data, endpoint)
             tentativas += 1
-            html = r.text
+            pagina = self.html_parser.pagina(r.text)
+            self.captcha.registra_validacao(not pagina.requires_captcha)
         if tentativas == TENTATIVAS_RESOLUCAO_CAPTCHA:
             raise ResolucaoCaptchaException("Erro ao resolver o captcha. Excedido o num max de tentativas")
         return r
 
+    def invalida_sessao(self) -> None:
+        """descarta a sessao atual (cookies e links do menu) para que o proximo acesso refaca o login"""
+        self.logado = False
+        self.links = None
+        self.client = self.__novo_client()
+
     def login(self) -> requests.Response:
-        logger.info("Iniciando login para o usuário: %s", self.username)
+        # o login (captcha e 2FA incluídos) não consome o prazo da consulta que o disparou
+        with sem_prazo():
+            return self.__login()
+
+    def __login(self) -> requests.Response:
+        self.total_logins += 1
+        logger.info("Iniciando login (%d) para o usuário: %s", self.total_logins, self.username)
         r = self.client.login(self.username, self.password)
-        while self.html_parser.requires_captcha(r.text) or self.html_parser.requires_2fa(r.text):
-            if self.html_parser.requires_captcha(r.text):
+        pagina = self.html_parser.pagina(r.text)
+        while pagina.requires_captcha or pagina.requires_2fa:
+            if pagina.requires_captcha:
                 logger.info("Captcha detectado. Iniciando tentativa de resolução.")
-                if self.html_parser.is_cloudflare_captcha(r.text):
-                    r = self.__resolve_captcha_cloudflare(r.text)
+                if pagina.is_cloudflare_captcha:
+                    r = self.__resolve_captcha_cloudflare(pagina)
                 else:
-                    r = self.__resolve_captcha_infra(r.text)
-            if self.html_parser.requires_2fa(r.text):
+                    r = self.__resolve_captcha_infra(pagina)
+                pagina = self.html_parser.pagina(r.text)
+            if pagina.requires_2fa:
                 logger.info("2FA requerido. Iniciando validação.")
-                r = self.__resolve_2fa(r.text)
-        id_usuario = self.html_parser.get_id_usuario(r.text, self.username)
+                r = self.__resolve_2fa(pagina)
+                pagina = self.html_parser.pagina(r.text)
+        id_usuario = self.html_parser.get_id_usuario(pagina, self.username)
         if id_usuario:
             r = self.client.acessa_perfil(id_usuario)
-            self.links = self.html_parser.get_menu_links(r.text)
-            logger.info("Login concluído com sucesso para o usuário: %s", self.username)
-            return r
-        else:
-            return r
+            pagina = self.html_parser.pagina(r.text)
+        self.links = self.html_parser.get_menu_links(pagina)
+        self.logado = True
+        self.consultas_na_sessao = 0
+        logger.info("Login concluído com sucesso para o usuário: %s", self.username)
+        return r
 
-    def consulta_processo(self, nprocesso: str) -> requests.Response:
+    def __verifica_sessao(self, html: str) -> None:
+        if self.html_parser.sessao_expirada(html):
+            self.sessoes_expiradas += 1
+            raise SessaoExpiradaException("Sessão expirada ou invalidada pelo servidor")
+
+    def consulta_processo(self, nprocesso: str) -> PaginaEproc:
+        """abre o processo (e a íntegra, se exigida) e devolve a página dele, analisada uma única vez"""
         logger.info(f"[EPROC] Consultando processo {nprocesso}...")
+        self.consultas_na_sessao += 1
         consulta_processual = "Consultar Processos"
         url_consulta_processual = f"{self.base_url}/{self.links[consulta_processual]}"
         r = self.client.acessa_link(url_consulta_processual)
+        self.__verifica_sessao(r.text)
+        verifica_prazo("a pesquisa do processo")
         r = self.client.consulta_processo(self.html_parser.get_endpoint_consulta_processo(r.text), nprocesso)
+        self.__verifica_sessao(r.text)
         if self.html_parser.processo_nao_encontrado(r.text):
             raise ProcessoNaoEncontradoException(f"Processo {nprocesso} não encontrado")
         endpoint = self.html_parser.get_endpoint_processo_consultado(r.text)
+        verifica_prazo("a abertura do processo")
         r = self.client.acessa_endpoint(endpoint)
-        if self.html_parser.precisa_acessar_integra_do_processo(r.text):
-            endpoint = self.html_parser.get_endpoint_integra_processo(r.text)
+        pagina = self.html_parser.pagina(r.text)
+        self.__verifica_sessao(pagina.html)
+        if self.html_parser.precisa_acessar_integra_do_processo(pagina.html):
+            verifica_prazo("o acesso à íntegra")
+            endpoint = self.html_parser.get_endpoint_integra_processo(pagina.html)
             r = self.client.acessa_endpoint(endpoint)
-            if self.html_parser.requires_2fa(r.text):
-                r = self.__resolve_2fa(r.text)
-            if self.html_parser.requires_captcha(r.text):
-                if self.html_parser.is_cloudflare_captcha(r.text):
-                    r = self.__resolve_captcha_cloudflare(r.text)
+            pagina = self.html_parser.pagina(r.text)
+            if pagina.requires_2fa:
+                r = self.__resolve_2fa(pagina)
+                pagina = self.html_parser.pagina(r.text)
+            if pagina.requires_captcha:
+                if pagina.is_cloudflare_captcha:
+                    r = self.__resolve_captcha_cloudflare(pagina)
                 else:
-                    r = self.__resolve_captcha_infra(r.text)
-        return r
+                    r = self.__resolve_captcha_infra(pagina)
+                pagina = self.html_parser.pagina(r.text)
+        return pagina
+
+    def __baixa_documento(self, modelo, clients: queue.Queue, documento, destino: str) -> int:
+        """abre a página do documento e grava o arquivo em `destino`, em blocos
+
+        Usa um client livre de `clients` ou, se todos estão em uso por outras threads, um novo com a
+        sua própria cópia de `modelo`; ao final o devolve à fila para o próximo download.
+        """
+        try:
+            client = clients.get_nowait()
+        except queue.Empty:
+            client = Client(self.base_url, copia_sessao(modelo))
+        try:
+            r = client.acessa_endpoint(documento.endpoint)
+            # parser próprio: as threads de download não somam nas estatísticas do parser das consultas
+            endpoint_download = HTMLParser().get_endpoint_download_arquivo(r.text)
+            return baixa_arquivo(client.http_client.session, f"{self.base_url}/{endpoint_download}", destino)
+        finally:
+            clients.put(client)
+
+    def __com_downloads(self, lote):
+        """liga cada documento listado a uma cópia da sessão que o listou, para ser baixado depois da extração
+
+        A cópia (cookies e headers de agora) só serve de modelo: cada thread do pool de downloads
+        usa um client com a sua própria cópia dela, reaproveitado nos downloads seguintes, como as
+        páginas de documentos do Projudi. Nem os downloads disputam uma sessão entre si ou com as
+        consultas seguintes, nem um `invalida_sessao()` os afeta.
+        """
+        modelo = None
+        for (documentos,) in lote.valores(("documentos",)):
+            for documento in documentos or ():
+                if modelo is None:
+                    modelo = copia_sessao(self.__session)
+                    clients = queue.Queue()
+                documento.baixa = functools.partial(self.__baixa_documento, modelo, clients, documento)
+        return lote
+
+    def __consulta_com_sessao(self, nprocesso: str) -> PaginaEproc:
+        if not self.logado:
+            self.login()
+        try:
+            return self.consulta_processo(nprocesso)
+        except SessaoExpiradaException as e:
+            self.invalida_sessao()
+            if not self.relogin_automatico:
+                raise
+            logger.warning(f"[EPROC] {str(e)}. Refazendo login...")
+            self.login()
+            return self.consulta_processo(nprocesso)
+
+    def lotes_movimentacoes(self, nprocesso: str):
+        """como `execute`, mas devolve as movimentações em lotes gerados à medida que a tabela é lida.
+
+        A consulta é feita já na chamada (dentro do prazo de quem chama); uma falha nela devolve um
+        único lote vazio. Um erro durante a leitura da tabela chega a quem consome os lotes.
+        """
+        try:
+            pagina = self.__consulta_com_sessao(nprocesso)
+            lotes = self.html_parser.lotes_movimentacoes(pagina)
+            if lotes is None:
+                logger.warning(f"[EPROC] Tabela de eventos não encontrada no processo {nprocesso}")
+                return [LoteMovimentacoes()]
+            return map(self.__com_downloads, lotes)
+
+        except ProcessoNaoEncontradoException as e:
+            logger.info(f"[EPROC] {str(e)}")
+            return [LoteMovimentacoes()]
+        except (SessaoExpiradaException, PrazoEsgotadoException):
+            raise
+        except Exception as e:
+            logger.error(f"[EPROC] Erro ao consultar processo {nprocesso}")
+            logger.exception(e)
+            return [LoteMovimentacoes()]
 
-    def baixar_arquivos(self, r: requests.Response, movimentacoes: list) -> list:
-        for movimentacao in movimentacoes:
-            if movimentacao.get('liminares'):
-                for liminar in movimentacao['liminares']:
-                    if liminar.tipo_arquivo != "Nenhum arquivo disponível":
-                        try:
-                            # Primeiro acessa o endpoint da liminar
-                            r = self.client.acessa_endpoint(liminar.endpoint)
-                            
-                            # Obtém o endpoint de download do arquivo
-                            endpoint_download = self.html_parser.get_endpoint_download_arquivo(r.text)
-                            
-                            # Faz o download do arquivo
-                            r = self.client.acessa_endpoint(endpoint_download)
-                            
-                            # Salva o arquivo
-                            filename = f"{movimentacao['processo']} - {movimentacao['descricao']} - {movimentacao['data']}.{liminar.tipo_arquivo}"
-                            filepath = os.path.join(MEDIA_DIR, filename)
-                            with open(filepath, "wb") as arq:
-                                arq.write(r.content)
-                            
-                            # Atualiza o nome do arquivo na movimentação
-                            movimentacao['ARQUIVOS'] = filename
-                        except Exception as e:
-                            logger.error(f"Erro ao baixar arquivo: {str(e)}")
-                            movimentacao['ARQUIVOS'] = "Erro ao baixar arquivo"
-                    else:
-                        movimentacao['ARQUIVOS'] = "Nenhum arquivo disponível"
-            else:
-                movimentacao['ARQUIVOS'] = "Nenhum arquivo disponível"
-        return movimentacoes
-
-    def execute(self, nprocesso: str):
+    def execute(self, nprocesso: str) -> LoteMovimentacoes:
+        """consulta o processo e devolve as suas movimentações num lote (vazio se a consulta falhar)"""
         try:
-            r = self.login()
-            r = self.consulta_processo(nprocesso)
-            movimentacoes = self.html_parser.get_movimentacoes(r.text)
-            if "Nenhuma movimentação" in movimentacoes:
-                return movimentacoes
-            #movimentacoes = self.baixar_arquivos(r, movimentacoes)
-            return movimentacoes
+            pagina = self.__consulta_com_sessao(nprocesso)
+            lote = self.html_parser.lote_movimentacoes(pagina)
+            if lote is None:
+                logger.warning(f"[EPROC] Tabela de eventos não encontrada no processo {nprocesso}")
+                return LoteMovimentacoes()
+            return self.__com_downloads(lote)
 
         except ProcessoNaoEncontradoException as e:
             logger.info(f"[EPROC] {str(e)}")
-            return []
+            return LoteMovimentacoes()
+        except (SessaoExpiradaException, PrazoEsgotadoException):
+            raise
         except Exception as e:
             logger.error(f"[EPROC] Erro ao consultar processo {nprocesso}")
             logger.exception(e)
-            return []
+            return LoteMovimentacoes()
 
-    def __resolve_2fa(self, html: str) -> requests.Response:
-        data = self.html_parser.get_2fa_form(html)
+    def __resolve_2fa(self, pagina: PaginaEproc) -> requests.Response:
+        data = self.html_parser.get_2fa_form(pagina)
         secret_code = otp.get_totp(self.token)
         data["txtAcessoCodigo"] = secret_code
         return self.client.resolve_2fa(data)
@@ -1,15 +1,55 @@
 from bs4 import BeautifulSoup
+import lxml.etree
+import lxml.html
 import base64
+import io
 from PIL import Image
 import re
 import json
-import os
 import logging
-from datetime import datetime
+from collections import deque
+from datetime import date, datetime
+import functools
+import sys
+import time
+from comum.filtro_eventos import DESCARTAR, PARAR
+from comum.lote_movimentacoes import LoteMovimentacoes
 
 logger = logging.getLogger(__name__)
 
-CAPTCHA_DIR = "."
+
+# Backends disponiveis para a extracao da tabela de eventos
+BACKEND_HTML_PARSER = "html.parser"
+BACKEND_LXML = "lxml"
+
+# colunas das linhas de eventos, na ordem em que são gravadas
+COLUNAS_MOVIMENTACOES = ("processo", "evento", "data", "descricao", "usuario", "tipo")
+
+# linhas por lote entregue por `lotes_movimentacoes`
+LINHAS_POR_LOTE = 500
+# caracteres da tabela de eventos entregues de cada vez ao parser incremental do lxml
+CARACTERES_POR_LEITURA = 64 * 1024
+
+# dias distintos convertidos, compartilhados entre processos (muitos eventos caem no mesmo dia)
+DIAS_EM_CACHE = 8192
+
+# o atributo id precedido de espaço, para não casar com data-id, e com o valor exato
+RE_TABELA_EVENTOS = re.compile(r"""<table\b[^>]*\sid\s*=\s*["']?tblEventos(?![\w-])""", re.IGNORECASE)
+RE_TAG_TABLE = re.compile(r"<(/?)table\b[^>]*>", re.IGNORECASE)
+RE_SPAN_NUM_PROCESSO = re.compile(
+    r"""<span\b[^>]*\sid\s*=\s*["']?txtNumProcesso(?![\w-])[^>]*>.*?</span>""", re.IGNORECASE | re.DOTALL
+)
+XPATH_CLASSE = ".//%s[contains(concat(' ', normalize-space(@class), ' '), ' %s ')]"
+TAGS_SEM_TEXTO = ("script", "style", "template")
+
+# Trechos que so aparecem nas paginas de login, captcha e 2FA
+MARCADORES_SESSAO_EXPIRADA = (
+    "pwdSenha",
+    "divInfraCaptcha",
+    "challenge-stage",
+    "cf-turnstile",
+    "Informe o código de 6 dígitos gerado",
+)
 
 class SalvarImagemCaptchaException(Exception):
     pass
@@ -19,38 +59,178 @@ class Liminares:
         self.tipo_arquivo = tipo_arquivo
         self.titulo = titulo
         self.endpoint = endpoint
+        self.extensao = (tipo_arquivo or "bin").split("/")[-1].lower()
+        # preenchido pelo EprocClient: baixa(destino) grava o documento usando a sessão que o listou
+        self.baixa = None
+
+class PaginaEproc:
+    """Uma resposta do EPROC analisada uma única vez.
+
+    A árvore do BeautifulSoup só é montada no primeiro acesso a `soup` e depois serve a
+    classificação da página e todas as extrações feitas sobre a mesma resposta. Quem recebe a
+    página do HTMLParser a repassa aos métodos dele no lugar do html.
+    """
+
+    CAPTCHA_CLOUDFLARE = "captcha_cloudflare"
+    CAPTCHA_INFRA = "captcha_infra"
+    DOIS_FATORES = "2fa"
+    SELECAO_PERFIL = "selecao_perfil"
+    NAO_ENCONTRADO = "nao_encontrado"
+    PROCESSO = "processo"
+    OUTRA = "outra"
+
+    def __init__(self, html: str, estatisticas: dict = None) -> None:
+        self.html = html
+        self._soup = None
+        self._lower = None
+        self._estatisticas = estatisticas
+
+    @property
+    def soup(self) -> BeautifulSoup:
+        if self._soup is None:
+            inicio = time.perf_counter()
+            self._soup = BeautifulSoup(self.html, features="html.parser")
+            if self._estatisticas is not None:
+                self._estatisticas["parses"] += 1
+                self._estatisticas["segundos"] += time.perf_counter() - inicio
+        return self._soup
+
+    @property
+    def lower(self) -> str:
+        if self._lower is None:
+            self._lower = self.html.lower()
+        return self._lower
+
+    @property
+    def requires_2fa(self) -> bool:
+        return "Informe o código de 6 dígitos gerado" in self.html
+
+    @property
+    def is_cloudflare_captcha(self) -> bool:
+        return bool(self.soup.find("div", attrs={"id": "challenge-stage"})) or "cloudflare" in self.lower
+
+    @property
+    def requires_captcha(self) -> bool:
+        return bool(self.soup.find("div", attrs={"id": "divInfraCaptcha"})) or self.is_cloudflare_captcha
+
+    @property
+    def tipo(self) -> str:
+        if self.requires_captcha:
+            return self.CAPTCHA_CLOUDFLARE if self.is_cloudflare_captcha else self.CAPTCHA_INFRA
+        if self.requires_2fa:
+            return self.DOIS_FATORES
+        if "Processo não encontrado" in self.html:
+            return self.NAO_ENCONTRADO
+        if self.soup.find("table", attrs={"id": "tblEventos"}):
+            return self.PROCESSO
+        if self.soup.find("button", attrs={"data-descricao": True}):
+            return self.SELECAO_PERFIL
+        return self.OUTRA
+
+def _recorta_tabela(html: str, inicio: int):
+    """recorta do html a tabela que comeca em `inicio`, respeitando tabelas aninhadas; None se ela nao fecha"""
+    profundidade = 0
+    for tag in RE_TAG_TABLE.finditer(html, inicio):
+        if tag.group(1):
+            profundidade -= 1
+            if profundidade == 0:
+                return html[inicio:tag.end()]
+        else:
+            profundidade += 1
+    return None
+
+def _eventos_incrementais(parser, texto: str):
+    """entrega o texto ao parser incremental aos poucos, gerando os eventos já disponíveis a cada trecho"""
+    for inicio in range(0, len(texto), CARACTERES_POR_LEITURA):
+        parser.feed(texto[inicio:inicio + CARACTERES_POR_LEITURA])
+        yield from parser.read_events()
+    parser.close()
+    yield from parser.read_events()
+
+def _strings_lxml(elemento):
+    """equivalente ao `.strings` do BeautifulSoup: ignora comentarios e o conteudo de script/style/template"""
+    if elemento.text and elemento.tag not in TAGS_SEM_TEXTO:
+        yield elemento.text
+    for filho in elemento:
+        if isinstance(filho.tag, str) and filho.tag not in TAGS_SEM_TEXTO:
+            yield from _strings_lxml(filho)
+        if filho.tail:
+            yield filho.tail
+
+def _texto_lxml(elemento) -> str:
+    """equivalente ao `get_text(strip=True)` do BeautifulSoup"""
+    return "".join(texto.strip() for texto in _strings_lxml(elemento) if texto.strip())
+
+@functools.lru_cache(maxsize=DIAS_EM_CACHE)
+def _dia_evento(dia: str) -> date:
+    """`date` do dia 'dd/mm/aaaa' de um evento"""
+    return datetime.strptime(dia, "%d/%m/%Y").date()
 
 class HTMLParser:
+    def __init__(self, backend: str = BACKEND_HTML_PARSER, documentos: bool = False, filtro=None) -> None:
+        if backend not in (BACKEND_HTML_PARSER, BACKEND_LXML):
+            raise ValueError(f"Backend de parser desconhecido: {backend}")
+        self.backend = backend
+        # com `documentos`, cada movimentação traz em 'documentos' os anexos (Liminares) do evento
+        self.documentos = documentos
+        # FiltroEventos opcional, aplicado às linhas da tabela antes de montar as movimentações
+        self.filtro = filtro
+        self.estatisticas = {
+            "paginas": 0,
+            "parses": 0,
+            "segundos": 0.0,
+            "linhas_eventos": 0,
+            "segundos_eventos": 0.0,
+            "fallbacks_bs4": 0,
+        }
+
+    def pagina(self, html) -> PaginaEproc:
+        """devolve o modelo da pagina do html; uma PaginaEproc recebida no lugar do html volta como esta.
+
+        O parser nao guarda paginas: cada chamador mantem a sua e a repassa aos metodos abaixo,
+        de modo que o mesmo parser pode atender consultas simultaneas.
+        """
+        if isinstance(html, PaginaEproc):
+            return html
+        self.estatisticas["paginas"] += 1
+        return PaginaEproc(html, self.estatisticas)
+
+    def _soup(self, html: str) -> BeautifulSoup:
+        return self.pagina(html).soup
+
     def requires_2fa(self, html: str) -> bool:
-        return "Informe o código de 6 dígitos gerado" in html
+        return self.pagina(html).requires_2fa
 
     def requires_captcha(self, html: str) -> bool:
-        bs = BeautifulSoup(html, features="html.parser")
-        return bool(bs.find("div", attrs={"id": "divInfraCaptcha"})) or self.is_cloudflare_captcha(html)
+        return self.pagina(html).requires_captcha
 
     def is_cloudflare_captcha(self, html: str) -> bool:
-        bs = BeautifulSoup(html, features="html.parser")
-        return bool(bs.find("div", attrs={"id": "challenge-stage"})) or "cloudflare" in html.lower()
+        return self.pagina(html).is_cloudflare_captcha
+
+    def sessao_expirada(self, html: str) -> bool:
+        """verifica se uma pagina que deveria ser do fluxo logado voltou para o login, captcha ou 2FA"""
+        return any(marcador in html for marcador in MARCADORES_SESSAO_EXPIRADA)
 
     def get_captcha_form(self, html: str) -> dict:
         if self.is_cloudflare_captcha(html):
             return {}
             
-        bs = BeautifulSoup(html, features="html.parser")
+        bs = self._soup(html)
         form = bs.find("form")
         return {i.get("id"): i.get("value", None) for i in form.find_all("input")}
 
     def get_endpoint_form_catpcha(self, html: str) -> str:
-        bs = BeautifulSoup(html, features="html.parser")
+        bs = self._soup(html)
         form = bs.find("form")
         return form.attrs["action"] if form else None
 
-    def salva_imagem_captcha(self, html: str) -> str:
+    def imagem_captcha_base64(self, html: str) -> str:
+        """extrai a imagem do captcha e a converte para JPEG em memória, devolvendo em base64"""
         try:
             if self.is_cloudflare_captcha(html):
                 return None
 
-            bs = BeautifulSoup(html, features="html.parser")
+            bs = self._soup(html)
             div_captcha = bs.find("div", attrs={"id": "divInfraCaptcha"})
             
             if div_captcha:
@@ -61,19 +241,13 @@ class HTMLParser:
                     
                     if img and "src" in img.attrs:
                         image_text = img.attrs["src"]
-                        
-                        filename = os.path.join(CAPTCHA_DIR, "image.png")
-                        new_filename = os.path.join(CAPTCHA_DIR, "new_image.jpg")
-                        
-                        with open(filename, "wb") as arq:
-                            if "data:image" in image_text:
-                                image_text = image_text.split(",")[1]
-                            arq.write(base64.b64decode(image_text))
-                        
-                        im = Image.open(filename)
-                        rgb_im = im.convert("RGB")
-                        rgb_im.save(new_filename)
-                        return new_filename
+                        if "data:image" in image_text:
+                            image_text = image_text.split(",")[1]
+
+                        im = Image.open(io.BytesIO(base64.b64decode(image_text)))
+                        jpeg = io.BytesIO()
+                        im.convert("RGB").save(jpeg, format="JPEG")
+                        return base64.b64encode(jpeg.getvalue()).decode("ascii")
                     else:
                         logger.error("[DEBUG] Atributo 'src' não encontrado na imagem")
                 else:
@@ -83,20 +257,21 @@ class HTMLParser:
                 
             raise SalvarImagemCaptchaException("Não foi possível encontrar a imagem do captcha no HTML")
         except Exception as e:
-            logger.error(f"[DEBUG] Erro ao salvar imagem do captcha: {str(e)}")
+            logger.error(f"[DEBUG] Erro ao extrair imagem do captcha: {str(e)}")
             raise SalvarImagemCaptchaException(str(e))
 
     def get_id_usuario(self, html: str, username: str) -> str:
-        if "usuário logado como" in html.lower():
+        pagina = self.pagina(html)
+        if "usuário logado como" in pagina.lower:
             return None
         else:
-            bs = BeautifulSoup(html, features="html.parser")
+            bs = pagina.soup
             button = bs.find("button", attrs={"data-descricao": f"{username} / ADVOGADO"})
             return re.findall("[0-9]+", button.attrs["onclick"])[0]
     
     def get_menu_links(self, html: str) -> dict:
         """retorna todos os links do menu lateral após logado"""
-        bs = BeautifulSoup(html, features="html.parser")
+        bs = self._soup(html)
         ul = bs.find("ul")
 
         links = {}
@@ -105,7 +280,7 @@ class HTMLParser:
         return links
 
     def get_2fa_form(self, html: str) -> dict:
-        bs = BeautifulSoup(html, features="html.parser")
+        bs = self._soup(html)
         form = bs.find("form")
         return {i.get("id"): i.get("value", None) for i in form.find_all("input")}
 
@@ -140,7 +315,7 @@ class HTMLParser:
         return "ACESSO LIBERADO" in html.upper()
     
     def get_dados_das_liminares(self, html: str) -> list[Liminares]:
-        bs = BeautifulSoup(html, features="html.parser")
+        bs = self._soup(html)
         tr = bs.find("tr", attrs={"id": "trEvento1"})
         liminares = []
         for anchor in tr.find_all("a"):
@@ -154,73 +329,199 @@ class HTMLParser:
         return liminares
 
     def get_endpoint_arquivo(self, html: str) -> str:
-        bs = BeautifulSoup(html, features="html.parser")
+        bs = self._soup(html)
         return bs.find("iframe").attrs["src"]
 
     def get_movimentacoes(self, html: str) -> list:
-        soup = BeautifulSoup(html, 'html.parser')
+        """as movimentações de `lote_movimentacoes` como dicts, ou None sem a tabela de eventos"""
+        lote = self.lote_movimentacoes(html)
+        return list(lote.linhas()) if lote else None
+
+    def lote_movimentacoes(self, html: str):
+        """extrai a tabela de eventos direto num `LoteMovimentacoes`, com a data como `date`.
+
+        Sem a tabela de eventos devolve None; com a tabela vazia o lote traz apenas a linha de aviso.
+        """
+        lotes = self.lotes_movimentacoes(html, tamanho=None)
+        return next(lotes) if lotes is not None else None
+
+    def lotes_movimentacoes(self, html: str, tamanho: int = LINHAS_POR_LOTE):
+        """como `lote_movimentacoes`, mas gera lotes de até `tamanho` linhas à medida que a tabela é lida.
+
+        Com o backend lxml a tabela nunca é montada inteira: cada linha é extraída assim que o parser
+        incremental a fecha e em seguida liberada. Sem a tabela de eventos devolve None (a página é
+        examinada já na chamada); com `tamanho` None gera um único lote.
+        """
+        pagina = self.pagina(html)
+        if self.backend == BACKEND_LXML:
+            eventos = self.__eventos_lxml(pagina)
+        else:
+            eventos = self.__eventos_bs4(pagina)
+        if eventos is None:
+            return None
+        num_processo, linhas = eventos
+        return self.__lotes(num_processo, linhas, tamanho)
+
+    def __lotes(self, num_processo, linhas, tamanho):
+        processo = self.__format_processo(num_processo)
+        colunas = COLUNAS_MOVIMENTACOES + ("documentos",) if self.documentos else COLUNAS_MOVIMENTACOES
+        vazio = True
+        for lote in self.__movimentacoes(processo, linhas, colunas, tamanho):
+            vazio = False
+            yield lote
+        if vazio:
+            lote = LoteMovimentacoes(colunas)
+            lote.acrescenta({
+                'processo': processo,
+                'evento': '',
+                'data': None,
+                'descricao': '',
+                'usuario': '',
+                'tipo': '',
+                'ARQUIVOS': "Nenhuma movimentação correspondeu aos parâmetros de busca."
+            })
+            yield lote
+
+    def __movimentacoes(self, processo: str, linhas, colunas, tamanho):
+        avalia = self.filtro.avaliador() if self.filtro is not None else None
+        lote = LoteMovimentacoes(colunas)
+
+        inicio = time.perf_counter()
+        for evento, data_hora, descricao, info_user, documentos in linhas:
+            data = _dia_evento(data_hora.split(" ", 1)[0])
+            if avalia is not None:
+                decisao = avalia(data, descricao)
+                if decisao == PARAR:
+                    break
+                if decisao == DESCARTAR:
+                    continue
+            if info_user:
+                usuario = sys.intern(info_user[0])
+                tipo = sys.intern(info_user[1]) if len(info_user) >= 2 else ""
+            else:
+                usuario = ""
+                tipo = ""
+
+            if self.documentos:
+                lote.acrescenta_valores((processo, evento, data, descricao, usuario, tipo, documentos))
+            else:
+                lote.acrescenta_valores((processo, evento, data, descricao, usuario, tipo))
+            self.estatisticas["linhas_eventos"] += 1
+            self.estatisticas["segundos_eventos"] += time.perf_counter() - inicio
+            if tamanho and len(lote) >= tamanho:
+                yield lote
+                lote = LoteMovimentacoes(colunas)
+            inicio = time.perf_counter()
+        if lote:
+            yield lote
+
+    def __eventos_bs4(self, pagina: PaginaEproc):
+        """devolve (num_processo, linhas da tabela de eventos) usando a arvore completa do BeautifulSoup"""
+        soup = pagina.soup
         num_processo = (
             soup.find("span", id="txtNumProcesso").get_text(strip=True)
             if soup.find("span", id="txtNumProcesso")
             else None
         )
-        
         tabela = soup.find('table', {'id': 'tblEventos'})
-        movimentacoes = []
-        palavras_chave = ["TRANSITADO EM JULGADO", "TRANSITO", "BAIXA", "DEFINITIVAMENTE", "SENTENÇA", "JULGAD", "DESISTÊNCIA", "HOMOL"]
-        
-        if tabela:
-            linhas = tabela.find_all('tr')
-            for linha in linhas[1:]: 
-                colunas = linha.find_all('td')
+        if not tabela:
+            return None
+        return num_processo, self.__linhas_eventos_bs4(tabela)
+
+    def __linhas_eventos_bs4(self, tabela):
+        linhas = tabela.find_all('tr')
+        for linha in linhas[1:]:
+            colunas = linha.find_all('td')
+            if len(colunas) >= 5:
+                evento = colunas[0].get_text(strip=True)
+                data_hora = colunas[1].get_text(strip=True)
+                descricao = colunas[2].get_text(strip=True)
+                elemento_info_user = colunas[3].find('span', class_='sr-only')
+                if elemento_info_user:
+                    info_user = elemento_info_user.get_text(separator='\n').split('\n')
+                else:
+                    label = colunas[3].find('label', class_='infraEventoUsuario')
+                    if label and 'onmouseover' in label.attrs:
+                        texto = label['onmouseover']
+                        match = re.search(r"carregarInfoUsuarioOutroGrau\('(.+?)'\)", texto)
+                        info_user = match.group(1).split('<br/>') if match else None
+                documentos = None
+                if self.documentos:
+                    documentos = [
+                        Liminares(
+                            tipo_arquivo=anchor.attrs["data-mimetype"],
+                            titulo=anchor.get_text(strip=True) or anchor.attrs.get("title", ""),
+                            endpoint=anchor.attrs.get("href"),
+                        )
+                        for anchor in linha.find_all("a", attrs={"data-mimetype": True})
+                        if anchor.attrs.get("href")
+                    ]
+                yield evento, data_hora, descricao, info_user, documentos
+
+    def __eventos_lxml(self, pagina: PaginaEproc):
+        """mesmo resultado de __eventos_bs4, mas analisando com lxml apenas o trecho da tabela de eventos"""
+        html = pagina.html
+        inicio = RE_TABELA_EVENTOS.search(html)
+        if inicio is None:
+            return None
+        trecho = _recorta_tabela(html, inicio.start())
+        if trecho is None:
+            # sem o fechamento, onde a tabela termina depende das regras do html.parser
+            self.estatisticas["fallbacks_bs4"] += 1
+            logger.warning("Tabela de eventos sem fechamento; extraindo com o html.parser")
+            return self.__eventos_bs4(pagina)
+        num_processo = None
+        span = RE_SPAN_NUM_PROCESSO.search(html)
+        if span:
+            num_processo = _texto_lxml(lxml.html.fragment_fromstring(span.group(0)))
+        return num_processo, self.__linhas_eventos_lxml(trecho)
+
+    def __linhas_eventos_lxml(self, trecho: str):
+        """lê a tabela com o parser incremental do lxml, extraindo cada linha assim que ela fecha"""
+        parser = lxml.etree.HTMLPullParser(events=("start", "end"), tag="tr")
+        # as linhas saem na ordem em que abrem, como no xpath './/tr', mesmo com tabelas aninhadas
+        abertas = deque()
+        fechadas = set()
+        cabecalho = True
+        for acao, linha in _eventos_incrementais(parser, trecho):
+            if acao == "start":
+                abertas.append(linha)
+                continue
+            fechadas.add(linha)
+            while abertas and abertas[0] in fechadas:
+                linha = abertas.popleft()
+                fechadas.discard(linha)
+                if cabecalho:
+                    cabecalho = False
+                    continue
+                colunas = linha.xpath('.//td')
                 if len(colunas) >= 5:
-                    evento = colunas[0].get_text(strip=True)
-                    data_hora = colunas[1].get_text(strip=True)
-                    data_obj = datetime.strptime(data_hora, "%d/%m/%Y %H:%M:%S")
-                    data_formatada = data_obj.strftime("%d-%m-%Y")
-                    descricao = colunas[2].get_text(strip=True)
-                    elemento_info_user = colunas[3].find('span', class_='sr-only')
-                    if elemento_info_user:
-                        info_user = elemento_info_user.get_text(separator='\n').split('\n')
+                    evento = _texto_lxml(colunas[0])
+                    data_hora = _texto_lxml(colunas[1])
+                    descricao = _texto_lxml(colunas[2])
+                    elementos_info_user = colunas[3].xpath(XPATH_CLASSE % ('span', 'sr-only'))
+                    if elementos_info_user:
+                        info_user = '\n'.join(_strings_lxml(elementos_info_user[0])).split('\n')
                     else:
-                        label = colunas[3].find('label', class_='infraEventoUsuario')
-                        if label and 'onmouseover' in label.attrs:
-                            texto = label['onmouseover']
+                        labels = colunas[3].xpath(XPATH_CLASSE % ('label', 'infraEventoUsuario'))
+                        if labels and labels[0].get('onmouseover') is not None:
+                            texto = labels[0].get('onmouseover')
                             match = re.search(r"carregarInfoUsuarioOutroGrau\('(.+?)'\)", texto)
                             info_user = match.group(1).split('<br/>') if match else None
-                        else:
-                            texto = None
-                    if info_user:
-                        usuario = info_user[0]
-                        tipo = info_user[1] if len(info_user) >= 2 else ""
-                    else:
-                        usuario = ""
-                        tipo = ""
-
-                    #FILTRO AQUI
-                    movimentacao = {
-                        'processo': self.__format_processo(num_processo),
-                        'evento': evento,
-                        'data': data_formatada,
-                        'descricao': descricao,
-                        'usuario': usuario,
-                        'tipo': tipo,
-                    }
-                    movimentacoes.append(movimentacao)
-            if movimentacoes == []:
-                movimentacao = {
-                    'processo': self.__format_processo(num_processo),
-                    'evento': '',
-                    'data': '',
-                    'descricao': '',
-                    'usuario': '',
-                    'tipo': '',
-                    'ARQUIVOS': "Nenhuma movimentação correspondeu aos parâmetros de busca."
-                }
-                movimentacoes.append(movimentacao)
-            
-            return movimentacoes
-
+                    documentos = None
+                    if self.documentos:
+                        documentos = [
+                            Liminares(
+                                tipo_arquivo=anchor.get("data-mimetype"),
+                                titulo=_texto_lxml(anchor) or anchor.get("title", ""),
+                                endpoint=anchor.get("href"),
+                            )
+                            for anchor in linha.xpath('.//a[@data-mimetype]')
+                            if anchor.get("href")
+                        ]
+                    yield evento, data_hora, descricao, info_user, documentos
+                # libera a linha ja lida para a memoria nao crescer com o tamanho da tabela
+                linha.clear()
 
     def get_endpoint_download_arquivo(self, html: str) -> str:
         """
@@ -229,7 +530,7 @@ class HTMLParser:
         Se falhar, tenta encontrar dentro de um iframe.
         """
         try:
-            soup = BeautifulSoup(html, 'html.parser')
+            soup = self._soup(html)
 
             # Tenta encontrar os parâmetros nos inputs do HTML
             params = {}
@@ -277,7 +578,7 @@ class HTMLParser:
         return f"{groups.group(1)}-{groups.group(2)}.{groups.group(3)}.{groups.group(4)}.{groups.group(5)}.{groups.group(6)}"
 
     def get_cloudflare_captcha_data(self, html: str):
-        bs = BeautifulSoup(html, features="html.parser")
+        bs = self._soup(html)
         turnstile_div = bs.find('div', {'class': 'cf-turnstile'})
         if not turnstile_div:
             raise SalvarImagemCaptchaException("Não foi possível encontrar o elemento do Turnstile")
@@ -0,0 +1,232 @@
+from .eproc_client import SessaoExpiradaException
+from comum.prazo import sem_prazo
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger()
+
+ESPERA_MAXIMA_SESSAO = 600  # segundos aguardando uma sessão livre antes de desistir
+ESPERA_APOS_FALHA_LOGIN = 30  # segundos antes de tentar logar novamente uma sessão que falhou
+MAX_FALHAS_LOGIN_SEGUIDAS = 5  # acima disso o pool desiste de logar (credenciais erradas bloqueiam a conta)
+INTERVALO_VERIFICACAO = 1  # segundos entre as verificações de quem aguarda uma sessão
+
+class SessaoIndisponivelException(Exception):
+    pass
+
+def contadores_cliente(client) -> dict:
+    """logins, sessões expiradas e estatísticas do parser de um EprocClient, para somar entre sessões"""
+    return {
+        "total_logins": client.total_logins,
+        "sessoes_expiradas": client.sessoes_expiradas,
+        "parser": dict(client.html_parser.estatisticas),
+    }
+
+def soma_contadores(total: dict, parcial: dict) -> dict:
+    """acrescenta a `total` os contadores de `parcial` (mesmo formato de `contadores_cliente`)"""
+    for chave, valor in parcial.items():
+        if isinstance(valor, dict):
+            soma_contadores(total.setdefault(chave, {}), valor)
+        else:
+            total[chave] = total.get(chave, 0) + valor
+    return total
+
+class EprocSessionPool:
+    """Pool de sessões EPROC autenticadas de forma independente para um mesmo base_url.
+
+    Cada consulta usa uma sessão exclusiva, devolvida ao pool no final. Sessões que caem
+    no login, captcha ou 2FA (ou que atingem `max_consultas_por_sessao`) são aposentadas,
+    e as substitutas são logadas em segundo plano. Além das `tamanho` sessões de trabalho,
+    o pool mantém `standby` sessões já logadas para que as consultas não esperem por login.
+    Depois de `max_falhas_login` falhas de login seguidas o pool para de logar; quando não
+    restam sessões, as consultas falham com SessaoIndisponivelException e o erro do login.
+    """
+
+    def __init__(
+        self,
+        fabrica,
+        tamanho: int = 2,
+        standby: int = 1,
+        max_consultas_por_sessao: int = 0,
+        tentativas: int = 2,
+        max_falhas_login: int = MAX_FALHAS_LOGIN_SEGUIDAS,
+    ) -> None:
+        self._fabrica = fabrica
+        self.tamanho = max(1, tamanho)
+        self.standby = max(0, standby)
+        self.max_consultas_por_sessao = max_consultas_por_sessao
+        self.tentativas = max(1, tentativas)
+        self.max_falhas_login = max(1, max_falhas_login)
+
+        self._prontas = queue.Queue()
+        self._lock = threading.Lock()
+        self._logins = ThreadPoolExecutor(
+            max_workers=self.tamanho + self.standby, thread_name_prefix="eproc-login"
+        )
+        self._fechado = False
+        self._em_uso = 0
+        self._em_login = 0
+        self._falhas_seguidas = 0
+        # erro do último login quando o pool desistiu de logar
+        self._erro_login = None
+        # sessões logadas ainda no pool e a soma dos contadores das já aposentadas
+        self._ativas = set()
+        self._contadores_aposentadas = {}
+        self._stats = {
+            "checkouts": 0,
+            "consultas": 0,
+            "logins": 0,
+            "falhas_login": 0,
+            "aposentadas_expiradas": 0,
+            "aposentadas_limite": 0,
+            "espera_total": 0.0,
+        }
+        self._abastece()
+
+    def _abastece(self) -> None:
+        """agenda logins em segundo plano até completar as sessões de trabalho e de reserva"""
+        with self._lock:
+            if self._fechado or self._erro_login is not None:
+                return
+            alvo = self.tamanho + self.standby
+            faltam = alvo - (self._prontas.qsize() + self._em_uso + self._em_login)
+            self._em_login += max(0, faltam)
+        for _ in range(faltam):
+            self._logins.submit(self._loga_nova_sessao)
+
+    def _loga_nova_sessao(self) -> None:
+        with self._lock:
+            if self._erro_login is not None:
+                self._em_login -= 1
+                return
+        try:
+            client = self._fabrica()
+            client.login()
+            if not client.logado:
+                raise SessaoIndisponivelException("Login não concluído")
+        except Exception as e:
+            logger.error(f"[EPROC] Falha ao logar sessão do pool: {str(e)}")
+            with self._lock:
+                self._stats["falhas_login"] += 1
+                self._em_login -= 1
+                self._falhas_seguidas += 1
+                desiste = self._falhas_seguidas >= self.max_falhas_login
+                if desiste:
+                    self._erro_login = e
+            if desiste:
+                logger.error(
+                    f"[EPROC] {self._falhas_seguidas} falhas de login seguidas; o pool não tentará logar "
+                    f"novamente nesta execução. Verifique as credenciais: {str(e)}"
+                )
+                return
+            time.sleep(ESPERA_APOS_FALHA_LOGIN)
+            self._abastece()
+            return
+        with self._lock:
+            self._stats["logins"] += 1
+            self._em_login -= 1
+            self._falhas_seguidas = 0
+            self._ativas.add(client)
+        self._prontas.put(client)
+
+    def _aposenta(self, client, motivo: str) -> None:
+        logger.info(f"[EPROC] Sessão aposentada ({motivo}) após {client.consultas_na_sessao} consulta(s)")
+        with self._lock:
+            self._stats[f"aposentadas_{motivo}"] += 1
+            self._ativas.discard(client)
+            soma_contadores(self._contadores_aposentadas, contadores_cliente(client))
+        self._abastece()
+
+    def _devolve(self, client) -> None:
+        if not client.logado:
+            self._aposenta(client, "expiradas")
+        elif self.max_consultas_por_sessao and client.consultas_na_sessao >= self.max_consultas_por_sessao:
+            self._aposenta(client, "limite")
+        else:
+            self._prontas.put(client)
+
+    @contextmanager
+    def sessao(self, timeout: float = ESPERA_MAXIMA_SESSAO):
+        """empresta uma sessão logada durante o bloco `with`"""
+        inicio = time.time()
+        # a espera por uma sessão livre não consome o prazo da consulta
+        with sem_prazo():
+            client = self._aguarda_sessao(timeout)
+        with self._lock:
+            self._em_uso += 1
+            self._stats["checkouts"] += 1
+            self._stats["espera_total"] += time.time() - inicio
+        try:
+            yield client
+        finally:
+            with self._lock:
+                self._em_uso -= 1
+            self._devolve(client)
+
+    def _aguarda_sessao(self, timeout: float):
+        limite = time.monotonic() + timeout
+        while True:
+            try:
+                return self._prontas.get(timeout=max(0, min(INTERVALO_VERIFICACAO, limite - time.monotonic())))
+            except queue.Empty:
+                pass
+            with self._lock:
+                # nenhuma sessão em uso voltará ao pool e nenhum login será feito
+                sem_sessoes = self._erro_login is not None and self._em_uso == 0 and self._em_login == 0
+            if sem_sessoes:
+                raise SessaoIndisponivelException(
+                    f"Nenhuma sessão EPROC disponível: login falhou {self._falhas_seguidas} vezes seguidas "
+                    f"({str(self._erro_login)})"
+                )
+            if time.monotonic() >= limite:
+                raise SessaoIndisponivelException(f"Nenhuma sessão EPROC disponível após {timeout} segundos")
+
+    def execute(self, nprocesso: str):
+        """consulta o processo, trocando de sessão se a atual expirar.
+
+        Se a sessão expirar em todas as `tentativas`, levanta SessaoExpiradaException: a falha não
+        pode ser confundida com um processo sem movimentações.
+        """
+        for tentativa in range(1, self.tentativas + 1):
+            with self.sessao() as client:
+                with self._lock:
+                    self._stats["consultas"] += 1
+                try:
+                    return client.execute(nprocesso)
+                except SessaoExpiradaException as e:
+                    logger.warning(
+                        f"[EPROC] {str(e)} ao consultar {nprocesso} "
+                        f"(tentativa {tentativa}/{self.tentativas}). Trocando de sessão..."
+                    )
+                    if tentativa == self.tentativas:
+                        raise
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update(
+                tamanho=self.tamanho,
+                standby=self.standby,
+                prontas=self._prontas.qsize(),
+                em_uso=self._em_uso,
+                em_login=self._em_login,
+                login_desistido=self._erro_login is not None,
+            )
+        return stats
+
+    def contadores_clientes(self) -> dict:
+        """soma de `contadores_cliente` de todas as sessões que o pool já logou, ativas e aposentadas"""
+        with self._lock:
+            total = soma_contadores({}, self._contadores_aposentadas)
+            ativas = list(self._ativas)
+        for client in ativas:
+            soma_contadores(total, contadores_cliente(client))
+        return total
+
+    def fechar(self) -> None:
+        with self._lock:
+            self._fechado = True
+        self._logins.shutdown(wait=False)
@@ -1,18 +1,35 @@
 from projudi_tjpr.projudi_client import ProjudiClient
-from eproc.eproc_client import EprocClient
+from eproc.eproc_client import EprocClient, MEDIA_DIR
+from eproc.session_pool import EprocSessionPool, contadores_cliente, soma_contadores
+from comum.lote_movimentacoes import LoteMovimentacoes
+from comum.journal import JournalParcial
+from comum.eventos_store import EventosStore
+from comum.checkpoint import Checkpoint, salva_manifesto, carrega_manifesto, remove_manifesto
+from comum.limitador import configura_limitadores, estatisticas_limitadores
+from comum.prazo import PrazoEsgotadoException, TimeoutAdaptativo, prazo, sem_prazo
+from comum.transporte import configura_transporte, metricas as metricas_transporte
+from comum.downloads import FilaDownloads
+from comum.media_store import MediaStore
+from comum.entrada import PlanilhaProcessos
+from comum.cache_resultados import CacheResultados
+from comum.roteamento import Roteador
+from comum.filtro_eventos import FiltroEventos, PALAVRAS_CHAVE
 import configparser
 import logging
 import os
 import re
 import sys
 import datetime
-import pandas as pd
 import tkinter as tk
 from tkinter import filedialog, messagebox
 import threading
+import queue
+import argparse
 import time
 import traceback
-from functools import wraps
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+import functools
 import gc
 import psutil
 import weakref
@@ -20,113 +37,279 @@ import weakref
 EPROC_SC_BASE_URL = "https://eproc1g.tjsc.jus.br/eproc"
 EPROC_RS_BASE_URL = "https://eproc1g.tjrs.jus.br/eproc"
 
-# Configuração do timeout (em segundos)
-REQUEST_TIMEOUT = 300  # 5 minutos
 SAVE_INTERVAL = 10  # Salvar a cada 10 processos processados
+# No modo --concorrente, linhas da planilha lidas e ainda não consumidas, por consulta simultânea
+JANELA_POR_CONSULTA = 4
+
+# Tribunais suportados, encaminhados pelo segmento J.TR do número CNJ, e o nome usado nos logs.
+# As entradas com base_url são instâncias do EPROC atendidas pelo EprocClient: uma nova instância
+# só precisa de uma linha aqui e da seção CREDENCIAIS.<chave> no config.ini
+TRIBUNAIS = {
+    "PROJUDI": {"nome": "Projudi", "segmento": "816"},
+    "EPROC_SC": {"nome": "Eproc SC", "segmento": "824", "base_url": EPROC_SC_BASE_URL},
+    "EPROC_RS": {"nome": "Eproc RS", "segmento": "821", "base_url": EPROC_RS_BASE_URL},
+}
+INSTANCIAS_EPROC = [tribunal for tribunal, dados in TRIBUNAIS.items() if "base_url" in dados]
+
+class ClientPool:
+    """Mantém até `tamanho` clientes de um mesmo tribunal, um para cada consulta em andamento.
+
+    Os clientes são criados sob demanda pela `fabrica` e reaproveitados entre as consultas,
+    já que cada um guarda a própria sessão e não pode ser usado por duas threads ao mesmo tempo.
+    """
+
+    def __init__(self, fabrica, tamanho, inicial=None):
+        self._fabrica = fabrica
+        self._disponiveis = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._criados = 0
+        self.tamanho = tamanho
+        if inicial is not None:
+            self._disponiveis.put(inicial)
+            self._criados = 1
+
+    def obtem(self):
+        try:
+            return self._disponiveis.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            criar = self._criados < self.tamanho
+            if criar:
+                self._criados += 1
+        if not criar:
+            return self._disponiveis.get()
+        try:
+            return self._fabrica()
+        except Exception:
+            with self._lock:
+                self._criados -= 1
+            raise
 
-class TimeoutError(Exception):
-    pass
+    def devolve(self, client):
+        self._disponiveis.put(client)
 
-def timeout_handler(func, args, kwargs, result, error):
+    def execute(self, num_processo):
+        # criar um cliente novo (login) não consome o prazo da consulta
+        with sem_prazo():
+            client = self.obtem()
+        try:
+            return client.execute(num_processo)
+        finally:
+            self.devolve(client)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Consulta de movimentações processuais")
+    parser.add_argument(
+        "--concorrente",
+        action="store_true",
+        help="processa os tribunais em paralelo, cada um com seu limite de concorrência (config.ini)",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="retoma a última execução interrompida, pulando os processos já concluídos",
+    )
+    parser.add_argument(
+        "--delta",
+        action="store_true",
+        help="emite apenas as movimentações que ainda não constam na base local de eventos",
+    )
+    parser.add_argument(
+        "--baixar-arquivos",
+        action="store_true",
+        help="baixa para MEDIA/ os documentos dos eventos do EPROC e do Projudi, em paralelo com a extração",
+    )
+    parser.add_argument(
+        "--idade-maxima",
+        "--max-age",
+        dest="idade_maxima",
+        type=float,
+        default=None,
+        metavar="HORAS",
+        help="idade máxima dos resultados reaproveitados do cache (0 consulta todos os processos de novo); "
+        "padrão: cache_ttl_horas do config.ini",
+    )
+    parser.add_argument(
+        "--filtrar",
+        action="store_true",
+        help="mantém apenas as movimentações cuja descrição contém uma das palavras_chave do config.ini",
+    )
+    parser.add_argument(
+        "--desde",
+        type=_data,
+        default=None,
+        metavar="DD/MM/AAAA",
+        help="mantém apenas as movimentações a partir desta data",
+    )
+    parser.add_argument(
+        "--ate",
+        type=_data,
+        default=None,
+        metavar="DD/MM/AAAA",
+        help="mantém apenas as movimentações até esta data",
+    )
+    return parser.parse_args(argv)
+
+def _data(valor):
     try:
-        result.append(func(*args, **kwargs))
-    except Exception as e:
-        error.append(e)
-
-def with_timeout(timeout):
-    def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            result = []
-            error = []
-            
-            # Cria uma thread para executar a função
-            thread = threading.Thread(
-                target=timeout_handler,
-                args=(func, args, kwargs, result, error)
-            )
-            thread.daemon = True
-            thread.start()
-            
-            # Espera pelo resultado ou timeout
-            thread.join(timeout)
-            
-            if thread.is_alive():
-                logging.error(f"Timeout na função {func.__name__} após {timeout} segundos")
-                raise TimeoutError(f"A operação excedeu o tempo limite de {timeout} segundos")
-            
-            if error:
-                raise error[0]
-                
-            return result[0]
-        return wrapper
-    return decorator
+        return datetime.datetime.strptime(valor, "%d/%m/%Y").date()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Data inválida: {valor} (use DD/MM/AAAA)")
 
 class MovimentacoesApp:
-    def __init__(self):
+    def __init__(self, opcoes=None):
+        self.opcoes = opcoes if opcoes is not None else parse_args([])
         self._setup_logs()
         logging.info("Iniciando aplicação MovimentacoesApp")
         config = self._read_config()
         
+        manifesto = carrega_manifesto() if self.opcoes.resume else None
+        if self.opcoes.resume and manifesto is None:
+            logging.error("Nenhuma execução interrompida encontrada para retomar")
+            sys.exit(1)
+
+        if manifesto is not None:
+            self.planilha_dir = manifesto["planilha"]
+            self.timestamp = manifesto["timestamp"]
+            logging.info(f"Retomando execução de {self.timestamp} sobre a planilha {self.planilha_dir}")
+        else:
+            self.planilha_dir = self._seleciona_planilha()
+            self.timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+
+        if not os.path.exists(self.planilha_dir):
+            logging.error(f"Arquivo não encontrado: {self.planilha_dir}")
+            messagebox.showerror("Erro", f"O arquivo {self.planilha_dir} não existe!")
+            sys.exit(1)
+
+        # Filtro de movimentações (--filtrar, --desde, --ate), aplicado durante a extração
+        self.filtro = None
+        palavras_chave = (config["palavras_chave"] or PALAVRAS_CHAVE) if self.opcoes.filtrar else ()
+        if palavras_chave or self.opcoes.desde or self.opcoes.ate:
+            self.filtro = FiltroEventos(palavras_chave, self.opcoes.desde, self.opcoes.ate)
+
+        logging.info("Inicializando clientes dos tribunais")
+        configura_limitadores(taxa_inicial=config["taxa_inicial_por_host"], taxa_maxima=config["taxa_maxima_por_host"])
+        configura_transporte(
+            tamanho_pool=max(config["concorrencia"].values()) + config["eproc_standby"] + config["downloads_simultaneos"]
+        )
+        self._fabricas = {
+            "PROJUDI": lambda: ProjudiClient(
+                username=config["projudi_username"],
+                password=config["projudi_password"],
+                token=config["projudi_token"],
+                baixar_documentos=self.opcoes.baixar_arquivos,
+                filtro=self.filtro,
+            ),
+        }
+        for tribunal in INSTANCIAS_EPROC:
+            self._fabricas[tribunal] = functools.partial(self._cria_eproc_client, config, tribunal)
+        self.concorrencia = config["concorrencia"]
+        self.timeouts = {tribunal: TimeoutAdaptativo(maximo=config["timeout_processo"]) for tribunal in TRIBUNAIS}
+        self.eproc_standby = config["eproc_standby"]
+        self.eproc_max_consultas_por_sessao = config["eproc_max_consultas_por_sessao"]
+        self.pools = {}
+
+        self.projudi_client = self._fabricas["PROJUDI"]()
+        self.clients = {"PROJUDI": self.projudi_client}
+        for tribunal in INSTANCIAS_EPROC:
+            self.clients[tribunal] = self._fabricas[tribunal]()
+        self.roteador = Roteador({dados["segmento"]: tribunal for tribunal, dados in TRIBUNAIS.items()})
+        logging.info("Clientes dos tribunais inicializados com sucesso")
+
+        # Inicializa os journals parciais (JSONL, apenas acrescentados a cada salvamento)
+        self.partial_mov_file = f"movimentacoes_parcial_{self.timestamp}.jsonl"
+        self.partial_err_file = f"erros_parcial_{self.timestamp}.jsonl"
+        self.mov_journal = JournalParcial(self.partial_mov_file)
+        self.err_journal = JournalParcial(self.partial_err_file)
+
+        # Processos repetidos na planilha (mesmo número em várias linhas BRADESCO) são consultados uma
+        # única vez; as demais linhas recebem o resultado da primeira. Cada processo consultado guarda
+        # só o intervalo das suas linhas no journal de movimentações (e o erro), e as linhas repetidas
+        # são relidas de lá: nenhuma movimentação fica na memória à espera de uma repetição
+        self.processos_consultados = set()
+        self.resultados_por_processo = {}
+        self.repetidos_aguardando = {}
+        self.linhas_repetidas = 0
+
+        # Checkpoint das linhas concluídas, usado pelo --resume
+        self.checkpoint = Checkpoint(f"checkpoint_{self.timestamp}.txt")
+        if manifesto is not None:
+            logging.info(f"{self.checkpoint.carrega()} processos já concluídos na execução anterior")
+            # os processos já consultados atendem as suas linhas repetidas com as linhas do journal
+            self.processos_consultados.update(self.checkpoint.resultados)
+            self.resultados_por_processo.update(self.checkpoint.resultados)
+            # linhas gravadas depois do último salvamento pertencem a processos que serão consultados de novo
+            if self.checkpoint.tamanhos is not None:
+                for nome, journal in self._journals().items():
+                    journal.trunca(self.checkpoint.tamanhos.get(nome, 0))
+        else:
+            salva_manifesto({"planilha": self.planilha_dir, "timestamp": self.timestamp})
+        
+        # Base local de eventos conhecidos para o modo --delta
+        self.eventos_store = EventosStore() if self.opcoes.delta else None
+        self.eventos_pendentes = []
+
+        # Downloads dos documentos (--baixar-arquivos), feitos em paralelo com a extração
+        self.downloads = FilaDownloads(config["downloads_simultaneos"]) if self.opcoes.baixar_arquivos else None
+        self.media_store = MediaStore(MEDIA_DIR) if self.opcoes.baixar_arquivos else None
+
+        # Cache de resultados entre execuções; os documentos (--baixar-arquivos) dependem da página ao vivo
+        idade_maxima = self.opcoes.idade_maxima if self.opcoes.idade_maxima is not None else config["cache_ttl_horas"]
+        self.cache = None
+        if config["cache_ttl_horas"] > 0 and not self.opcoes.baixar_arquivos:
+            self.cache = CacheResultados(
+                idade_maxima=idade_maxima * 3600,
+                max_processos=config["cache_max_processos"],
+                variante=self.filtro.assinatura() if self.filtro is not None else "",
+            )
+        elif self.opcoes.idade_maxima is not None:
+            motivo = "--baixar-arquivos" if self.opcoes.baixar_arquivos else "cache_ttl_horas = 0 no config.ini"
+            logging.warning(f"--idade-maxima ignorada: o cache de resultados está desligado ({motivo})")
+
+        # Inicializa contadores e listas
+        self.processos_com_erro = []
+        self.ultimo_save = 0
+        self.processados = 0
+
+    def _cria_eproc_client(self, config, tribunal, **kwargs):
+        credenciais = config["credenciais_eproc"][tribunal]
+        return EprocClient(
+            username=credenciais["usuario"],
+            password=credenciais["senha"],
+            base_url=TRIBUNAIS[tribunal]["base_url"],
+            token=credenciais["token"],
+            api_key=config["eproc_api_key_captcha_resolver"],
+            parser_backend=config["parser_eproc"],
+            baixar_documentos=self.opcoes.baixar_arquivos,
+            filtro=self.filtro,
+            **kwargs,
+        )
+
+    def _seleciona_planilha(self):
         # Inicializa o Tkinter
         root = tk.Tk()
         root.withdraw()
         
         # Abre diálogo de seleção de arquivo
         logging.info("Abrindo diálogo para seleção de arquivo")
-        self.planilha_dir = filedialog.askopenfilename(
+        planilha_dir = filedialog.askopenfilename(
             title="Selecione a planilha de processos",
             filetypes=[
                 ("Arquivos Excel", "*.xlsx"),
+                ("Arquivos CSV", "*.csv"),
+                ("Arquivos Parquet", "*.parquet"),
                 ("Todos os arquivos", "*.*")
             ],
             initialdir=os.path.expanduser("~/Downloads")
         )
         
-        if not self.planilha_dir:
+        if not planilha_dir:
             logging.error("Nenhum arquivo foi selecionado")
             messagebox.showerror("Erro", "Nenhum arquivo foi selecionado!")
             sys.exit(1)
-            
-        if not os.path.exists(self.planilha_dir):
-            logging.error(f"Arquivo não encontrado: {self.planilha_dir}")
-            messagebox.showerror("Erro", f"O arquivo {self.planilha_dir} não existe!")
-            sys.exit(1)
-
-        logging.info("Inicializando clientes dos tribunais")
-        self.projudi_client = ProjudiClient(
-            username=config["projudi_username"],
-            password=config["projudi_password"],
-            token=config["projudi_token"],
-        )
-
-        self.eproc_rs_client = EprocClient(
-            username=config["eproc_rs_user"],
-            password=config["eproc_rs_senha"],
-            base_url=EPROC_RS_BASE_URL,
-            token=config["eproc_rs_token"],
-            api_key=config["eproc_api_key_captcha_resolver"],
-        )
 
-        self.eproc_sc_client = EprocClient(
-            username=config["eproc_sc_user"],
-            password=config["eproc_sc_senha"],
-            base_url=EPROC_SC_BASE_URL,
-            token=config["eproc_sc_token"],
-            api_key=config["eproc_api_key_captcha_resolver"],
-        )
-        logging.info("Clientes dos tribunais inicializados com sucesso")
-
-        # Inicializa os nomes dos arquivos parciais
-        timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-        self.partial_mov_file = f"movimentacoes_parcial_{timestamp}.xlsx"
-        self.partial_err_file = f"erros_parcial_{timestamp}.xlsx"
-        
-        # Inicializa contadores e listas
-        self.todas_movimentacoes = []
-        self.processos_com_erro = []
-        self.ultimo_save = 0
-        self.processados = 0
+        return planilha_dir
 
     def _setup_logs(self):
         logs_path = os.path.join(os.path.abspath(os.getcwd()), "logs")
@@ -159,46 +342,104 @@ class MovimentacoesApp:
             
         return memory_percent
 
-    def _save_partial_results(self, todas_movimentacoes, processos_com_erro):
-        """Salva resultados parciais em arquivos Excel"""
-        try:
-            if todas_movimentacoes:
-                df = pd.DataFrame(todas_movimentacoes)
-                colunas = ['processo', 'BRADESCO'] + [col for col in df.columns if col not in ['processo', 'BRADESCO']]
-                df = df[colunas]
-                
-                # Se o arquivo já existe, lê e concatena com os novos dados
-                if os.path.exists(self.partial_mov_file):
-                    df_existente = pd.read_excel(self.partial_mov_file)
-                    df = pd.concat([df_existente, df], ignore_index=True)
-                
-                df.to_excel(self.partial_mov_file, index=False)
-                logging.info(f"Arquivo parcial de movimentações atualizado: {self.partial_mov_file}")
-                # Limpa a lista após salvar
-                todas_movimentacoes.clear()
+    def _journals(self):
+        return {"movimentacoes": self.mov_journal, "erros": self.err_journal}
 
+    def _save_partial_results(self, processos_com_erro):
+        """Garante em disco as movimentações já gravadas e acrescenta os erros pendentes aos journals"""
+        try:
             if processos_com_erro:
-                df_erros = pd.DataFrame(processos_com_erro, columns=['Processo', 'Erro'])
-                
-                # Se o arquivo já existe, lê e concatena com os novos dados
-                if os.path.exists(self.partial_err_file):
-                    df_erros_existente = pd.read_excel(self.partial_err_file)
-                    df_erros = pd.concat([df_erros_existente, df_erros], ignore_index=True)
-                
-                df_erros.to_excel(self.partial_err_file, index=False)
-                logging.info(f"Arquivo parcial de erros atualizado: {self.partial_err_file}")
+                self.err_journal.acrescenta(
+                    {"Processo": processo, "Erro": erro} for processo, erro in processos_com_erro
+                )
+                logging.info(f"{len(processos_com_erro)} erros acrescentados em {self.partial_err_file}")
                 # Limpa a lista após salvar
                 processos_com_erro.clear()
-                
+
+            # Marca as linhas como concluídas junto com o tamanho dos journals já em disco, e só então
+            # registra os eventos (--delta): um --resume descarta o que não foi confirmado aqui
+            self.checkpoint.grava({nome: journal.tamanho() for nome, journal in self._journals().items()})
+            if self.eventos_pendentes:
+                self.eventos_store.registra(self.eventos_pendentes)
+                self.eventos_pendentes.clear()
+
             # Força coleta de lixo após salvar
             gc.collect()
-            
+
         except Exception as e:
             logging.error(f"Erro ao salvar resultados parciais: {str(e)}")
             logging.error(traceback.format_exc())
 
-    @with_timeout(REQUEST_TIMEOUT)
-    def _execute_with_timeout(self, client, num_processo):
+    def _exporta_planilhas(self, sufixo):
+        """Monta as planilhas a partir dos journals, mantendo 'processo' e 'BRADESCO' como primeiras colunas"""
+        arquivos = []
+        for journal, prefixo, colunas in (
+            (self.mov_journal, "movimentacoes", ["processo", "BRADESCO"]),
+            (self.err_journal, "erros", ["Processo", "Erro"]),
+        ):
+            if not journal.existe():
+                continue
+            destino = f"{prefixo}_{sufixo}.xlsx"
+            linhas = journal.exporta_xlsx(destino, colunas)
+            logging.info(f"Arquivo {destino} salvo com {linhas} linhas")
+            arquivos.append((journal, destino))
+        return arquivos
+
+    def _log_estatisticas(self):
+        """Registra no log os contadores da execução: roteamento, logins e parser de cada tribunal EPROC
+        (somando as sessões do pool no modo --concorrente), limitadores, downloads, cache e transporte"""
+        logging.info(
+            f"{len(self.processos_consultados)} processo(s) distinto(s) consultado(s); "
+            f"{self.linhas_repetidas} linha(s) repetida(s) da planilha atendida(s) sem nova consulta"
+        )
+        logging.info(f"Roteamento da planilha: {self.roteador.estatisticas()}")
+        for tribunal in INSTANCIAS_EPROC:
+            nome, client = TRIBUNAIS[tribunal]["nome"], self.clients[tribunal]
+            contadores = contadores_cliente(client)
+            pool = self.pools.get(tribunal)
+            if isinstance(pool, EprocSessionPool):
+                soma_contadores(contadores, pool.contadores_clientes())
+            logging.info(
+                f"{nome}: {contadores['total_logins']} login(s) realizados, "
+                f"{contadores['sessoes_expiradas']} sessão(ões) expirada(s) durante a execução"
+            )
+            logging.info(f"{nome}: clearance {client.clearance.estatisticas()}")
+            parser = contadores["parser"]
+            logging.info(
+                f"{nome}: {parser['parses']} parse(s) HTML para {parser['paginas']} página(s) "
+                f"em {parser['segundos']:.2f} segundos"
+            )
+            if parser["segundos_eventos"]:
+                logging.info(
+                    f"{nome}: {parser['linhas_eventos']} eventos extraídos "
+                    f"({parser['linhas_eventos'] / parser['segundos_eventos']:.0f} linhas/s)"
+                )
+            if parser["fallbacks_bs4"]:
+                logging.info(f"{nome}: {parser['fallbacks_bs4']} tabela(s) de eventos sem fechamento lidas com o html.parser")
+        captcha = self.clients[INSTANCIAS_EPROC[0]].captcha.estatisticas()
+        if captcha["enviados"]:
+            logging.info(f"Captchas (2captcha): {captcha}")
+        logging.info(f"Projudi: {self.projudi_client.projudi_data.estatisticas}")
+        for host, stats in estatisticas_limitadores().items():
+            logging.info(f"Limitador de taxa {host}: {stats}")
+        if self.downloads is not None:
+            logging.info(f"Downloads: {self.downloads.estatisticas()}")
+            logging.info(f"Documentos em {MEDIA_DIR}: {self.media_store.estatisticas()}")
+        if self.cache is not None:
+            logging.info(f"Cache de resultados: {self.cache.estatisticas()}")
+        if self.filtro is not None:
+            logging.info(f"Filtro de movimentações: {self.filtro.estatisticas()}")
+        for endpoint, stats in sorted(metricas_transporte.estatisticas().items(), key=lambda item: -item[1]["segundos"]):
+            logging.info(
+                f"{endpoint}: {stats['requisicoes']} requisição(ões), "
+                f"média {stats['segundos'] / stats['requisicoes']:.2f}s (máx. {stats['maximo_segundos']:.2f}s), "
+                f"{stats['bytes'] / 1024:.0f} KiB"
+            )
+        for tribunal, pool in self.pools.items():
+            if isinstance(pool, EprocSessionPool):
+                logging.info(f"Pool de sessões {TRIBUNAIS[tribunal]['nome']}: {pool.estatisticas()}")
+
+    def _consulta(self, client, num_processo):
         return client.execute(num_processo)
 
     def _read_config(self):
@@ -209,126 +450,429 @@ class MovimentacoesApp:
             "projudi_username": config["CREDENCIAIS.PROJUDI"]["usuario"],
             "projudi_password": config["CREDENCIAIS.PROJUDI"]["senha"],
             "projudi_token": config["CREDENCIAIS.PROJUDI"]["token_2fa"],
-            "eproc_sc_user": config["CREDENCIAIS.EPROC_SC"]["usuario"],
-            "eproc_sc_senha": config["CREDENCIAIS.EPROC_SC"]["senha"],
-            "eproc_sc_token": config["CREDENCIAIS.EPROC_SC"]["token"],
-            "eproc_rs_user": config["CREDENCIAIS.EPROC_RS"]["usuario"],
-            "eproc_rs_senha": config["CREDENCIAIS.EPROC_RS"]["senha"],
-            "eproc_rs_token": config["CREDENCIAIS.EPROC_RS"]["token"],
+            "credenciais_eproc": {
+                tribunal: {
+                    "usuario": config[f"CREDENCIAIS.{tribunal}"]["usuario"],
+                    "senha": config[f"CREDENCIAIS.{tribunal}"]["senha"],
+                    "token": config[f"CREDENCIAIS.{tribunal}"]["token"],
+                }
+                for tribunal in INSTANCIAS_EPROC
+            },
             "eproc_api_key_captcha_resolver": config["CONFIGURACOES"]["api_key_captcha_resolver"],
+            "concorrencia": {
+                tribunal: config.getint("CONFIGURACOES", f"concorrencia_{tribunal.lower()}", fallback=1)
+                for tribunal in TRIBUNAIS
+            },
+            "parser_eproc": config.get("CONFIGURACOES", "parser_eproc", fallback="html.parser"),
+            "eproc_standby": config.getint("CONFIGURACOES", "sessoes_standby_eproc", fallback=1),
+            "eproc_max_consultas_por_sessao": config.getint("CONFIGURACOES", "max_consultas_por_sessao_eproc", fallback=0),
+            "taxa_inicial_por_host": config.getfloat("CONFIGURACOES", "taxa_inicial_por_host", fallback=0),
+            "taxa_maxima_por_host": config.getfloat("CONFIGURACOES", "taxa_maxima_por_host", fallback=0),
+            "timeout_processo": config.getfloat("CONFIGURACOES", "timeout_processo", fallback=300),
+            "downloads_simultaneos": config.getint("CONFIGURACOES", "downloads_simultaneos", fallback=4),
+            "cache_ttl_horas": config.getfloat("CONFIGURACOES", "cache_ttl_horas", fallback=24),
+            "cache_max_processos": config.getint("CONFIGURACOES", "cache_max_processos", fallback=5000),
+            "palavras_chave": [
+                palavra.strip()
+                for palavra in config.get("CONFIGURACOES", "palavras_chave", fallback="").split(",")
+                if palavra.strip()
+            ],
         }
 
-    def _is_projudi(self, processo):
-        processo = re.sub("[^0-9]", "", str(processo))
-        return len(processo) == 20 and processo[13:16] == "816"
-
-    def _is_eproc_rs(self, processo):
-        processo = re.sub("[^0-9]", "", str(processo))
-        return len(processo) == 20 and processo[13:16] == "821"
-
-    def _is_eproc_sc(self, processo):
-        processo = re.sub("[^0-9]", "", str(processo))
-        return len(processo) == 20 and processo[13:16] == "824"
-
-    def adjust_process_length(self, process):
-        return re.sub("[^0-9]", "", str(process)).rjust(20, "0")
-
     def get_processos(self):
-        df = pd.read_excel(self.planilha_dir)
-        return df[["PROCESSO", "BRADESCO"]].values.tolist()
+        return PlanilhaProcessos(self.planilha_dir)
+
+    def _executa_processo(self, client, tribunal, num_processo, em_lotes=False):
+        """Consulta um processo e devolve (lotes de movimentacoes, erro, duracao) sem propagar exceções.
+
+        As requisições da consulta respeitam o prazo adaptativo do tribunal. As movimentações vêm em
+        `LoteMovimentacoes` preenchidos pelo extrator: com `em_lotes`, gerados à medida que a tabela é
+        lida (a leitura acontece quando os lotes são consumidos, já fora do prazo); senão, num único
+        lote. Um resultado recente do cache é devolvido sem acessar o tribunal.
+        """
+        start_time = time.time()
+        if self.cache is not None:
+            movs = self.cache.consulta(tribunal, num_processo)
+            if movs is not None:
+                logging.info(f"Processo {num_processo}: resultado reaproveitado do cache")
+                return [movs], None, time.time() - start_time
+        timeout = self.timeouts[tribunal]
+        segundos = timeout.segundos()
+        try:
+            with prazo(segundos):
+                if em_lotes:
+                    lotes = client.lotes_movimentacoes(num_processo)
+                else:
+                    lotes = [self._consulta(client, num_processo)]
+            duracao = time.time() - start_time
+            timeout.registra(duracao)
+            if self.cache is not None:
+                if em_lotes:
+                    lotes = self._armazena_no_cache(tribunal, num_processo, lotes)
+                elif lotes[0]:
+                    # os clientes devolvem um lote vazio quando a consulta falha
+                    self.cache.armazena(tribunal, num_processo, lotes[0])
+            return lotes, None, duracao
+        except PrazoEsgotadoException as e:
+            timeout.registra_esgotado(segundos)
+            logging.error(f"Timeout ao processar processo {num_processo} (prazo de {segundos:.0f} segundos): {str(e)}")
+            return None, "Timeout", time.time() - start_time
+        except Exception as e:
+            logging.error(f"Erro ao processar processo {num_processo}: {str(e)}")
+            logging.error(traceback.format_exc())
+            return None, str(e), time.time() - start_time
+
+    def _armazena_no_cache(self, tribunal, num_processo, lotes):
+        """Repassa os lotes do processo e o guarda no cache depois que a tabela inteira foi lida sem erro"""
+        completo = LoteMovimentacoes()
+        for lote in lotes:
+            completo.estende(lote)
+            yield lote
+        if completo:
+            self.cache.armazena(tribunal, num_processo, completo)
+
+    def _grava_movimentacoes(self, idx, num_processo, bradesco, lotes):
+        """Enriquece os lotes de movimentações do processo e os grava; devolve (extraidas, gravadas, intervalo).
+
+        Cada lote vai para o journal assim que é extraído, e o processo só é marcado no checkpoint
+        depois do último; se algo falhar no meio da tabela, as linhas já gravadas do processo são
+        descartadas. `intervalo` traz as posições das linhas no journal. Com --baixar-arquivos, um
+        processo com documentos fica retido (`intervalo` None): suas linhas só são gravadas, e o
+        processo marcado como concluído, quando os downloads terminarem.
+        """
+        extraidas = 0
+        gravadas = 0
+        inicio = self.mov_journal.total_linhas
+        eventos_pendentes = len(self.eventos_pendentes)
+        # com --baixar-arquivos as linhas esperam os documentos antes de ir para o journal
+        retidas = LoteMovimentacoes() if self.downloads is not None else None
+        try:
+            for movs in lotes:
+                extraidas += len(movs)
+                if self.eventos_store is not None:
+                    # modo --delta: só as movimentações que ainda não estão na base de eventos
+                    movs = self.eventos_store.novas(movs)
+                movs.define('BRADESCO', bradesco)
+                gravadas += len(movs)
+                if retidas is not None:
+                    retidas.estende(movs)
+                else:
+                    self._grava_lote(movs)
+        except BaseException:
+            self.mov_journal.descarta(inicio)
+            del self.eventos_pendentes[eventos_pendentes:]
+            raise
+        if retidas is None:
+            return extraidas, gravadas, (inicio, self.mov_journal.total_linhas)
+        if self._agenda_downloads(idx, num_processo, retidas):
+            return extraidas, gravadas, None
+        return extraidas, gravadas, self._grava_lote(retidas)
+
+    def _agenda_downloads(self, idx, num_processo, movs):
+        """Preenche ARQUIVOS com os documentos já baixados e agenda os que faltam; devolve se o processo fica retido"""
+        documentos_por_linha = []
+        tarefas = []
+        for (processo, evento), documentos_linha in zip(movs.valores(("processo", "evento")), movs.remove('documentos')):
+            documentos = []
+            for documento in documentos_linha or []:
+                # documentos já presentes no MEDIA/ (desta ou de outra execução) não são baixados de novo
+                caminho = self.media_store.consulta(processo, evento, documento.titulo)
+                if caminho is None:
+                    tarefas.append(functools.partial(
+                        self.media_store.armazena, processo, evento, documento.titulo,
+                        documento.extensao, documento.baixa,
+                    ))
+                documentos.append((documento, caminho))
+            documentos_por_linha.append(documentos)
+
+        if not tarefas:
+            self._preenche_arquivos(movs, documentos_por_linha)
+            return False
+        # os eventos novos (--delta) só entram na base quando as linhas forem gravadas
+        self.downloads.agenda((idx, num_processo, movs, documentos_por_linha), tarefas)
+        logging.info(f"Processo {num_processo}: {len(tarefas)} documento(s) na fila de downloads")
+        return True
+
+    def _preenche_arquivos(self, movs, documentos_por_linha):
+        for posicao, ((arquivos,), documentos) in enumerate(zip(movs.valores(("ARQUIVOS",)), documentos_por_linha)):
+            if arquivos is None:
+                arquivos = "Nenhum arquivo disponível"
+            movs.atribui('ARQUIVOS', posicao, self._arquivos(documentos) or arquivos)
+
+    @staticmethod
+    def _arquivos(documentos):
+        return ", ".join(caminho for _, caminho in documentos)
+
+    def _descarrega_downloads(self, espera=False):
+        """Grava as linhas dos processos cujos downloads terminaram e os marca como concluídos"""
+        if self.downloads is None:
+            return
+        for (idx, num_processo, movs, documentos_por_linha), resultados in self.downloads.concluidos(espera):
+            baixados = iter(resultados)
+            for (evento,), documentos in zip(movs.valores(("evento",)), documentos_por_linha):
+                for posicao, (documento, caminho) in enumerate(documentos):
+                    if caminho is not None:
+                        continue
+                    resultado = next(baixados)
+                    if isinstance(resultado, Exception):
+                        self.processos_com_erro.append((
+                            num_processo, f"Erro ao baixar {documento.titulo} do evento {evento}: {str(resultado)}"
+                        ))
+                        resultado = "Erro ao baixar arquivo"
+                    documentos[posicao] = (documento, resultado)
+            self._preenche_arquivos(movs, documentos_por_linha)
+            intervalo = self._grava_lote(movs)
+            self._conclui_processo(idx, num_processo, intervalo, None)
+
+    def _grava_lote(self, movs):
+        """Grava as linhas do processo no journal e devolve o seu intervalo nele.
+
+        No modo --delta, os eventos entram na base no próximo salvamento.
+        """
+        intervalo = self.mov_journal.escreve_lote(movs)
+        if self.eventos_store is not None:
+            self.eventos_pendentes.append(movs)
+        return intervalo
+
+    def _conclui_processo(self, idx, num_processo, intervalo, erro):
+        """Marca a linha no checkpoint, guarda onde estão as linhas do processo no journal e as repassa
+        às linhas repetidas que esperavam por ele.
+
+        O resultado vai junto com a marcação, para que um --resume atenda as repetições seguintes
+        sem consultar o processo de novo (no modo --delta, a base de eventos já teria todos eles).
+        """
+        inicio, fim = intervalo
+        self.resultados_por_processo[num_processo] = (inicio, fim, erro)
+        self.checkpoint.marca(idx, num_processo, (inicio, fim, erro))
+        for idx, bradesco in self.repetidos_aguardando.pop(num_processo, []):
+            self._replica_resultado(idx, num_processo, bradesco)
+
+    def _replica_resultado(self, idx, num_processo, bradesco):
+        """Grava, para uma linha repetida da planilha, o resultado já obtido para o mesmo processo"""
+        if num_processo not in self.resultados_por_processo:
+            # a primeira linha do processo ainda aguarda os downloads
+            self.repetidos_aguardando.setdefault(num_processo, []).append((idx, bradesco))
+            return
+        inicio, fim, erro = self.resultados_por_processo[num_processo]
+        movs = self.mov_journal.lote(inicio, fim)
+        movs.define('BRADESCO', bradesco)
+        self.mov_journal.escreve_lote(movs)
+        if erro is not None:
+            self.processos_com_erro.append((num_processo, erro))
+        self.checkpoint.marca(idx, num_processo)
+        self.linhas_repetidas += 1
+
+    def _registra_resultado(self, idx, num_processo, bradesco, lotes, erro, duracao):
+        extraidas = 0
+        gravadas = 0
+        intervalo = (0, 0)
+        if erro is None:
+            try:
+                extraidas, gravadas, intervalo = self._grava_movimentacoes(idx, num_processo, bradesco, lotes)
+            except Exception as e:
+                logging.error(f"Erro ao extrair movimentações do processo {num_processo}: {str(e)}")
+                logging.error(traceback.format_exc())
+                erro = str(e)
+
+        if erro is not None:
+            self.processos_com_erro.append((num_processo, erro))
+        elif extraidas:
+            if self.eventos_store is not None:
+                logging.info(f"Processo {num_processo}: {gravadas} de {extraidas} movimentações são novas")
+            logging.info(f"Processo {num_processo} processado com sucesso em {duracao:.2f} segundos")
+        else:
+            logging.warning(f"Nenhuma movimentação encontrada para o processo {num_processo}")
+            erro = "Nenhuma movimentação encontrada"
+            self.processos_com_erro.append((num_processo, erro))
+
+        if intervalo is not None:
+            self._conclui_processo(idx, num_processo, intervalo, erro)
+        self._descarrega_downloads()
+
+    def _salva_se_necessario(self, idx, total_processos):
+        # Salva resultados parciais a cada SAVE_INTERVAL processos
+        if idx - self.ultimo_save >= SAVE_INTERVAL:
+            self._save_partial_results(self.processos_com_erro)
+            self.ultimo_save = idx
+            self.processados = idx
+            logging.info(f"Progresso: {idx}/{total_processos or '?'} processos processados")
+            for host, stats in estatisticas_limitadores().items():
+                logging.info(f"{host}: {stats['taxa']} req/s, {stats['proporcao_captcha']:.1%} de captchas")
+
+    def _rejeita(self, idx, num_processo, erro):
+        """Registra uma linha da planilha recusada pelo roteamento, sem consultar nenhum tribunal"""
+        logging.warning(f"Processo {num_processo} não consultado: {erro}")
+        self.checkpoint.marca(idx, num_processo)
+        self.processos_com_erro.append((num_processo, erro))
+
+    def _repetido(self, num_processo):
+        """Indica se o processo já foi consultado nesta execução; senão, o registra como consultado"""
+        if num_processo in self.processos_consultados:
+            return True
+        self.processos_consultados.add(num_processo)
+        return False
+
+    def _run_sequencial(self, processos):
+        for idx, (processo, bradesco) in enumerate(processos, 1):
+            # Monitora memória a cada 10 processos
+            if idx % 10 == 0:
+                self._monitor_memory()
+
+            num_processo, tribunal, erro = self.roteador.roteia(processo)
+            if self.checkpoint.concluido(idx, num_processo):
+                continue
+            logging.info(f"Processando processo {idx}/{processos.total or '?'}: {num_processo}")
+
+            if erro is not None:
+                self._rejeita(idx, num_processo, erro)
+                continue
+
+            if self._repetido(num_processo):
+                logging.info(f"Processo {num_processo} repetido na planilha, reaproveitando o resultado")
+                self._replica_resultado(idx, num_processo, bradesco)
+            else:
+                logging.info(f"Processo {num_processo} identificado como {TRIBUNAIS[tribunal]['nome']}")
+                # as linhas vão para o journal enquanto a tabela de eventos é lida
+                lotes, erro, duracao = self._executa_processo(
+                    self.clients[tribunal], tribunal, num_processo, em_lotes=True
+                )
+                self._registra_resultado(idx, num_processo, bradesco, lotes, erro, duracao)
+            self._salva_se_necessario(idx, processos.total)
+
+    def _cria_pool(self, tribunal, limite):
+        if tribunal == "PROJUDI":
+            return ClientPool(self._fabricas[tribunal], limite, inicial=self.clients[tribunal])
+        fabrica = self._fabricas[tribunal]
+        return EprocSessionPool(
+            lambda: fabrica(relogin_automatico=False),
+            tamanho=limite,
+            standby=self.eproc_standby,
+            max_consultas_por_sessao=self.eproc_max_consultas_por_sessao,
+        )
+
+    def _run_concorrente(self, processos):
+        """Distribui os processos em uma fila por tribunal e consulta as filas em paralelo.
+
+        As consultas começam enquanto a planilha ainda está sendo lida, e os resultados são
+        consumidos na ordem da planilha, de modo que as movimentações, os erros e os salvamentos
+        parciais são os mesmos de uma execução sequencial. A leitura da planilha avança no máximo
+        JANELA_POR_CONSULTA linhas por consulta simultânea à frente do consumo, de modo que as
+        consultas enviadas e os resultados à espera crescem com a concorrência, não com a planilha.
+        """
+        pools = self.pools
+        executores = {}
+        pendentes = deque()
+        janela = 0
+        try:
+            for idx, (processo, bradesco) in enumerate(processos, 1):
+                num_processo, tribunal, erro = self.roteador.roteia(processo)
+                if self.checkpoint.concluido(idx, num_processo):
+                    continue
+                if erro is not None or self._repetido(num_processo):
+                    pendentes.append((idx, num_processo, bradesco, erro, None))
+                else:
+                    if tribunal not in executores:
+                        limite = max(1, self.concorrencia[tribunal])
+                        pools[tribunal] = self._cria_pool(tribunal, limite)
+                        executores[tribunal] = ThreadPoolExecutor(max_workers=limite, thread_name_prefix=tribunal)
+                        janela += JANELA_POR_CONSULTA * limite
+                        logging.info(f"Fila {TRIBUNAIS[tribunal]['nome']} iniciada com concorrência {limite}")
+                    futuro = executores[tribunal].submit(self._executa_processo, pools[tribunal], tribunal, num_processo)
+                    pendentes.append((idx, num_processo, bradesco, None, futuro))
+
+                # consome os resultados já prontos sem esperar o fim da leitura da planilha e, com a
+                # janela cheia, espera o mais antigo antes de ler a próxima linha
+                while pendentes and (
+                    pendentes[0][4] is None or pendentes[0][4].done() or len(pendentes) >= max(janela, 1)
+                ):
+                    self._consome_resultado(*pendentes.popleft(), processos.total)
+
+            while pendentes:
+                self._consome_resultado(*pendentes.popleft(), processos.total)
+        finally:
+            for _, _, _, _, futuro in pendentes:
+                if futuro is not None:
+                    futuro.cancel()
+            for executor in executores.values():
+                executor.shutdown(wait=False)
+            for pool in pools.values():
+                if isinstance(pool, EprocSessionPool):
+                    pool.fechar()
+
+    def _consome_resultado(self, idx, num_processo, bradesco, erro, futuro, total_processos):
+        if idx % 10 == 0:
+            self._monitor_memory()
+
+        if erro is not None:
+            self._rejeita(idx, num_processo, erro)
+            return
+
+        if futuro is None:
+            self._replica_resultado(idx, num_processo, bradesco)
+        else:
+            lotes, erro, duracao = futuro.result()
+            self._registra_resultado(idx, num_processo, bradesco, lotes, erro, duracao)
+        self._salva_se_necessario(idx, total_processos)
 
     def run(self):
         try:
             logging.info("Iniciando processamento dos processos")
             processos = self.get_processos()
-            total_processos = len(processos)
-            logging.info(f"Total de processos a serem processados: {total_processos}")
+            logging.info(f"Lendo os processos de {self.planilha_dir}")
             
             # Inicializa contadores
             self.processados = 0
             self.ultimo_save = 0
-            
-            for idx, (processo, bradesco) in enumerate(processos, 1):
-                try:
-                    # Monitora memória a cada 10 processos
-                    if idx % 10 == 0:
-                        self._monitor_memory()
-                        
-                    num_processo = self.adjust_process_length(processo)
-                    logging.info(f"Processando processo {idx}/{total_processos}: {num_processo}")
-
-                    start_time = time.time()
-                    movs = None
-
-                    if self._is_projudi(num_processo):
-                        logging.info(f"Processo {num_processo} identificado como Projudi")
-                        movs = self._execute_with_timeout(self.projudi_client, num_processo)
-                    elif self._is_eproc_sc(num_processo):
-                        logging.info(f"Processo {num_processo} identificado como Eproc SC")
-                        movs = self._execute_with_timeout(self.eproc_sc_client, num_processo)
-                    elif self._is_eproc_rs(num_processo):
-                        logging.info(f"Processo {num_processo} identificado como Eproc RS")
-                        movs = self._execute_with_timeout(self.eproc_rs_client, num_processo)
-                    else:
-                        logging.warning(f"Processo {num_processo} não pertence a nenhum tribunal suportado")
-                        self.processos_com_erro.append((num_processo, "Tribunal não suportado"))
-                        continue
 
-                    if movs:
-                        for mov in movs:
-                            mov['BRADESCO'] = bradesco
-                        self.todas_movimentacoes.extend(movs)
-                        logging.info(f"Processo {num_processo} processado com sucesso em {time.time() - start_time:.2f} segundos")
-                    else:
-                        logging.warning(f"Nenhuma movimentação encontrada para o processo {num_processo}")
-                        self.processos_com_erro.append((num_processo, "Nenhuma movimentação encontrada"))
-
-                except TimeoutError:
-                    logging.error(f"Timeout ao processar processo {num_processo}")
-                    self.processos_com_erro.append((num_processo, "Timeout"))
-                except Exception as e:
-                    logging.error(f"Erro ao processar processo {num_processo}: {str(e)}")
-                    logging.error(traceback.format_exc())
-                    self.processos_com_erro.append((num_processo, str(e)))
-
-                # Salva resultados parciais a cada SAVE_INTERVAL processos
-                if idx - self.ultimo_save >= SAVE_INTERVAL:
-                    self._save_partial_results(self.todas_movimentacoes, self.processos_com_erro)
-                    self.ultimo_save = idx
-                    self.processados = idx
-                    logging.info(f"Progresso: {idx}/{total_processos} processos processados")
-
-            # Salva resultados finais
-            self._save_partial_results(self.todas_movimentacoes, self.processos_com_erro)
-            
-            # Renomeia os arquivos parciais para finais
-            final_mov_file = f"movimentacoes_final_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-            final_err_file = f"erros_final_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-            
-            if os.path.exists(self.partial_mov_file):
-                os.rename(self.partial_mov_file, final_mov_file)
-                logging.info(f"Arquivo final de movimentações salvo como: {final_mov_file}")
-            
-            if os.path.exists(self.partial_err_file):
-                os.rename(self.partial_err_file, final_err_file)
-                logging.info(f"Arquivo final de erros salvo como: {final_err_file}")
-
-            logging.info(f"Processamento concluído. Total de processos processados: {self.processados}/{total_processos}")
+            if self.opcoes.concorrente:
+                self._run_concorrente(processos)
+            else:
+                self._run_sequencial(processos)
 
+            # Aguarda os downloads pendentes e salva resultados finais
+            self._descarrega_downloads(espera=True)
+            self._save_partial_results(self.processos_com_erro)
+            
+            # Monta as planilhas finais a partir dos journals parciais
+            sufixo = f"final_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            for journal, _ in self._exporta_planilhas(sufixo):
+                journal.remove()
+            self.checkpoint.remove()
+            remove_manifesto()
+
+            logging.info(f"Processamento concluído. Total de processos processados: {self.processados}/{processos.total or '?'}")
+            self._log_estatisticas()
+
+        except KeyboardInterrupt:
+            self._save_partial_results(self.processos_com_erro)
+            logging.info("Execução interrompida. Use --resume para continuar de onde parou")
+            raise
         except Exception as e:
             logging.error(f"Erro fatal durante a execução: {str(e)}")
             logging.error(traceback.format_exc())
             # Tenta salvar resultados parciais mesmo em caso de erro fatal
-            self._save_partial_results(self.todas_movimentacoes, self.processos_com_erro)
+            self._descarrega_downloads()
+            self._save_partial_results(self.processos_com_erro)
+            try:
+                self._exporta_planilhas(f"parcial_{self.timestamp}")
+            except Exception:
+                logging.error(traceback.format_exc())
+            logging.info("Use --resume para continuar de onde parou")
             raise
         finally:
             # Limpa recursos
-            self.todas_movimentacoes.clear()
+            if self.downloads is not None:
+                self.downloads.fechar()
+                self.media_store.fecha()
+            if self.cache is not None:
+                self.cache.fecha()
+            if self.eventos_store is not None:
+                self.eventos_store.fecha()
             self.processos_com_erro.clear()
             gc.collect()
 
 if __name__ == "__main__":
-    app = MovimentacoesApp()
+    app = MovimentacoesApp(parse_args())
     try:
         app.run()
     except KeyboardInterrupt:
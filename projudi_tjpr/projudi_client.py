@@ -1,4 +1,6 @@
 from .robo.projudi_data import ProjudiData
+from comum.lote_movimentacoes import LoteMovimentacoes
+from comum.prazo import PrazoEsgotadoException
 import logging
 import time
 import os
@@ -10,13 +12,15 @@ MEDIA_DIR = "MEDIA"
 os.makedirs(MEDIA_DIR, exist_ok=True)
 
 class ProjudiClient:
-    def __init__(self, username: str, password: str, token: str) -> None:
+    def __init__(self, username: str, password: str, token: str, baixar_documentos: bool = False, filtro=None) -> None:
         max_retries = 5
         retry_delay = 30
         
         for attempt in range(max_retries):
             try:
-                self.projudi_data = ProjudiData(user=username, pwd=password, token=token)
+                self.projudi_data = ProjudiData(
+                    user=username, pwd=password, token=token, baixar_documentos=baixar_documentos, filtro=filtro
+                )
                 break
             except Exception as e:
                 if attempt == max_retries - 1:
@@ -26,17 +30,21 @@ class ProjudiClient:
                 logging.getLogger().warning(f"[PROJUDI] Tentativa {attempt + 1} de login falhou. Aguardando {retry_delay} segundos...")
                 time.sleep(retry_delay)
 
-    def execute(self, nprocesso: str):
+    def execute(self, nprocesso: str) -> LoteMovimentacoes:
+        """consulta o processo e devolve as suas movimentações num lote (vazio se a consulta falhar)"""
         try:
             if self.projudi_data.open_process(nprocesso):
-                movimentacoes = self.projudi_data.extract_tabela_movimentacoes(nprocesso)
-                return movimentacoes
-            return []
+                return self.projudi_data.extract_tabela_movimentacoes(nprocesso)
+            return LoteMovimentacoes()
+        except PrazoEsgotadoException:
+            raise
         except Exception as e:
             logging.getLogger().error(
                 f"[PROJUDI] Ocorreu um erro ao buscar movimentações do processo: {nprocesso}"
             )
             logging.getLogger().exception(e)
-            return []
+            return LoteMovimentacoes()
 
-        
\ No newline at end of file
+    def lotes_movimentacoes(self, nprocesso: str):
+        """interface de `EprocClient.lotes_movimentacoes`; o Projudi já traz a página inteira, num único lote"""
+        return [self.execute(nprocesso)]
@@ -1,8 +1,19 @@
 from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+import functools
+import queue
 import re
-from datetime import datetime
-from robobrowser import RoboBrowser
+import sys
+from datetime import date, datetime
 from .projudi_session import make_session
+from comum.downloads import baixa_arquivo
+from comum.filtro_eventos import DESCARTAR, PARAR
+from comum.limitador import requisicao_limitada
+from comum.lote_movimentacoes import LoteMovimentacoes
+from comum.prazo import verifica_prazo
+from comum.transporte import copia_sessao
+from urllib.parse import urljoin
 import os
 
 MEDIA_DIR = "MEDIA"
@@ -10,60 +21,200 @@ MEDIA_DIR = "MEDIA"
 # Cria o diretório MEDIA se não existir
 os.makedirs(MEDIA_DIR, exist_ok=True)
 
+# Trechos da URL que indicam que a sessão voltou para o início ou para o login
+URLS_FORA_DA_BUSCA = ("/projudi/home.do", "login", "logon")
+
+# Trechos de páginas de captcha, usados pelo limitador de taxa
+MARCADORES_CAPTCHA = (b"g-recaptcha", b"cf-turnstile")
+
+# colunas das linhas de movimentações, na ordem em que são gravadas
+COLUNAS_MOVIMENTACOES = ("processo", "evento", "data", "descricao", "usuario", "tipo", "ARQUIVOS", "tipo_arquivo")
+
+# Link da primeira coluna da movimentação para a página com os documentos dela
+RE_URL_DOCUMENTOS = re.compile(r"/projudi/processo/movimentacaoArquivoDocumento\.do\?_tj=[a-zA-Z0-9]+")
+
+# dias distintos convertidos, compartilhados entre processos (muitas movimentações caem no mesmo dia)
+DIAS_EM_CACHE = 8192
+
+# páginas de documentos de um processo abertas ao mesmo tempo
+PAGINAS_DOCUMENTOS_SIMULTANEAS = 4
+
+# tipos de conteúdo que nunca são um documento: a sessão caiu e o servidor devolveu uma página
+TIPOS_FORA_DO_DOCUMENTO = ("text/html",)
+
+class DocumentoIndisponivelException(Exception):
+    pass
+
+class DocumentoMovimentacao:
+    def __init__(self, tipo_arquivo, titulo, url):
+        self.tipo_arquivo = tipo_arquivo
+        self.titulo = titulo
+        self.url = url
+        self.extensao = (os.path.splitext(titulo)[1][1:] or "bin").lower()
+        # preenchido pelo ProjudiData: baixa(destino) grava o documento usando a sessão autenticada
+        self.baixa = None
+
+def fora_da_busca(url: str) -> bool:
+    """indica se a URL é a home ou o login, para onde o servidor manda quando a sessão cai"""
+    return any(trecho in (url or "") for trecho in URLS_FORA_DA_BUSCA)
+
+def confere_documento(response) -> None:
+    """recusa, antes de gravar, a resposta que trouxe o login ou uma página HTML no lugar do documento"""
+    if fora_da_busca(response.url):
+        raise DocumentoIndisponivelException(f"Sessão expirada: redirecionado para {response.url}")
+    tipo = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+    if tipo in TIPOS_FORA_DO_DOCUMENTO:
+        raise DocumentoIndisponivelException(f"Página recebida no lugar do documento ({tipo})")
+
+def campos_formulario(form) -> dict:
+    """valores enviados ao submeter o formulário, como faz o navegador (botão incluído se for o único)"""
+    campos = {}
+    botoes = [
+        botao for botao in form.find_all("input", attrs={"type": re.compile("^submit$", re.I)})
+        if botao.get("name")
+    ]
+    for campo in form.find_all(["input", "select", "textarea"]):
+        nome = campo.get("name")
+        if not nome:
+            continue
+        if campo.name == "input":
+            tipo = (campo.get("type") or "text").lower()
+            if tipo == "submit" and len(botoes) == 1:
+                campos[nome] = campo.get("value", "")
+                continue
+            if tipo in ("submit", "button", "image", "reset", "file"):
+                continue
+            if tipo in ("checkbox", "radio") and not campo.has_attr("checked"):
+                continue
+            campos[nome] = campo.get("value", "on" if tipo in ("checkbox", "radio") else "")
+        elif campo.name == "select":
+            opcao = campo.find("option", selected=True) or campo.find("option")
+            campos[nome] = (opcao.get("value", opcao.get_text()) if opcao else "")
+        else:
+            campos[nome] = campo.get_text()
+    return campos
+
+@functools.lru_cache(maxsize=DIAS_EM_CACHE)
+def _dia_movimentacao(dia: str) -> date:
+    """`date` do dia 'aaaa-mm-dd' de uma movimentação"""
+    return datetime.strptime(dia, "%Y-%m-%d").date()
+
 class ProjudiData:
-    def __init__(self, user: str, pwd: str, token: str) -> None:
+    def __init__(self, user: str, pwd: str, token: str, baixar_documentos: bool = False, filtro=None) -> None:
         self.BASE_URL = "https://projudi.tjpr.jus.br"
         self.URL_PESQUISA = f"{self.BASE_URL}/projudi/processo/buscaProcessosQualquerInstancia.do?actionType=pesquisar"
         self.session = make_session(user, pwd, token)
-        self.browser = RoboBrowser(session=self.session, parser="html.parser")
+        # URL e DOM da última resposta; cada instância tem os seus, sem estado compartilhado
+        self.url = None
+        self.pagina = None
+        # action, método e campos do formulário de busca, válidos enquanto a sessão não cair
+        self._busca = None
+        self.baixar_documentos = baixar_documentos
+        # FiltroEventos opcional, aplicado às linhas da tabela antes de montar as movimentações
+        self.filtro = filtro
+        self.estatisticas = {"buscas": 0, "navegacoes_busca": 0, "invalidacoes_busca": 0, "paginas_documentos": 0}
+
+    def _le_resposta(self, response) -> BeautifulSoup:
+        """parseia a resposta uma única vez, direto dos bytes, e guarda como página atual"""
+        self.url = response.url
+        self.pagina = BeautifulSoup(response.content, "html.parser")
+        return self.pagina
+
+    def _get(self, url: str, **kwargs) -> BeautifulSoup:
+        return self._le_resposta(requisicao_limitada(self.session, "GET", url, MARCADORES_CAPTCHA, **kwargs))
+
+    def _post(self, url: str, data: dict) -> BeautifulSoup:
+        return self._le_resposta(requisicao_limitada(self.session, "POST", url, MARCADORES_CAPTCHA, data=data))
+
+    def _submete(self, action: str, method: str, campos: dict) -> BeautifulSoup:
+        if method == "post":
+            return self._post(action, campos)
+        return self._get(action, params=campos)
+
+    def _formulario(self, form) -> tuple:
+        """action absoluta, método e campos de um formulário da página atual"""
+        action = urljoin(self.url, form.get("action") or self.url)
+        method = (form.get("method") or "get").lower()
+        return action, method, campos_formulario(form)
 
     def _open_home(self) -> bool:
-        self.browser.open(url=f"{self.BASE_URL}/projudi/home.do")
-        lis = self.browser.find_all("li", {"class": "externo"})
+        pagina = self._get(f"{self.BASE_URL}/projudi/home.do")
 
-        for li in lis:
-            html = BeautifulSoup(str(li), "html.parser")
-            link = html.select("li", limit=1)[0].attrs.get("onclick")
+        for li in pagina.find_all("li", {"class": "externo"}):
+            link = li.attrs.get("onclick")
 
             if link and link.startswith(
                 "document.location.href='/projudi/autenticacao.do"
             ):
                 link = link.split("href='")[1].split("';")[0]
                 link = f"{self.BASE_URL}{link}"
-                self.browser.open(link)
+                self._get(link)
                 return True
         return False
 
-    def open_process(self, number: str):
-        if self._open_home():
-            html = BeautifulSoup(str(self.browser.response.content), "html.parser")
-            link = html.select_one('a[title^="Busca por processos de 1"]').attrs["href"]
+    def _carrega_busca(self) -> bool:
+        """navega da home até a busca por processos de 1º grau e guarda o formulário de busca"""
+        self.estatisticas["navegacoes_busca"] += 1
+        if not self._open_home():
+            return False
+        link = self.pagina.select_one('a[title^="Busca por processos de 1"]').attrs["href"]
+        pagina = self._get(f"{self.BASE_URL}{link}")
+        self._busca = self._formulario(pagina.find("form"))
+        return True
 
-            self.browser.open(f"{self.BASE_URL}{link}")
-            pesq_form = self.browser.get_form()
-            pesq_form["numeroProcesso"] = number
-            self.browser.submit_form(pesq_form)
+    def _fora_da_busca(self) -> bool:
+        """indica se o servidor redirecionou para a home ou para o login, invalidando a busca em cache"""
+        return fora_da_busca(self.url)
 
-            html = BeautifulSoup(str(self.browser.response.content), "html.parser")
-            link_processo = html.select_one('a[href^="/projudi/processo.do?_tj="]')
+    def open_process(self, number: str):
+        for _ in range(2):
+            if self._busca is None and not self._carrega_busca():
+                return False
+            verifica_prazo("a busca do processo")
+            action, method, campos = self._busca
+            campos = dict(campos, numeroProcesso=number)
+            self.estatisticas["buscas"] += 1
+            pagina = self._submete(action, method, campos)
+            if self._fora_da_busca():
+                self._busca = None
+                self.estatisticas["invalidacoes_busca"] += 1
+                continue
 
+            link_processo = pagina.select_one('a[href^="/projudi/processo.do?_tj="]')
             if link_processo:
                 link_processo = link_processo.attrs["href"]
-                self.browser.open(f"{self.BASE_URL}{link_processo}")
+                verifica_prazo("a abertura do processo")
+                self._get(f"{self.BASE_URL}{link_processo}")
                 return True
+            return False
         return False
 
-    def _open_tab(self, tab: str):
-        form = self.browser.get_form()
-        form["selectedIcon"] = tab
-        self.browser.submit_form(form)
-
-    def extract_tabela_movimentacoes(self, processo):
-        resultado = []
-        palavras_chave = ["TRANSITADO EM JULGADO", "TRANSITO", "BAIXA", "DEFINITIVAMENTE", "SENTENÇA", "JULGAD", "DESISTÊNCIA", "HOMOL",]
-        self._open_tab("tabMovimentacoesProcesso")
-        soup = BeautifulSoup(str(self.browser.parsed), "html.parser")
-        tabela = soup.find("table", attrs={"class": "resultTable"})
+    def _open_tab(self, tab: str) -> BeautifulSoup:
+        verifica_prazo(f"a aba {tab}")
+        action, method, campos = self._formulario(self.pagina.find("form"))
+        campos["selectedIcon"] = tab
+        return self._submete(action, method, campos)
+
+    def extract_tabela_movimentacoes(self, processo) -> LoteMovimentacoes:
+        """abre a aba de movimentações e extrai as linhas da tabela direto num `LoteMovimentacoes`"""
+        pagina = self._open_tab("tabMovimentacoesProcesso")
+        tabela = pagina.find("table", attrs={"class": "resultTable"})
+        lote = LoteMovimentacoes(COLUNAS_MOVIMENTACOES)
+        if not self.baixar_documentos:
+            self.__movimentacoes(tabela, processo, lote)
+            return lote
+        # etapa separada: as páginas de documentos só são abertas depois de lida a tabela inteira
+        urls_documentos = []
+        self.__movimentacoes(tabela, processo, lote, urls_documentos)
+        paginas = self._documentos_eventos([url for _, url in urls_documentos])
+        for (posicao, _), documentos in zip(urls_documentos, paginas):
+            lote.atribui("documentos", posicao, documentos)
+            lote.atribui("tipo_arquivo", posicao, ", ".join(documento.tipo_arquivo for documento in documentos))
+        return lote
+
+    def __movimentacoes(self, tabela, processo, lote: LoteMovimentacoes, urls_documentos=None) -> None:
+        avalia = self.filtro.avaliador() if self.filtro is not None else None
+        processo_formatado = self.__format_processo(processo)
         linhas = tabela.find_all("tr")
         for linha in linhas:
             colunas = linha.find_all("td")
@@ -72,57 +223,30 @@ class ProjudiData:
             texto_linha = linha.get_text(strip=True)
             evento = colunas[1].get_text(strip=True)
             data_str = colunas[2].get_text(strip=True).split("\n")[0].strip()
-            data_obj = datetime.strptime(data_str, "%Y-%m-%d %H:%M:%S.%f")
-            data_formatada = data_obj.strftime("%d-%m-%Y")
+            data = _dia_movimentacao(data_str.split(" ", 1)[0])
             descricao = colunas[3].text.strip().replace("\t", "").replace("\n", "").replace("\r", "")
             descricao = re.sub(r'\s+', ' ', descricao)
+            if avalia is not None:
+                decisao = avalia(data, descricao)
+                if decisao == PARAR:
+                    break
+                if decisao == DESCARTAR:
+                    continue
             movimentado_por = colunas[4].text.strip().replace("\t", "").replace("\r", "").replace("\n", " ").split("  ", maxsplit=1)
-            usuario = movimentado_por[0]
-            tipo = movimentado_por[1] if len(movimentado_por) >= 2 else ""
-            #FILTRO AQUI
-            evento_dict = {
-                "processo": self.__format_processo(processo),
-                "evento": evento,
-                "data": data_formatada,
-                "descricao": descricao,
-                "usuario": usuario,
-                "tipo": tipo.upper(),
-                "ARQUIVOS": "", 
-                "tipo_arquivo": "",
-            }
-            resultado.append(evento_dict)
-
-               # url_arquivos_regex = r"/projudi/processo/movimentacaoArquivoDocumento\.do\?_tj=[a-zA-Z0-9]+"
-              #       url_arquivos_regex, str(linha.find_all("td")[0])
-              #  )[0]
-              #  self.browser.open(f"{self.BASE_URL}{arquivos_url}")
-
-    #            arquivos_salvos = []  
-    #            tipos_arquivos = []  
-    #            for arquivo in self._get_arquivos_urls(processo, evento):
-    #                extensao = arquivo['filename'].split('.')[-1]
-    #                descricao_resume = " ".join(re.findall(r'\b[A-ZÀ-Ú]+\b', descricao))
-    #                nome_arquivo = f"{processo}-{descricao_resume}-{data_formatada}.{extensao}"
-
-    #                with open(f"{MEDIA_DIR}/{nome_arquivo}", "wb") as arq:
-    #                    self.browser.follow_link({"href": arquivo["url"]}, method="GET")
-    #                    arq.write(self.browser.response.content)
-
-    #                arquivos_salvos.append(nome_arquivo)
-    #                tipos_arquivos.append(arquivo["tipo_arquivo"])
-
-                    # Atualiza o dicionário existente na lista `resultado`
-    #            evento_dict["ARQUIVOS"] = ", ".join(arquivos_salvos)
-    #            evento_dict["tipo_arquivo"] = ", ".join(tipos_arquivos)
-
-        if resultado == []:
-            resultado.append({
-                "processo": self.__format_processo(processo),
+            usuario = sys.intern(movimentado_por[0])
+            tipo = sys.intern(movimentado_por[1].upper()) if len(movimentado_por) >= 2 else ""
+            posicao = lote.acrescenta_valores((processo_formatado, evento, data, descricao, usuario, tipo, "", ""))
+            if urls_documentos is not None:
+                url = RE_URL_DOCUMENTOS.search(str(colunas[0]))
+                if url:
+                    urls_documentos.append((posicao, f"{self.BASE_URL}{url.group(0)}"))
+
+        if not lote:
+            lote.acrescenta({
+                "processo": processo_formatado,
                 "ARQUIVOS": "Nenhuma movimentação correspondeu aos parâmetros de busca."
             })
 
-        return resultado
-
     
     def __format_processo(self, nbr: str) -> str:
         nbr = re.sub("[^0-9]", "", nbr)
@@ -133,16 +257,53 @@ class ProjudiData:
         groups = regex.search(nbr)
         return f"{groups.group(1)}-{groups.group(2)}.{groups.group(3)}.{groups.group(4)}.{groups.group(5)}.{groups.group(6)}" 
 
-    def _get_arquivos_urls(self, num_processo, num_movimentacao):
-        result = []
-        for tr in self.browser.find_all("tr"):
-            if not len(tr.find_all("td")) == 9:
+    def _documentos_eventos(self, urls: list) -> list:
+        """lista os documentos das movimentações, abrindo as páginas num pool limitado
+
+        Cada thread usa a sua cópia da sessão, feita aqui; os downloads dos documentos do processo
+        usam outra, de modo que nem o pool nem a fila de downloads tocam em `self.session`.
+        """
+        if not urls:
+            return []
+        verifica_prazo("as páginas de documentos")
+        self.estatisticas["paginas_documentos"] += len(urls)
+        simultaneas = min(PAGINAS_DOCUMENTOS_SIMULTANEAS, len(urls))
+        sessoes = queue.Queue()
+        for _ in range(simultaneas):
+            sessoes.put(copia_sessao(self.session))
+        sessao_downloads = copia_sessao(self.session)
+
+        def documentos_evento(url):
+            session = sessoes.get()
+            try:
+                return self._documentos_evento(session, sessao_downloads, url)
+            finally:
+                sessoes.put(session)
+
+        # cada página roda numa cópia do contexto atual, para levar junto o prazo da consulta
+        contextos = [contextvars.copy_context() for _ in urls]
+        with ThreadPoolExecutor(max_workers=simultaneas, thread_name_prefix="projudi-documentos") as executor:
+            return list(executor.map(lambda contexto, url: contexto.run(documentos_evento, url), contextos, urls))
+
+    def _documentos_evento(self, session, sessao_downloads, url: str) -> list:
+        """lista os documentos de uma movimentação; o download fica para o pool de downloads"""
+        verifica_prazo("a página de documentos")
+        response = requisicao_limitada(session, "GET", url, MARCADORES_CAPTCHA)
+        if fora_da_busca(response.url):
+            # a sessão caiu: a próxima busca navega de novo a partir da home
+            self._busca = None
+            raise DocumentoIndisponivelException(f"Sessão expirada ao abrir a página de documentos {url}")
+        pagina = BeautifulSoup(response.content, "html.parser")
+        documentos = []
+        for tr in pagina.find_all("tr"):
+            colunas = tr.find_all("td")
+            if not len(colunas) == 9:
                 continue
-            tipo_arquivo = re.sub(r"[(\n+)(\t+)(\r+)]+", " ", tr.find_all("td")[0].text)
             link = tr.find("a")
-            url = link.attrs["href"]
-            filename = f"{num_processo}_{num_movimentacao}_{link.text.strip()}"
-            result.append(
-                {"tipo_arquivo": tipo_arquivo, "url": url, "filename": filename}
-            )
-        return result
+            if link is None or not link.get("href"):
+                continue
+            tipo_arquivo = re.sub(r"[(\n+)(\t+)(\r+)]+", " ", colunas[0].text).strip()
+            documento = DocumentoMovimentacao(tipo_arquivo, link.text.strip(), urljoin(response.url, link.attrs["href"]))
+            documento.baixa = functools.partial(baixa_arquivo, sessao_downloads, documento.url, confere=confere_documento)
+            documentos.append(documento)
+        return documentos
@@ -1,4 +1,5 @@
 from pyjudi_tjpr import Authenticator
+from comum.transporte import monta_sessao
 import logging
 
 def make_session(usr: str, pwd: str, token: str):
@@ -14,6 +15,8 @@ def make_session(usr: str, pwd: str, token: str):
         "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.11 (KHTML, like Gecko) Chrome/23.0.1271.64"
     }
 
+    monta_sessao(session)
+
     logging.getLogger().info("Sessão no projudi iniciada com sucesso.")
 
     return session 
\ No newline at end of file
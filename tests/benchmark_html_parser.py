@@ -0,0 +1,47 @@
+"""Linhas por segundo da tabela de eventos do EPROC em cada backend do HTMLParser.
+
+Uso: python tests/benchmark_html_parser.py [linhas] [repeticoes]
+
+A página é montada repetindo as linhas da fixture processo.html até o número de linhas pedido.
+"""
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from eproc.html_parser import HTMLParser, BACKEND_HTML_PARSER, BACKEND_LXML
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "eproc", "processo.html")
+RE_LINHA_EVENTO = re.compile(r'<tr id="trEvento\d+">.*?</tr>', re.DOTALL)
+
+def pagina_grande(linhas: int) -> str:
+    with open(FIXTURE, encoding="utf-8") as arq:
+        html = arq.read()
+    eventos = RE_LINHA_EVENTO.findall(html)
+    repetidas = (eventos * (linhas // len(eventos) + 1))[:linhas]
+    inicio = html.index(eventos[0])
+    fim = html.index(eventos[-1]) + len(eventos[-1])
+    return html[:inicio] + "".join(repetidas) + html[fim:]
+
+def linhas_por_segundo(backend: str, html: str, repeticoes: int) -> float:
+    melhor = None
+    for _ in range(repeticoes):
+        parser = HTMLParser(backend=backend)
+        inicio = time.perf_counter()
+        linhas = len(parser.get_movimentacoes(html))
+        segundos = time.perf_counter() - inicio
+        melhor = segundos if melhor is None else min(melhor, segundos)
+    return linhas / melhor
+
+def main(argv) -> None:
+    linhas = int(argv[0]) if argv else 5000
+    repeticoes = int(argv[1]) if len(argv) > 1 else 3
+    html = pagina_grande(linhas)
+    print(f"{linhas} eventos, {len(html) / 1024:.0f} KiB, melhor de {repeticoes}")
+    for backend in (BACKEND_HTML_PARSER, BACKEND_LXML):
+        print(f"{backend:12} {linhas_por_segundo(backend, html, repeticoes):10.0f} linhas/s")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,43 @@
+"""Parses e tempo de CPU das perguntas feitas a uma página de login com captcha do EPROC.
+
+Uso: python tests/benchmark_pagina_eproc.py [repeticoes]
+
+Compara as mesmas perguntas do fluxo de login (classificação, formulário, endpoint e imagem do
+captcha) feitas com o html, que é analisado de novo a cada pergunta, e com a PaginaEproc.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from eproc.html_parser import HTMLParser
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "eproc", "captcha_infra.html")
+
+def perguntas_do_login(parser: HTMLParser, pagina) -> None:
+    if parser.requires_captcha(pagina) or parser.requires_2fa(pagina):
+        if parser.requires_captcha(pagina) and not parser.is_cloudflare_captcha(pagina):
+            parser.get_captcha_form(pagina)
+            parser.imagem_captcha_base64(pagina)
+            parser.get_endpoint_form_catpcha(pagina)
+        parser.requires_2fa(pagina)
+
+def mede(repeticoes: int, modelo: bool) -> tuple:
+    with open(FIXTURE, encoding="utf-8") as arq:
+        html = arq.read()
+    parser = HTMLParser()
+    inicio = time.process_time()
+    for _ in range(repeticoes):
+        perguntas_do_login(parser, parser.pagina(html) if modelo else html)
+    segundos = time.process_time() - inicio
+    return parser.estatisticas["parses"] / repeticoes, segundos * 1000 / repeticoes
+
+def main(argv) -> None:
+    repeticoes = int(argv[0]) if argv else 50
+    for descricao, modelo in (("html a cada pergunta", False), ("PaginaEproc", True)):
+        parses, milissegundos = mede(repeticoes, modelo)
+        print(f"{descricao:22} {parses:4.1f} parse(s)/página {milissegundos:8.2f} ms de CPU/página")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
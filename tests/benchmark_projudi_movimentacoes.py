@@ -0,0 +1,59 @@
+"""Parses e tempo de CPU da aba de movimentações do Projudi, antes e depois da saída do RoboBrowser.
+
+Uso: python tests/benchmark_projudi_movimentacoes.py [movimentacoes] [repeticoes]
+
+Com o RoboBrowser, a resposta da aba era analisada ao abrir (`browser.parsed`) e a extração a
+serializava e analisava de novo (`BeautifulSoup(str(self.browser.parsed))`); hoje a resposta é
+analisada uma única vez, direto dos bytes. Só a análise da página e a localização das linhas da
+tabela são medidas: a leitura de cada linha é a mesma nos dois casos. A página é sintética, com
+a estrutura da tabela `resultTable` e o número de movimentações pedido.
+"""
+import sys
+import time
+from bs4 import BeautifulSoup
+
+LINHA = (
+    '<tr><td><a href="/projudi/processo/movimentacaoArquivoDocumento.do?_tj=abc{n}">'
+    '<img src="/projudi/imagens/arquivo.png"></a></td><td>{n}</td>'
+    '<td>2023-05-02 10:00:00.0\n</td><td>\n\t\tJUNTADA DE PETIÇÃO DE MANIFESTAÇÃO DA PARTE\n\t</td>'
+    '<td>FULANO DE TAL  Advogado</td></tr>'
+)
+
+def pagina(movimentacoes: int) -> bytes:
+    menu = "".join(f'<li class="item"><a href="/projudi/menu{i}.do">Item {i}</a></li>' for i in range(200))
+    linhas = "".join(LINHA.format(n=n) for n in range(movimentacoes, 0, -1))
+    return (
+        f'<html><head><title>Projudi</title></head><body><ul>{menu}</ul>'
+        f'<form action="/projudi/processo.do" method="post"><input type="hidden" name="_tj" value="x">'
+        f'<input type="hidden" name="selectedIcon" value=""></form>'
+        f'<table class="resultTable"><tr><th>Movimentações</th></tr>{linhas}</table></body></html>'
+    ).encode("utf-8")
+
+def linhas_robobrowser(conteudo: bytes) -> list:
+    parsed = BeautifulSoup(conteudo, "html.parser")
+    soup = BeautifulSoup(str(parsed), "html.parser")
+    return soup.find("table", attrs={"class": "resultTable"}).find_all("tr")
+
+def linhas_sessao(conteudo: bytes) -> list:
+    pagina = BeautifulSoup(conteudo, "html.parser")
+    return pagina.find("table", attrs={"class": "resultTable"}).find_all("tr")
+
+def mede(extrai, conteudo: bytes, repeticoes: int) -> float:
+    melhor = None
+    for _ in range(repeticoes):
+        inicio = time.process_time()
+        extrai(conteudo)
+        segundos = time.process_time() - inicio
+        melhor = segundos if melhor is None else min(melhor, segundos)
+    return melhor * 1000
+
+def main(argv) -> None:
+    movimentacoes = int(argv[0]) if argv else 300
+    repeticoes = int(argv[1]) if len(argv) > 1 else 5
+    conteudo = pagina(movimentacoes)
+    print(f"{movimentacoes} movimentações, {len(conteudo) / 1024:.0f} KiB, melhor de {repeticoes}")
+    for descricao, parses, extrai in (("RoboBrowser", 2, linhas_robobrowser), ("sessão direta", 1, linhas_sessao)):
+        print(f"{descricao:14} {parses} parse(s)/aba {mede(extrai, conteudo, repeticoes):8.1f} ms de CPU/aba")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
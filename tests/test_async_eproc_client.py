@@ -0,0 +1,160 @@
+import asyncio
+import json
+import os
+import time
+import pytest
+from aiohttp import web
+from comum.limitador import limitador_compartilhado
+from comum.prazo import PrazoEsgotadoException, TimeoutAdaptativo, prazo
+from eproc.async_client import AsyncClient
+from eproc.async_eproc_client import AsyncEprocClient
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "eproc")
+
+PAGINA_LOGADA = (
+    "<html><body><p>Usuário logado como FULANO</p>"
+    '<ul><li><a href="controlador.php?acao=consultar"><span>Consultar Processos</span></a></li></ul>'
+    "</body></html>"
+)
+PAGINA_CONSULTA = (
+    "<html><body><form>"
+    '<script>url = "controlador_ajax.php?acao_ajax=processos_consulta_por_numprocesso&hash=abc123";</script>'
+    "</form></body></html>"
+)
+RESULTADO_CONSULTA = json.dumps({"resultados": [{"linkProcessoAssinado": "controlador.php?acao=processo_selecionar&hash=def456"}]})
+
+def le_fixture(nome: str) -> str:
+    with open(os.path.join(FIXTURES, nome), encoding="utf-8") as arq:
+        return arq.read()
+
+class StubEproc:
+    """servidor local com as páginas do fluxo de consulta; `atraso_processo` segura a página do processo"""
+
+    def __init__(self, atraso_processo: float = 0) -> None:
+        self.atraso_processo = atraso_processo
+        self.requisicoes = 0
+        self._runner = None
+        self.base_url = None
+
+    async def _login(self, request):
+        self.requisicoes += 1
+        return web.Response(text=PAGINA_LOGADA, content_type="text/html")
+
+    async def _controlador(self, request):
+        self.requisicoes += 1
+        if request.query.get("acao") == "consultar":
+            return web.Response(text=PAGINA_CONSULTA, content_type="text/html")
+        await asyncio.sleep(self.atraso_processo)
+        return web.Response(text=le_fixture("processo.html"), content_type="text/html")
+
+    async def _consulta(self, request):
+        self.requisicoes += 1
+        return web.Response(text=RESULTADO_CONSULTA, content_type="application/json")
+
+    async def _lenta(self, request):
+        self.requisicoes += 1
+        await asyncio.sleep(2)
+        return web.Response(text="tarde demais")
+
+    async def __aenter__(self):
+        app = web.Application()
+        app.router.add_post("/index.php", self._login)
+        app.router.add_get("/controlador.php", self._controlador)
+        app.router.add_post("/controlador_ajax.php", self._consulta)
+        app.router.add_get("/lenta", self._lenta)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        porta = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://127.0.0.1:{porta}"
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self._runner.cleanup()
+
+def cliente_eproc(stub: StubEproc, timeout_processo: TimeoutAdaptativo = None) -> AsyncEprocClient:
+    return AsyncEprocClient("FULANO", "senha", stub.base_url, "chave", "JBSWY3DPEHPK3PXP", timeout_processo=timeout_processo)
+
+def test_consulta_completa_passa_pelo_limitador_do_host():
+    async def cenario():
+        async with StubEproc() as stub:
+            limitador = limitador_compartilhado(stub.base_url)
+            limitador.taxa = limitador.taxa_maxima
+            async with cliente_eproc(stub) as client:
+                movimentacoes = await client.execute_varios(["5001234-56.2023.8.24.0001"] * 3)
+            return stub.requisicoes, limitador.estatisticas(), movimentacoes
+
+    requisicoes, estatisticas, movimentacoes = asyncio.run(cenario())
+    assert [len(movs) for movs in movimentacoes] == [50, 50, 50]
+    # um login e três consultas de três requisições cada
+    assert requisicoes == 10
+    assert estatisticas["requisicoes"] == requisicoes
+
+def test_limitador_espaca_as_requisicoes_assincronas():
+    async def cenario():
+        async with StubEproc() as stub:
+            limitador = limitador_compartilhado(stub.base_url)
+            limitador.taxa = limitador.taxa_maxima = 5.0
+            async with AsyncClient(stub.base_url) as client:
+                inicio = time.monotonic()
+                await asyncio.gather(*(client.acessa_link(f"{stub.base_url}/controlador.php?acao=consultar") for _ in range(6)))
+                return time.monotonic() - inicio, limitador.estatisticas()
+
+    segundos, estatisticas = asyncio.run(cenario())
+    # o primeiro token está disponível; os outros cinco chegam a 5 por segundo
+    assert segundos >= 0.9
+    assert estatisticas["segundos_espera"] > 0
+
+def test_prazo_interrompe_requisicao_assincrona():
+    async def cenario():
+        async with StubEproc() as stub:
+            async with AsyncClient(stub.base_url) as client:
+                inicio = time.monotonic()
+                with prazo(0.3):
+                    with pytest.raises(PrazoEsgotadoException):
+                        await client.acessa_link(f"{stub.base_url}/lenta")
+                return time.monotonic() - inicio
+
+    assert asyncio.run(cenario()) < 2
+
+def test_consulta_assincrona_respeita_o_prazo_adaptativo():
+    timeout = TimeoutAdaptativo(maximo=0.5, minimo=0.1)
+
+    async def cenario():
+        async with StubEproc(atraso_processo=2) as stub:
+            limitador_compartilhado(stub.base_url).taxa = 20.0
+            async with cliente_eproc(stub, timeout) as client:
+                inicio = time.monotonic()
+                with pytest.raises(PrazoEsgotadoException):
+                    await client.execute("5001234-56.2023.8.24.0001")
+                return time.monotonic() - inicio
+
+    segundos = asyncio.run(cenario())
+    assert segundos < 2
+    assert list(timeout._duracoes) == [0.5]
+
+def test_prazo_esgotado_volta_no_lugar_do_lote():
+    async def cenario():
+        async with StubEproc(atraso_processo=2) as stub:
+            limitador_compartilhado(stub.base_url).taxa = 20.0
+            async with cliente_eproc(stub, TimeoutAdaptativo(maximo=0.5, minimo=0.1)) as client:
+                return await client.execute_varios(["5001234-56.2023.8.24.0001"] * 2)
+
+    resultados = asyncio.run(cenario())
+    assert [type(resultado) for resultado in resultados] == [PrazoEsgotadoException] * 2
+
+def test_relogin_nao_interrompe_consultas_em_andamento():
+    async def cenario():
+        async with StubEproc() as stub:
+            limitador_compartilhado(stub.base_url).taxa = 20.0
+            async with cliente_eproc(stub) as client:
+                await client._garante_login()
+                lenta = asyncio.ensure_future(client.client.acessa_link(f"{stub.base_url}/lenta"))
+                await asyncio.sleep(0.2)
+                await client._garante_login(sessao_expirada=True)
+                return (await lenta).text, client.total_logins
+
+    texto, logins = asyncio.run(cenario())
+    assert texto == "tarde demais"
+    assert logins == 2
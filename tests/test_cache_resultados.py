@@ -0,0 +1,75 @@
+import json
+import types
+from datetime import date
+import pytest
+import comum.cache_resultados
+from comum.cache_resultados import CacheResultados
+from comum.lote_movimentacoes import LoteMovimentacoes
+
+class Relogio:
+    """time.time do cache, controlado pelo teste"""
+
+    def __init__(self) -> None:
+        self.agora = 1_700_000_000.0
+
+    def __call__(self) -> float:
+        return self.agora
+
+@pytest.fixture
+def relogio(monkeypatch):
+    relogio = Relogio()
+    monkeypatch.setattr(comum.cache_resultados, "time", types.SimpleNamespace(time=relogio))
+    return relogio
+
+def movimentacoes(num_processo: str) -> LoteMovimentacoes:
+    lote = LoteMovimentacoes(("processo", "evento", "data", "descricao"))
+    lote.acrescenta_valores((num_processo, "1", date(2023, 5, 2), "Sentença"))
+    return lote
+
+def test_resultado_reaproveitado_com_as_datas(tmp_path, relogio):
+    cache = CacheResultados(str(tmp_path / "cache.sqlite3"))
+    assert cache.consulta("EPROC_SC", "1") is None
+    cache.armazena("EPROC_SC", "1", movimentacoes("1"))
+    assert list(cache.consulta("EPROC_SC", "1").linhas()) == list(movimentacoes("1").linhas())
+    # a chave inclui o tribunal
+    assert cache.consulta("EPROC_RS", "1") is None
+    assert cache.estatisticas()["acertos"] == 1
+
+def test_entrada_expirada_nao_e_servida(tmp_path, relogio):
+    cache = CacheResultados(str(tmp_path / "cache.sqlite3"), idade_maxima=3600)
+    cache.armazena("PROJUDI", "1", movimentacoes("1"))
+    relogio.agora += 3600
+    assert cache.consulta("PROJUDI", "1") is not None
+    relogio.agora += 1
+    assert cache.consulta("PROJUDI", "1") is None
+    assert cache.estatisticas()["expirados"] == 1
+    # outra execução com --idade-maxima maior ainda aproveita a entrada
+    assert CacheResultados(str(tmp_path / "cache.sqlite3"), idade_maxima=7200).consulta("PROJUDI", "1") is not None
+
+def test_descarta_os_usados_ha_mais_tempo(tmp_path, relogio):
+    cache = CacheResultados(str(tmp_path / "cache.sqlite3"), max_processos=2)
+    for num_processo in ("1", "2"):
+        cache.armazena("PROJUDI", num_processo, movimentacoes(num_processo))
+        relogio.agora += 1
+    # consultar "1" o torna o mais recente: "2" é o descartado
+    cache.consulta("PROJUDI", "1")
+    relogio.agora += 1
+    cache.armazena("PROJUDI", "3", movimentacoes("3"))
+    assert cache.consulta("PROJUDI", "2") is None
+    assert cache.consulta("PROJUDI", "1") is not None
+    assert cache.consulta("PROJUDI", "3") is not None
+    assert cache.estatisticas()["descartados"] == 1
+
+def test_variantes_em_entradas_separadas(tmp_path, relogio):
+    caminho = str(tmp_path / "cache.sqlite3")
+    CacheResultados(caminho, variante="filtro-a").armazena("PROJUDI", "1", movimentacoes("1"))
+    assert CacheResultados(caminho).consulta("PROJUDI", "1") is None
+    assert CacheResultados(caminho, variante="filtro-a").consulta("PROJUDI", "1") is not None
+
+def test_entrada_de_versao_anterior(tmp_path, relogio):
+    cache = CacheResultados(str(tmp_path / "cache.sqlite3"))
+    linhas = [{"processo": "1", "evento": "1", "data": "02-05-2023", "descricao": "Sentença"}]
+    cache.conn.execute(
+        "INSERT INTO resultados VALUES ('PROJUDI', '1', ?, ?, ?)", (json.dumps(linhas), relogio.agora, relogio.agora)
+    )
+    assert [linha["data"] for linha in cache.consulta("PROJUDI", "1").linhas()] == [date(2023, 5, 2)]
@@ -0,0 +1,49 @@
+import threading
+import time
+import pytest
+from eproc import captcha_solver
+from eproc.captcha_solver import CaptchaNaoResolvidoException, SolucionadorCaptcha
+
+class TwoCaptchaFalso:
+    """upload demorado para as imagens "lenta"; resultado disponível na primeira consulta"""
+
+    def __init__(self, segundos_upload_lento: float) -> None:
+        self.segundos_upload_lento = segundos_upload_lento
+        self.threads_envio = set()
+
+    def send(self, method, body):
+        self.threads_envio.add(threading.current_thread().name)
+        if body == "falha":
+            raise RuntimeError("ERROR_ZERO_BALANCE")
+        if body == "lenta":
+            time.sleep(self.segundos_upload_lento)
+        return f"id-{body}"
+
+    def get_result(self, id_captcha):
+        return f"codigo-{id_captcha}"
+
+@pytest.fixture
+def solucionador(monkeypatch):
+    monkeypatch.setattr(captcha_solver, "ESPERA_PRIMEIRA_CONSULTA", 0)
+    solucionador = SolucionadorCaptcha("chave", intervalo_polling=0.05)
+    solucionador.twocaptcha = TwoCaptchaFalso(segundos_upload_lento=1.5)
+    return solucionador
+
+def test_upload_lento_nao_atrasa_os_demais_captchas(solucionador):
+    lenta = solucionador.envia_imagem("lenta")
+    inicio = time.monotonic()
+    rapida = solucionador.envia_imagem("rapida")
+    assert rapida.result(timeout=5) == "codigo-id-rapida"
+    assert time.monotonic() - inicio < 1
+    assert not lenta.done()
+    assert lenta.result(timeout=5) == "codigo-id-lenta"
+
+def test_upload_fora_da_thread_de_polling(solucionador):
+    assert solucionador.resolve_imagem("rapida") == "codigo-id-rapida"
+    assert solucionador.twocaptcha.threads_envio
+    assert all(nome.startswith("captcha-envio") for nome in solucionador.twocaptcha.threads_envio)
+
+def test_falha_no_upload_chega_ao_future(solucionador):
+    with pytest.raises(CaptchaNaoResolvidoException):
+        solucionador.envia_imagem("falha").result(timeout=5)
+    assert solucionador.estatisticas()["falhas"] == 1
@@ -0,0 +1,74 @@
+from datetime import date
+import comum.journal
+from comum.checkpoint import Checkpoint
+from comum.journal import JournalParcial
+from comum.lote_movimentacoes import LoteMovimentacoes
+
+PROCESSOS = [f"{numero:020d}" for numero in range(1, 11)]
+SALVA_A_CADA = 3
+
+def movimentacoes(num_processo: str) -> LoteMovimentacoes:
+    lote = LoteMovimentacoes(("processo", "evento", "data"))
+    for evento in range(1, 4):
+        lote.acrescenta_valores((num_processo, str(evento), date(2023, 1, evento)))
+    return lote
+
+def executa(tmp_path, retomando: bool = False, interrompe_em: int = None) -> JournalParcial:
+    """o protocolo do main: linhas no journal, marcação no checkpoint, salvamento a cada SALVA_A_CADA"""
+    journal = JournalParcial(str(tmp_path / "movimentacoes_parcial.jsonl"))
+    checkpoint = Checkpoint(str(tmp_path / "checkpoint.txt"))
+    if retomando:
+        checkpoint.carrega()
+        journal.trunca(checkpoint.tamanhos.get("mov", 0))
+    for idx, num_processo in enumerate(PROCESSOS, 1):
+        if checkpoint.concluido(idx, num_processo):
+            continue
+        intervalo = journal.escreve_lote(movimentacoes(num_processo))
+        if idx == interrompe_em:
+            # queda depois de gravar as linhas, com processos marcados e ainda não confirmados
+            journal.sincroniza()
+            return journal
+        checkpoint.marca(idx, num_processo, intervalo + (None,))
+        if idx % SALVA_A_CADA == 0:
+            checkpoint.grava({"mov": journal.tamanho()})
+    checkpoint.grava({"mov": journal.tamanho()})
+    return journal
+
+def processos_e_eventos(journal: JournalParcial) -> list:
+    return [(linha["processo"], linha["evento"]) for linha in journal.linhas()]
+
+def test_resume_sem_linhas_duplicadas_nem_faltando(tmp_path, monkeypatch):
+    # lotes pequenos: as linhas não confirmadas já chegaram ao arquivo quando a execução cai
+    monkeypatch.setattr(comum.journal, "TAMANHO_LOTE", 2)
+    inteira = tmp_path / "inteira"
+    inteira.mkdir()
+    esperado = processos_e_eventos(executa(inteira))
+
+    executa(tmp_path, interrompe_em=8)
+    assert len(processos_e_eventos(JournalParcial(str(tmp_path / "movimentacoes_parcial.jsonl")))) == 8 * 3
+    journal = executa(tmp_path, retomando=True)
+    assert processos_e_eventos(journal) == esperado
+
+def test_marcacoes_sem_confirmacao_sao_ignoradas(tmp_path):
+    checkpoint = Checkpoint(str(tmp_path / "checkpoint.txt"))
+    checkpoint.marca(1, "1", (0, 3, None))
+    checkpoint.grava({"mov": 10})
+    checkpoint.marca(2, "2", (3, 5, "Timeout"))
+    checkpoint.grava({"mov": 20})
+    with open(checkpoint.caminho, "a", encoding="utf-8") as arq:
+        # marcação e confirmação truncadas por uma queda durante a gravação
+        arq.write("3:3\n@{\"mov\": 3")
+
+    retomado = Checkpoint(checkpoint.caminho)
+    assert retomado.carrega() == 2
+    assert retomado.concluido(2, "2") and not retomado.concluido(3, "3")
+    assert retomado.tamanhos == {"mov": 20}
+    assert retomado.resultados == {"1": (0, 3, None), "2": (3, 5, "Timeout")}
+
+def test_checkpoint_de_versao_anterior_sem_confirmacao(tmp_path):
+    caminho = tmp_path / "checkpoint.txt"
+    caminho.write_text("1:1\n2:2\n", encoding="utf-8")
+    checkpoint = Checkpoint(str(caminho))
+    assert checkpoint.carrega() == 2
+    # sem tamanhos confirmados, os journals não são cortados
+    assert checkpoint.tamanhos is None
@@ -0,0 +1,66 @@
+import sys
+import pytest
+from openpyxl import Workbook
+from comum.entrada import PlanilhaProcessos, EntradaException
+
+LINHAS = [
+    ("0001234-55.2023.8.16.0001", "A1"),
+    ("5001234-56.2023.8.24.0001", "B2"),
+]
+
+def test_csv_com_ponto_e_virgula_e_bom(tmp_path):
+    caminho = tmp_path / "entrada.csv"
+    conteudo = " processo ;Bradesco\n" + "".join(f"{processo};{bradesco}\n" for processo, bradesco in LINHAS)
+    # linha sem processo no meio da planilha
+    conteudo += ";C3\n"
+    caminho.write_text(conteudo, encoding="utf-8-sig")
+    assert list(PlanilhaProcessos(str(caminho))) == LINHAS
+
+def test_csv_com_virgula_e_colunas_em_outra_ordem(tmp_path):
+    caminho = tmp_path / "entrada.csv"
+    caminho.write_text(
+        "BRADESCO,OUTRA,PROCESSO\n" + "".join(f"{bradesco},x,{processo}\n" for processo, bradesco in LINHAS),
+        encoding="utf-8",
+    )
+    assert list(PlanilhaProcessos(str(caminho))) == LINHAS
+
+def test_xlsx_lido_linha_a_linha(tmp_path):
+    caminho = str(tmp_path / "entrada.xlsx")
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["PROCESSO", "BRADESCO"])
+    for processo, bradesco in LINHAS:
+        ws.append([processo, bradesco])
+    # número gravado como célula numérica (float inteiro) e linha vazia
+    ws.append([1234552023816000.0, 7.0])
+    ws.append([None, None])
+    wb.save(caminho)
+
+    planilha = PlanilhaProcessos(caminho)
+    assert list(planilha) == LINHAS + [(1234552023816000, 7)]
+    assert planilha.total == 4
+
+def test_coluna_ausente(tmp_path):
+    caminho = tmp_path / "entrada.csv"
+    caminho.write_text("NUMERO;BRADESCO\n1;A\n", encoding="utf-8")
+    with pytest.raises(EntradaException, match="PROCESSO"):
+        list(PlanilhaProcessos(str(caminho)))
+
+def test_parquet_em_lotes(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    caminho = str(tmp_path / "entrada.parquet")
+    tabela = pa.table({
+        "PROCESSO": [processo for processo, _ in LINHAS] * 1000,
+        "BRADESCO": [bradesco for _, bradesco in LINHAS] * 1000,
+    })
+    pq.write_table(tabela, caminho)
+    planilha = PlanilhaProcessos(caminho)
+    assert list(planilha) == LINHAS * 1000
+    assert planilha.total == 2000
+
+def test_parquet_sem_pyarrow(tmp_path, monkeypatch):
+    # None em sys.modules faz o import falhar como se o pacote não estivesse instalado
+    monkeypatch.setitem(sys.modules, "pyarrow.parquet", None)
+    with pytest.raises(EntradaException, match="pyarrow"):
+        list(PlanilhaProcessos(str(tmp_path / "entrada.parquet")))
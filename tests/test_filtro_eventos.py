@@ -0,0 +1,65 @@
+from datetime import date, timedelta
+import pytest
+from comum.filtro_eventos import FiltroEventos, MANTER, DESCARTAR, PARAR
+from eproc.html_parser import HTMLParser, BACKEND_HTML_PARSER, BACKEND_LXML
+
+LINHA_EVENTO = (
+    '<tr id="trEvento{evento}"><td>{evento}</td><td>{data:%d/%m/%Y} 10:00:00</td><td>{descricao}</td>'
+    '<td><span class="sr-only">USUARIO\nADVOGADO</span></td><td></td></tr>'
+)
+
+def pagina(eventos) -> str:
+    """página de processo com a tabela de eventos; `eventos` é uma lista de (data, descricao)"""
+    linhas = "".join(
+        LINHA_EVENTO.format(evento=len(eventos) - posicao, data=data, descricao=descricao)
+        for posicao, (data, descricao) in enumerate(eventos)
+    )
+    return (
+        '<html><body><span id="txtNumProcesso">5001234-56.2023.8.24.0001</span>'
+        f'<table id="tblEventos"><tr><th>Evento</th></tr>{linhas}</table></body></html>'
+    )
+
+def test_palavras_chave_sem_acentos_nem_maiusculas():
+    avalia = FiltroEventos(["sentença", " baixa "]).avaliador()
+    assert avalia(date(2023, 5, 2), "Juntada - SENTENCA") == MANTER
+    assert avalia(date(2023, 5, 1), "Baixa Definitiva") == MANTER
+    assert avalia(date(2023, 4, 30), "Conclusos para despacho") == DESCARTAR
+
+def test_periodo_descarta_fora_das_datas():
+    filtro = FiltroEventos(data_inicial=date(2023, 3, 1), data_final=date(2023, 3, 31))
+    avalia = filtro.avaliador()
+    assert avalia(date(2023, 4, 1), "x") == DESCARTAR
+    assert avalia(date(2023, 3, 15), "x") == MANTER
+    assert avalia(date(2023, 3, 1), "x") == MANTER
+    assert avalia(date(2023, 2, 28), "x") == PARAR
+    assert filtro.estatisticas() == {
+        "mantidos": 2, "sem_palavra_chave": 0, "fora_do_periodo": 1, "tabelas_interrompidas": 1,
+    }
+
+def test_tabela_fora_de_ordem_nao_para():
+    avalia = FiltroEventos(data_inicial=date(2023, 3, 1)).avaliador()
+    assert avalia(date(2023, 2, 1), "x") == DESCARTAR
+    assert avalia(date(2023, 4, 1), "x") == MANTER
+    # depois de uma data maior que a anterior a tabela não é decrescente: as linhas seguintes podem voltar ao período
+    assert avalia(date(2023, 2, 1), "x") == DESCARTAR
+    assert avalia(date(2023, 3, 5), "x") == MANTER
+
+@pytest.mark.parametrize("backend", [BACKEND_HTML_PARSER, BACKEND_LXML])
+def test_extracao_para_na_primeira_linha_anterior_ao_periodo(backend):
+    # 60 eventos diários, do mais recente para o mais antigo
+    eventos = [(date(2023, 6, 30) - timedelta(days=dias), "Despacho") for dias in range(60)]
+    filtro = FiltroEventos(data_inicial=date(2023, 6, 1))
+    parser = HTMLParser(backend=backend, filtro=filtro)
+    lote = parser.lote_movimentacoes(pagina(eventos))
+    assert [data for (data,) in lote.valores(("data",))] == [data for data, _ in eventos[:30]]
+    # só a linha que interrompeu a tabela foi avaliada além das mantidas
+    assert filtro.estatisticas() == {
+        "mantidos": 30, "sem_palavra_chave": 0, "fora_do_periodo": 0, "tabelas_interrompidas": 1,
+    }
+
+def test_nenhuma_linha_mantida_deixa_o_aviso():
+    eventos = [(date(2023, 6, 30), "Despacho"), (date(2023, 6, 29), "Conclusos")]
+    lote = HTMLParser(filtro=FiltroEventos(["SENTENÇA"])).lote_movimentacoes(pagina(eventos))
+    linhas = list(lote.linhas())
+    assert len(linhas) == 1
+    assert linhas[0]["ARQUIVOS"] == "Nenhuma movimentação correspondeu aos parâmetros de busca."
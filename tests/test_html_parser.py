@@ -0,0 +1,58 @@
+import os
+import pytest
+import eproc.html_parser
+from eproc.html_parser import HTMLParser, BACKEND_HTML_PARSER, BACKEND_LXML, RE_TABELA_EVENTOS
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "eproc")
+# páginas de processo salvas; captcha_infra.html é a página de login com captcha
+PAGINAS = ["processo.html", "marcacao_variada.html", "data_id.html", "sem_fechamento.html", "table_em_script.html"]
+
+def le_fixture(nome: str) -> str:
+    with open(os.path.join(FIXTURES, nome), encoding="utf-8") as arq:
+        return arq.read()
+
+def movimentacoes(backend: str, html: str, documentos: bool = False) -> list:
+    """movimentações do backend, com os documentos trocados por tuplas comparáveis"""
+    extraidas = HTMLParser(backend=backend, documentos=documentos).get_movimentacoes(html) or []
+    for movimentacao in extraidas:
+        if "documentos" in movimentacao:
+            movimentacao["documentos"] = [
+                (documento.tipo_arquivo, documento.titulo, documento.endpoint, documento.extensao)
+                for documento in movimentacao["documentos"]
+            ]
+    return extraidas
+
+@pytest.mark.parametrize("documentos", [False, True])
+@pytest.mark.parametrize("pagina", PAGINAS)
+def test_lxml_igual_ao_html_parser(pagina, documentos):
+    html = le_fixture(pagina)
+    esperado = movimentacoes(BACKEND_HTML_PARSER, html, documentos)
+    assert esperado
+    assert movimentacoes(BACKEND_LXML, html, documentos) == esperado
+
+@pytest.mark.parametrize("backend", [BACKEND_HTML_PARSER, BACKEND_LXML])
+def test_lotes_em_partes_iguais_ao_lote_inteiro(backend, monkeypatch):
+    # trechos pequenos: as linhas da tabela chegam partidas ao parser incremental
+    monkeypatch.setattr(eproc.html_parser, "CARACTERES_POR_LEITURA", 97)
+    html = le_fixture("processo.html")
+    lotes = list(HTMLParser(backend=backend).lotes_movimentacoes(html, tamanho=7))
+    assert [len(lote) for lote in lotes] == [7] * 7 + [1]
+    linhas = [linha for lote in lotes for linha in lote.linhas()]
+    assert linhas == HTMLParser().get_movimentacoes(html)
+
+def test_tabela_com_data_id_nao_e_a_de_eventos():
+    assert RE_TABELA_EVENTOS.search('<table class="x" data-id="tblEventos">') is None
+    assert RE_TABELA_EVENTOS.search('<table id="tblEventosAntigos">') is None
+    assert RE_TABELA_EVENTOS.search("<table class='x'\nid=tblEventos>") is not None
+
+@pytest.mark.parametrize("pagina", ["sem_fechamento.html", "table_em_script.html"])
+def test_tabela_sem_fechamento_usa_html_parser(pagina):
+    parser = HTMLParser(backend=BACKEND_LXML)
+    extraidas = parser.get_movimentacoes(le_fixture(pagina))
+    assert parser.estatisticas["fallbacks_bs4"] == 1
+    assert extraidas == HTMLParser().get_movimentacoes(le_fixture(pagina))
+
+def test_pagina_sem_tabela_de_eventos():
+    html = "<html><body><span id='txtNumProcesso'>5001234-56.2023.8.24.0001</span></body></html>"
+    assert HTMLParser(backend=BACKEND_LXML).get_movimentacoes(html) is None
+    assert HTMLParser().get_movimentacoes(html) is None
@@ -0,0 +1,82 @@
+import pytest
+import comum.limitador
+from comum.limitador import (
+    LimitadorAdaptativo, AUMENTO_POR_SUCESSO, FATOR_CAPTCHA, FATOR_ERRO, FATOR_LENTIDAO, INTERVALO_REDUCAO,
+)
+from comum.prazo import PrazoEsgotadoException, prazo
+
+class Relogio:
+    """time.monotonic controlado pelo teste; `sleep` só avança o relógio"""
+
+    def __init__(self) -> None:
+        self.agora = 1000.0
+
+    def __call__(self) -> float:
+        return self.agora
+
+    def sleep(self, segundos: float) -> None:
+        self.agora += segundos
+
+@pytest.fixture
+def relogio(monkeypatch):
+    relogio = Relogio()
+    monkeypatch.setattr(comum.limitador.time, "monotonic", relogio)
+    monkeypatch.setattr(comum.limitador.time, "sleep", relogio.sleep)
+    return relogio
+
+def test_aumento_aditivo_ate_a_taxa_maxima(relogio):
+    limitador = LimitadorAdaptativo("host", taxa_inicial=2.0, taxa_maxima=2.2)
+    limitador.registra(0.1)
+    assert limitador.taxa == pytest.approx(2.0 + AUMENTO_POR_SUCESSO)
+    for _ in range(10):
+        limitador.registra(0.1)
+    assert limitador.taxa == 2.2
+
+@pytest.mark.parametrize("resultado, fator", [({"erro": True}, FATOR_ERRO), ({"captcha": True}, FATOR_CAPTCHA)])
+def test_reducao_multiplicativa_uma_vez_por_intervalo(relogio, resultado, fator):
+    limitador = LimitadorAdaptativo("host", taxa_inicial=4.0)
+    limitador.registra(0.1, **resultado)
+    assert limitador.taxa == pytest.approx(4.0 * fator)
+    # uma rajada de respostas ruins dentro do intervalo conta como uma única redução
+    limitador.registra(0.1, **resultado)
+    assert limitador.taxa == pytest.approx(4.0 * fator)
+    relogio.sleep(INTERVALO_REDUCAO)
+    limitador.registra(0.1, **resultado)
+    assert limitador.taxa == pytest.approx(4.0 * fator * fator)
+    assert limitador.estatisticas()["reducoes"] == 2
+
+def test_taxa_nunca_abaixo_da_minima(relogio):
+    limitador = LimitadorAdaptativo("host", taxa_inicial=0.3, taxa_minima=0.2)
+    for _ in range(5):
+        limitador.registra(0.1, erro=True)
+        relogio.sleep(INTERVALO_REDUCAO)
+    assert limitador.taxa == 0.2
+
+def test_latencia_acima_da_referencia_reduz_a_taxa(relogio):
+    limitador = LimitadorAdaptativo("host", taxa_inicial=4.0)
+    limitador.registra(0.1)
+    taxa = limitador.taxa
+    while limitador.taxa >= taxa:
+        taxa = limitador.taxa
+        limitador.registra(5.0)
+    assert limitador.taxa == pytest.approx(taxa * FATOR_LENTIDAO)
+
+def test_proporcao_de_captchas_na_janela(relogio):
+    limitador = LimitadorAdaptativo("host")
+    for captcha in (True, False, False, False):
+        limitador.registra(0.1, captcha=captcha)
+    assert limitador.proporcao_captcha == 0.25
+
+def test_tokens_respeitam_a_taxa(relogio):
+    limitador = LimitadorAdaptativo("host", taxa_inicial=2.0)
+    assert limitador.aguarda() == 0.0
+    assert limitador.aguarda() == pytest.approx(0.5)
+    assert limitador.aguarda() == pytest.approx(0.5)
+
+def test_espera_maior_que_o_prazo_nao_dorme(relogio):
+    limitador = LimitadorAdaptativo("host", taxa_inicial=0.2, taxa_minima=0.2)
+    limitador.aguarda()
+    with prazo(1.0):
+        with pytest.raises(PrazoEsgotadoException):
+            limitador.aguarda()
+    assert relogio.agora == 1000.0
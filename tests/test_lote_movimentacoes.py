@@ -0,0 +1,94 @@
+import json
+import os
+from datetime import date
+from openpyxl import load_workbook
+from comum.eventos_store import EventosStore
+import comum.journal
+from comum.journal import JournalParcial
+from comum.lote_movimentacoes import LoteMovimentacoes
+from eproc.html_parser import HTMLParser
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "eproc")
+COLUNAS = ("processo", "evento", "data", "descricao")
+
+def le_fixture(nome: str) -> str:
+    with open(os.path.join(FIXTURES, nome), encoding="utf-8") as arq:
+        return arq.read()
+
+def lote_exemplo() -> LoteMovimentacoes:
+    lote = LoteMovimentacoes(COLUNAS)
+    lote.acrescenta_valores(("1", "2", date(2023, 5, 2), "Sentença"))
+    lote.acrescenta_valores(("1", "1", date(2023, 4, 30), "Distribuição"))
+    return lote
+
+def celulas(destino: str) -> list:
+    return [list(linha) for linha in load_workbook(destino).active.iter_rows(values_only=True)]
+
+def test_extrator_preenche_coluna_de_datas():
+    lote = HTMLParser().lote_movimentacoes(le_fixture("processo.html"))
+    assert len(lote) == 50
+    assert all(isinstance(data, date) for (data,) in lote.valores(("data",)))
+
+def test_datas_formatadas_so_na_exportacao(tmp_path):
+    journal = JournalParcial(str(tmp_path / "parcial.jsonl"))
+    journal.escreve_lote(lote_exemplo())
+    journal.sincroniza()
+    with open(journal.caminho, encoding="utf-8") as arq:
+        gravado = json.loads(arq.readline())
+    assert gravado["lote"]["colunas"]["data"] == {"ordinais": [date(2023, 5, 2).toordinal(), date(2023, 4, 30).toordinal()]}
+    assert [linha["data"] for linha in journal.linhas()] == [date(2023, 5, 2), date(2023, 4, 30)]
+
+    destino = str(tmp_path / "final.xlsx")
+    assert journal.exporta_xlsx(destino, ["processo"]) == 2
+    assert celulas(destino) == [
+        ["processo", "evento", "data", "descricao"],
+        ["1", "2", "02-05-2023", "Sentença"],
+        ["1", "1", "30-04-2023", "Distribuição"],
+    ]
+
+def test_journal_de_versoes_anteriores(tmp_path):
+    caminho = tmp_path / "parcial.jsonl"
+    # uma linha avulsa e um lote com a data já formatada, como gravados antes
+    lote_formatado = {
+        "tamanho": 1,
+        "colunas": {
+            "processo": {"distintos": [None, "1"], "indices": [1]},
+            "data": {"distintos": [None, "02-05-2023"], "indices": [1]},
+        },
+    }
+    with open(caminho, "w", encoding="utf-8") as arq:
+        arq.write(json.dumps({"processo": "1", "data": "30-04-2023"}) + "\n")
+        arq.write(json.dumps({"lote": lote_formatado}) + "\n")
+    journal = JournalParcial(str(caminho))
+    assert [linha["data"] for linha in journal.linhas()] == [date(2023, 4, 30), "02-05-2023"]
+
+    destino = str(tmp_path / "final.xlsx")
+    journal.exporta_xlsx(destino)
+    assert celulas(destino) == [["processo", "data"], ["1", "30-04-2023"], ["1", "02-05-2023"]]
+
+def test_delta_usa_a_data_das_bases_anteriores(tmp_path):
+    store = EventosStore(str(tmp_path / "eventos.sqlite3"))
+    store.conn.execute(
+        "INSERT INTO eventos (processo, evento, data, descricao, visto_em) VALUES ('1', '1', '30-04-2023', '', '')"
+    )
+    novas = store.novas(lote_exemplo())
+    assert [linha["evento"] for linha in novas.linhas()] == ["2"]
+    store.registra([novas])
+    assert len(store.novas(lote_exemplo())) == 0
+    store.fecha()
+
+def test_journal_descarta_processo_interrompido(tmp_path, monkeypatch):
+    monkeypatch.setattr(comum.journal, "TAMANHO_LOTE", 3)
+    journal = JournalParcial(str(tmp_path / "parcial.jsonl"))
+    journal.escreve_lote(lote_exemplo())
+    confirmado = journal.tamanho()
+    journal.escreve_lote(lote_exemplo())
+    inicio = journal.total_linhas
+    # o processo interrompido já tinha levado uma linha do arquivo e parte do lote em andamento
+    journal.escreve_lote(lote_exemplo())
+    journal.escreve_lote(lote_exemplo())
+    journal.descarta(inicio)
+    assert journal.total_linhas == inicio
+    assert journal.tamanho() >= confirmado
+    journal.escreve_lote(lote_exemplo())
+    assert [linha["evento"] for linha in journal.linhas()] == ["2", "1"] * 3
@@ -0,0 +1,58 @@
+import os
+import pytest
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from comum.media_store import MediaStore, DocumentoInvalidoException
+
+PDF = b"%PDF-1.4 conteudo do documento"
+
+def baixa_conteudo(conteudo: bytes, chamadas: list = None):
+    def baixa(destino):
+        if chamadas is not None:
+            chamadas.append(destino)
+        with open(destino, "wb") as arq:
+            arq.write(conteudo)
+    return baixa
+
+def test_documento_guardado_pelo_hash_e_reaproveitado(tmp_path):
+    store = MediaStore(str(tmp_path))
+    chamadas = []
+    caminho = store.armazena("1", "2", "Sentença", "pdf", baixa_conteudo(PDF, chamadas))
+    assert os.path.basename(os.path.dirname(caminho)) == os.path.basename(caminho)[:2]
+    assert Path(caminho).read_bytes() == PDF
+
+    assert store.consulta("1", "2", "Sentença") == caminho
+    assert store.armazena("1", "2", "Sentença", "pdf", baixa_conteudo(PDF, chamadas)) == caminho
+    assert len(chamadas) == 1
+    store.fecha()
+
+    # o índice sobrevive entre execuções
+    assert MediaStore(str(tmp_path)).consulta("1", "2", "Sentença") == caminho
+
+def test_conteudo_repetido_ocupa_um_unico_arquivo(tmp_path):
+    store = MediaStore(str(tmp_path))
+    primeiro = store.armazena("1", "1", "Petição", "pdf", baixa_conteudo(PDF))
+    segundo = store.armazena("2", "7", "Petição", "pdf", baixa_conteudo(PDF))
+    assert primeiro == segundo
+    assert store.estatisticas()["duplicados"] == 1
+    assert not os.listdir(tmp_path / "tmp")
+
+@pytest.mark.parametrize("conteudo", [b"", b"  <!DOCTYPE html><html><body>Login</body></html>"])
+def test_download_invalido_fica_fora_do_indice(tmp_path, conteudo):
+    store = MediaStore(str(tmp_path))
+    with pytest.raises(DocumentoInvalidoException):
+        store.armazena("1", "2", "Sentença", "pdf", baixa_conteudo(conteudo))
+    assert store.consulta("1", "2", "Sentença") is None
+    assert store.estatisticas()["rejeitados"] == 1
+    # o temporário inválido não é retomado no próximo download
+    assert not os.listdir(tmp_path / "tmp")
+
+def test_mesmo_documento_pedido_em_paralelo_e_baixado_uma_vez(tmp_path):
+    store = MediaStore(str(tmp_path))
+    chamadas = []
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        caminhos = list(executor.map(
+            lambda _: store.armazena("1", "2", "Sentença", "pdf", baixa_conteudo(PDF, chamadas)), range(8)
+        ))
+    assert len(set(caminhos)) == 1
+    assert len(chamadas) == 1
@@ -0,0 +1,58 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from eproc.html_parser import HTMLParser, PaginaEproc
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "eproc")
+
+def le_fixture(nome: str) -> str:
+    with open(os.path.join(FIXTURES, nome), encoding="utf-8") as arq:
+        return arq.read()
+
+def test_pagina_de_login_analisada_uma_vez():
+    parser = HTMLParser()
+    pagina = parser.pagina(le_fixture("captcha_infra.html"))
+    assert pagina.tipo == PaginaEproc.CAPTCHA_INFRA
+    assert pagina.requires_captcha and not pagina.is_cloudflare_captcha and not pagina.requires_2fa
+    assert parser.get_captcha_form(pagina)["hdnAcao"] == "login"
+    assert parser.get_endpoint_form_catpcha(pagina) == "index.php?acao=login_captcha&hash=abc123"
+    assert parser.imagem_captcha_base64(pagina)
+    assert parser.estatisticas["paginas"] == 1
+    assert parser.estatisticas["parses"] == 1
+
+def test_pagina_repassada_volta_como_esta():
+    parser = HTMLParser()
+    pagina = parser.pagina(le_fixture("processo.html"))
+    assert parser.pagina(pagina) is pagina
+
+def test_parser_sem_estado_entre_paginas_intercaladas():
+    parser = HTMLParser()
+    processo = parser.pagina(le_fixture("processo.html"))
+    captcha = parser.pagina(le_fixture("captcha_infra.html"))
+    assert captcha.requires_captcha
+    assert len(parser.get_movimentacoes(processo)) == 50
+    assert not processo.requires_captcha
+
+def test_parser_compartilhado_entre_threads():
+    parser = HTMLParser()
+    paginas = [le_fixture("processo.html"), le_fixture("marcacao_variada.html")] * 8
+    esperado = [HTMLParser().get_movimentacoes(html) for html in paginas]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        assert list(executor.map(parser.get_movimentacoes, paginas)) == esperado
+
+def test_parser_compartilhado_entre_corrotinas():
+    parser = HTMLParser()
+    paginas = [le_fixture("processo.html"), le_fixture("marcacao_variada.html")] * 4
+
+    async def consulta(html):
+        pagina = parser.pagina(html)
+        # outra corrotina analisa a sua página entre as perguntas desta
+        await asyncio.sleep(0)
+        assert not pagina.requires_captcha
+        await asyncio.sleep(0)
+        return parser.get_movimentacoes(pagina)
+
+    async def todas():
+        return await asyncio.gather(*(consulta(html) for html in paginas))
+
+    assert asyncio.run(todas()) == [HTMLParser().get_movimentacoes(html) for html in paginas]
@@ -0,0 +1,64 @@
+import contextvars
+import time
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from comum.prazo import (
+    PrazoEsgotadoException, TimeoutAdaptativo, AMOSTRAS_MINIMAS, FATOR_PERCENTIL, TIMEOUT_CONEXAO,
+    prazo, restante, sem_prazo, timeout_requisicao, verifica_prazo,
+)
+
+def test_sem_prazo_fora_de_uma_consulta():
+    assert restante() is None
+    verifica_prazo()
+    assert timeout_requisicao(leitura=60) == (TIMEOUT_CONEXAO, 60)
+
+def test_timeouts_limitados_ao_que_resta_do_prazo():
+    with prazo(2.0):
+        conexao, leitura = timeout_requisicao()
+        assert 0 < conexao <= 2.0 and 0 < leitura <= 2.0
+    assert restante() is None
+
+def test_prazo_esgotado():
+    with prazo(-1):
+        with pytest.raises(PrazoEsgotadoException, match="antes de GET"):
+            verifica_prazo("GET")
+        with pytest.raises(PrazoEsgotadoException):
+            timeout_requisicao()
+
+def test_sem_prazo_nao_consome_o_prazo_de_quem_chamou():
+    with prazo(10.0):
+        antes = restante()
+        with sem_prazo():
+            # um login demorado, sem prazo
+            assert restante() is None
+            time.sleep(0.2)
+        # o tempo do bloco sem prazo volta para a consulta
+        assert restante() == pytest.approx(antes, abs=0.1)
+
+def test_prazo_vale_so_para_o_contexto_que_o_definiu():
+    with prazo(5.0):
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            # uma thread nova não herda o prazo; com uma cópia do contexto, sim
+            assert executor.submit(restante).result() is None
+            assert executor.submit(contextvars.copy_context().run, restante).result() is not None
+
+def test_timeout_adaptativo_pelo_percentil():
+    timeout = TimeoutAdaptativo(maximo=300, minimo=30)
+    for _ in range(AMOSTRAS_MINIMAS - 1):
+        timeout.registra(20.0)
+    assert timeout.segundos() == 300
+    timeout.registra(20.0)
+    assert timeout.segundos() == FATOR_PERCENTIL * 20.0
+    for _ in range(AMOSTRAS_MINIMAS):
+        timeout.registra(1.0)
+    # o percentil ainda vê as consultas lentas, e o prazo não cai abaixo do mínimo
+    assert timeout.segundos() == FATOR_PERCENTIL * 20.0
+
+def test_timeout_adaptativo_conta_as_consultas_esgotadas():
+    timeout = TimeoutAdaptativo(maximo=300, minimo=30)
+    for _ in range(AMOSTRAS_MINIMAS):
+        timeout.registra(5.0)
+    assert timeout.segundos() == 30
+    for _ in range(AMOSTRAS_MINIMAS):
+        timeout.registra_esgotado(30)
+    assert timeout.segundos() == FATOR_PERCENTIL * 30
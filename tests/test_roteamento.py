@@ -0,0 +1,51 @@
+import pytest
+from comum.roteamento import (
+    Roteador, normaliza_numero, digito_verificador_valido,
+    ERRO_DIGITO_VERIFICADOR, ERRO_NUMERO_INVALIDO, ERRO_TRIBUNAL_NAO_SUPORTADO,
+)
+
+SEGMENTOS = {"816": "PROJUDI", "824": "EPROC_SC", "821": "EPROC_RS"}
+
+def cnj(sequencial: int, ano: int, segmento: str, origem: str) -> str:
+    """número formatado com os dígitos calculados como na Resolução CNJ 65/2008 (98 - N * 100 mod 97)"""
+    base = f"{sequencial:07d}{ano}{segmento}{origem}"
+    digito = 98 - int(base) * 100 % 97
+    return f"{sequencial:07d}-{digito:02d}.{ano}.{segmento[0]}.{segmento[1:]}.{origem}"
+
+@pytest.mark.parametrize("segmento, tribunal", SEGMENTOS.items())
+def test_encaminha_pelo_segmento(segmento, tribunal):
+    numero = cnj(1234, 2023, segmento, "0001")
+    assert Roteador(SEGMENTOS).roteia(numero) == (normaliza_numero(numero), tribunal, None)
+
+def test_normaliza_formatos_da_planilha():
+    numero = cnj(1234, 2023, "816", "0001")
+    digitos = numero.replace("-", "").replace(".", "")
+    assert normaliza_numero(f"  {numero} ") == digitos
+    # célula numérica: os zeros à esquerda se perdem e são repostos
+    assert normaliza_numero(int(digitos)) == digitos
+    assert normaliza_numero("") is None
+    assert normaliza_numero("1" * 21) is None
+
+def test_digito_verificador_errado_e_rejeitado():
+    numero = normaliza_numero(cnj(1234, 2023, "824", "0001"))
+    assert digito_verificador_valido(numero)
+    digito = int(numero[7:9])
+    for errado in ((digito + 1) % 100, (digito + 10) % 100):
+        assert not digito_verificador_valido(f"{numero[:7]}{errado:02d}{numero[9:]}")
+    # sequencial com dois dígitos trocados de lugar
+    trocado = numero[:5] + numero[6] + numero[5] + numero[7:]
+    assert trocado != numero
+    roteador = Roteador(SEGMENTOS)
+    assert roteador.roteia(trocado) == (trocado, None, ERRO_DIGITO_VERIFICADOR)
+
+def test_erros_de_roteamento_e_estatisticas():
+    roteador = Roteador(SEGMENTOS)
+    assert roteador.roteia("abc") == ("abc", None, ERRO_NUMERO_INVALIDO)
+    outro_tribunal = cnj(1, 2023, "826", "0100")
+    assert roteador.roteia(outro_tribunal) == (normaliza_numero(outro_tribunal), None, ERRO_TRIBUNAL_NAO_SUPORTADO)
+    valido = cnj(2, 2024, "821", "0009")
+    # valores repetidos contam a cada linha, mas são analisados uma única vez
+    for _ in range(3):
+        assert roteador.roteia(valido)[2] is None
+    assert len(roteador._rotas) == 3
+    assert roteador.estatisticas() == {"validos": 3, "invalidos": 1, "digito_invalido": 0, "nao_suportados": 1}